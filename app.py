@@ -1,46 +1,247 @@
-from flask import Flask, render_template, request, redirect, url_for
+import atexit
+import os
+
+from flask import Flask, abort, jsonify, render_template, request, redirect, url_for
+from src.campaign import CampaignDetector
+from src.flood import FloodDetector
+from src.keyword_stats import KeywordStats
 from src.pipeline import TextPipeline
+from src.post_index import PostIndex
+from src.prefork import prepare_for_fork
+from src.shadow import ShadowRunner, load_candidate
+from src.term_index import TermIndex
+from src.tracing import Tracer
+from src.verdict_store import VerdictStore
 
-app = Flask(__name__)
-pipeline = TextPipeline()
+# Presupuesto de tiempo por petición en milisegundos (MODERATION_DEADLINE_MS)
+DEADLINE_MS = float(os.environ["MODERATION_DEADLINE_MS"]) if os.environ.get("MODERATION_DEADLINE_MS") else None
 
-last_detailed_steps = None
 
-@app.route("/", methods=["GET", "POST"])
-def index():
-    global last_detailed_steps
+def deadline_seconds(deadline_ms=None):
+    deadline_ms = DEADLINE_MS if deadline_ms is None else deadline_ms
+    return None if deadline_ms is None else deadline_ms / 1000
 
-    result = None
-    warnings = []
-    user_text = ""
 
-    if request.method == "POST":
-        user_text = request.form["user_text"]
-        output = pipeline.run(user_text)
-        final = output["final"]
-        detailed = output["detailed"]
-        result = final["text"]
-        warnings = final["warnings"]
-        last_detailed_steps = detailed  # guardamos el análisis completo
-
-    # botón se activa solo si ya hay análisis
-    detailed_available = last_detailed_steps is not None
-
-    return render_template(
-        "index.html",
-        result=result,
-        warnings=warnings,
-        user_text=user_text,
-        detailed_available=detailed_available
+def build_pipeline():
+    # Detección de campañas de spam entre publicaciones (CAMPAIGN_DETECTION=1)
+    # Enrutado por idioma a las particiones del léxico (LANGUAGE_ROUTING=1)
+    # Veredictos persistentes en SQLite (VERDICT_STORE=ruta/al/archivo.db)
+    store = None
+    if os.environ.get("VERDICT_STORE"):
+        store = VerdictStore(os.environ["VERDICT_STORE"])
+        atexit.register(store.close)  # escribe los veredictos pendientes al salir
+    # Archivo de publicaciones para re-moderar tras cambios del léxico (POST_INDEX=ruta/al/archivo.db)
+    post_index = None
+    if os.environ.get("POST_INDEX"):
+        post_index = PostIndex(os.environ["POST_INDEX"])
+        atexit.register(post_index.close)
+    # Motor candidato en modo sombra (SHADOW_CANDIDATE=modulo:fabrica, SHADOW_SAMPLE_RATE=0.01)
+    shadow = None
+    if os.environ.get("SHADOW_CANDIDATE"):
+        shadow = ShadowRunner(
+            load_candidate(os.environ["SHADOW_CANDIDATE"]),
+            sample_rate=float(os.environ.get("SHADOW_SAMPLE_RATE", "0.01")),
+        )
+    # Trazas de transiciones por muestreo (TRACE_SAMPLE_RATE=0.001)
+    tracer = None
+    if os.environ.get("TRACE_SAMPLE_RATE"):
+        tracer = Tracer(sample_rate=float(os.environ["TRACE_SAMPLE_RATE"]))
+    # Aciertos por entrada del léxico (KEYWORD_STATS=1); con KEYWORD_STATS_DIR se suman todos los workers
+    keyword_stats = None
+    if os.environ.get("KEYWORD_STATS") == "1" or os.environ.get("KEYWORD_STATS_DIR"):
+        keyword_stats = KeywordStats(os.environ.get("KEYWORD_STATS_DIR"))
+    # Ráfagas de publicaciones por autor (FLOOD_DETECTION=1, FLOOD_MAX_POSTS=30 por minuto)
+    flood = None
+    if os.environ.get("FLOOD_DETECTION") == "1":
+        flood = FloodDetector(max_posts=int(os.environ.get("FLOOD_MAX_POSTS", "30")))
+    # Términos masivos compilados con `python -m src.term_index build` (TERM_INDEX=ruta/al/archivo.trie);
+    # el archivo se mapea en memoria y los workers comparten sus páginas
+    term_index = TermIndex(os.environ["TERM_INDEX"]) if os.environ.get("TERM_INDEX") else None
+    # Atajo para publicaciones limpias: activo por defecto, PREFILTER=0 lo desactiva
+    return TextPipeline(
+        campaign_detector=CampaignDetector() if os.environ.get("CAMPAIGN_DETECTION") == "1" else None,
+        route_languages=os.environ.get("LANGUAGE_ROUTING") == "1",
+        verdict_store=store,
+        post_index=post_index,
+        shadow=shadow,
+        tracer=tracer,
+        keyword_stats=keyword_stats,
+        flood_detector=flood,
+        prefilter=os.environ.get("PREFILTER") != "0",
+        term_index=term_index,
     )
 
 
-@app.route("/details")
-def details():
-    global last_detailed_steps
-    if not last_detailed_steps:
-        return redirect(url_for("index"))
-    return render_template("details.html", steps=last_detailed_steps)
+def create_app(pipeline=None, prefork=False):
+    """
+    Builds the Flask app around one TextPipeline.
+
+    prefork=True is for pre-fork servers that load the app in the master
+    process (gunicorn --preload, see gunicorn.conf.py): the pipeline is
+    warmed up and gc.freeze() is called, so the workers forked afterwards
+    share the lexicon, the compiled regexes and the textX metamodel with
+    the master instead of building or dirtying their own copies. The
+    lexicon watcher is then left to each worker (threads do not survive
+    a fork).
+    """
+    app = Flask(__name__)
+    pipeline = pipeline or build_pipeline()
+    app.extensions["pipeline"] = pipeline
+
+    # Recarga automática de keywords.json (LEXICON_WATCH=1)
+    if os.environ.get("LEXICON_WATCH") == "1" and not prefork:
+        pipeline.watch_lexicon()
+
+    last = {"detailed_steps": None}
+
+    @app.route("/", methods=["GET", "POST"])
+    def index():
+        result = None
+        warnings = []
+        user_text = ""
+
+        if request.method == "POST":
+            user_text = request.form["user_text"]
+            output = pipeline.run(
+                user_text, deadline=deadline_seconds(), trace=request.form.get("trace") == "1"
+            )
+            final = output["final"]
+            detailed = output["detailed"]
+            result = final["text"]
+            warnings = final["warnings"]
+            last["detailed_steps"] = detailed  # guardamos el análisis completo
+
+        # botón se activa solo si ya hay análisis
+        detailed_available = last["detailed_steps"] is not None
+
+        return render_template(
+            "index.html",
+            result=result,
+            warnings=warnings,
+            user_text=user_text,
+            detailed_available=detailed_available
+        )
+
+    @app.route("/details")
+    def details():
+        if not last["detailed_steps"]:
+            return redirect(url_for("index"))
+        return render_template("details.html", steps=last["detailed_steps"])
+
+    @app.route("/api/moderate", methods=["POST"])
+    def api_moderate():
+        payload = request.get_json(silent=True) or {}
+        text = payload.get("text")
+        if not isinstance(text, str):
+            return jsonify({"error": "field 'text' (string) is required"}), 400
+        deadline_ms = payload.get("deadline_ms")
+        if deadline_ms is not None and (isinstance(deadline_ms, bool) or not isinstance(deadline_ms, (int, float))):
+            return jsonify({"error": "field 'deadline_ms' must be a number"}), 400
+        trace = payload.get("trace", False)
+        if not isinstance(trace, bool):
+            return jsonify({"error": "field 'trace' must be a boolean"}), 400
+        author = payload.get("author")
+        if author is not None and not isinstance(author, str):
+            return jsonify({"error": "field 'author' must be a string"}), 400
+        post_id = payload.get("id")
+        if post_id is not None and not isinstance(post_id, str):
+            return jsonify({"error": "field 'id' must be a string"}), 400
+
+        output = pipeline.run(
+            text, deadline=deadline_seconds(deadline_ms), trace=trace, author=author, post_id=post_id
+        )
+        detailed = output["detailed"]
+        response = {
+            "text": output["final"]["text"],
+            "warnings": output["final"]["warnings"],
+            "spam_state": detailed["spam_state"],
+            "content_state": detailed["content_state"],
+            "lexicon_version": detailed["lexicon_version"],
+            "degraded": output["final"]["degraded"],
+        }
+        if trace:
+            response["trace"] = detailed["trace"]
+        return jsonify(response)
+
+    @app.route("/api/classify", methods=["POST"])
+    def api_classify():
+        # Solo los estados finales: sin censura ni renderizado
+        payload = request.get_json(silent=True) or {}
+        texts = payload.get("texts")
+        if isinstance(texts, list) and all(isinstance(t, str) for t in texts):
+            # Autores e identificadores de publicación opcionales: una cadena (o null) por texto
+            authors, post_ids = payload.get("authors"), payload.get("ids")
+            for field, values in (("authors", authors), ("ids", post_ids)):
+                if values is not None and not (
+                    isinstance(values, list) and len(values) == len(texts)
+                    and all(v is None or isinstance(v, str) for v in values)
+                ):
+                    return jsonify({"error": f"field '{field}' must be a list with one string or null per text"}), 400
+            return jsonify({"results": pipeline.classify_batch(texts, authors=authors, post_ids=post_ids)})
+        text = payload.get("text")
+        if not isinstance(text, str):
+            return jsonify({"error": "field 'text' (string) or 'texts' (list of strings) is required"}), 400
+        author, post_id = payload.get("author"), payload.get("id")
+        for field, value in (("author", author), ("id", post_id)):
+            if value is not None and not isinstance(value, str):
+                return jsonify({"error": f"field '{field}' must be a string"}), 400
+        return jsonify(pipeline.classify(text, author=author, post_id=post_id))
+
+    @app.route("/admin/lexicon/reload", methods=["POST"])
+    def admin_reload_lexicon():
+        # Solo desde la misma máquina
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            abort(403)
+        previous = pipeline.lexicon_version
+        version = pipeline.reload_lexicon()
+        return jsonify({"version": version, "reloaded": version != previous})
+
+    @app.route("/admin/remoderate", methods=["POST"])
+    def admin_remoderate():
+        # Re-modera solo las publicaciones afectadas por el cambio del léxico; solo desde la misma máquina
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            abort(403)
+        if pipeline.post_index is None:
+            return jsonify({"error": "post index is off (set POST_INDEX)"}), 404
+        return jsonify(pipeline.remoderate())
+
+    @app.route("/admin/shadow")
+    def admin_shadow():
+        # Informe del modo sombra, solo desde la misma máquina
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            abort(403)
+        if pipeline.shadow is None:
+            return jsonify({"error": "shadow mode is off (set SHADOW_CANDIDATE)"}), 404
+        return jsonify(pipeline.shadow.report(mismatches=request.args.get("mismatches", 10, type=int)))
+
+    @app.route("/admin/traces")
+    def admin_traces():
+        # Últimas trazas muestreadas, solo desde la misma máquina
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            abort(403)
+        if pipeline.tracer is None:
+            return jsonify({"error": "tracing is off (set TRACE_SAMPLE_RATE)"}), 404
+        return jsonify(pipeline.tracer.report(limit=request.args.get("limit", 10, type=int)))
+
+    @app.route("/admin/keywords")
+    def admin_keywords():
+        # Aciertos por entrada del léxico, sumados entre workers; solo desde la misma máquina
+        if request.remote_addr not in ("127.0.0.1", "::1"):
+            abort(403)
+        if pipeline.keyword_stats is None:
+            return jsonify({"error": "keyword stats are off (set KEYWORD_STATS=1 or KEYWORD_STATS_DIR)"}), 404
+        top = request.args.get("top", 20, type=int)
+        return jsonify(pipeline.keyword_stats.report(pipeline.stages.lexicon, top=top))
+
+    # Último paso antes de bifurcar: todo lo compilado queda compartido con los workers
+    if prefork:
+        prepare_for_fork(pipeline)
+
+    return app
+
+
+# Servidor pre-fork (PREFORK=1, lo activa gunicorn.conf.py)
+app = create_app(prefork=os.environ.get("PREFORK") == "1")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+"""
+Scalar vs NumPy-vectorized DFAs (spam, content, directionality) by batch size.
+
+    python -m benchmarks.batch_bench --sizes 1 10 100 1000 10000 100000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from src.pipeline import TextPipeline
+
+SIZES = (1, 10, 100, 1_000, 10_000, 100_000)
+
+
+def token_pool(pipeline, size=2000, seed=0):
+    """Token lists of a synthetic corpus; batches are sampled from it."""
+    tokenize = pipeline.tokenizer.tokenize
+    return [tokenize(text) for _, _, text in CorpusGenerator(seed=seed).corpus(size)]
+
+
+def scalar_run(stages, token_lists):
+    spam_dfa, content_dfa = stages.spam_dfa, stages.content_dfa
+    return [(spam_dfa.process_tokens(t), content_dfa.process_tokens(t)) for t in token_lists]
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmark(sizes=SIZES, pool_size=2000, seed=0, repeat=3, pipeline=None):
+    """
+    DFA time only (tokens are computed beforehand) for each batch size.
+    Also checks that both paths return the same labels.
+    """
+    pipeline = pipeline or TextPipeline()
+    stages = pipeline.stages
+    batch_dfa = stages.batch_dfa()
+    pool = token_pool(pipeline, pool_size, seed)
+    rng = random.Random(seed)
+
+    results = []
+    for size in sizes:
+        batch = [rng.choice(pool) for _ in range(size)]
+        spam, content = batch_dfa.run(batch)
+        if list(zip(spam.tolist(), content.tolist())) != scalar_run(stages, batch):
+            raise AssertionError(f"vectorized labels differ from the scalar path at size {size}")
+
+        rounds = repeat if size < 100_000 else 1
+        scalar = best_time(lambda: scalar_run(stages, batch), rounds)
+        vectorized = best_time(lambda: batch_dfa.run(batch), rounds)
+        results.append({
+            "batch": size,
+            "tokens": sum(len(t) for t in batch),
+            "scalar_posts_per_s": size / scalar,
+            "vectorized_posts_per_s": size / vectorized,
+            "speedup": scalar / vectorized,
+        })
+    return {"sizes": results, "meta": {"pool": pool_size, "seed": seed, "repeat": repeat}}
+
+
+def format_report(report):
+    lines = [f"{'batch':>8}{'tokens':>10}{'scalar/s':>14}{'numpy/s':>14}{'speedup':>10}"]
+    for r in report["sizes"]:
+        lines.append(
+            f"{r['batch']:>8}{r['tokens']:>10}{r['scalar_posts_per_s']:>14.0f}"
+            f"{r['vectorized_posts_per_s']:>14.0f}{r['speedup']:>9.1f}x"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--pool", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.pool, args.seed, args.repeat)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
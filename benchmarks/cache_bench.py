@@ -0,0 +1,124 @@
+"""
+Tokenizer throughput with and without the word cache on Zipf-distributed text.
+
+    python -m benchmarks.cache_bench --capacities 0 1000 10000 100000 --vocab 50000
+"""
+import argparse
+import itertools
+import json
+import random
+import string
+import sys
+import time
+
+from benchmarks.corpus import FILLER
+from src.lexicon import Lexicon
+from src.pipeline import TextPipeline
+
+CAPACITIES = (0, 1_000, 10_000, 100_000)
+
+
+def zipf_vocabulary(size, seed=0, lexicon=None):
+    """
+    `size` distinct words: the lexicon's single words and the corpus
+    filler first, then random lowercase words. Ranks are shuffled so
+    keywords are spread over the whole frequency range.
+    """
+    lexicon = lexicon or Lexicon.from_file()
+    rng = random.Random(seed)
+    words = set(lexicon.word_index) | set(FILLER)
+    for attr in ("badwords", "sexwords", "violence", "politics"):
+        words.update(w for w in getattr(lexicon, attr) if " " not in w)
+    words = sorted(words)
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    words = words[:size]
+    rng.shuffle(words)
+    return words
+
+
+def zipf_texts(posts, words_per_post=30, vocab_size=50_000, s=1.1, seed=0):
+    """Posts whose words follow a Zipf law of exponent `s` over the vocabulary."""
+    rng = random.Random(seed)
+    vocabulary = zipf_vocabulary(vocab_size, seed)
+    cum_weights = list(itertools.accumulate(1 / (rank ** s) for rank in range(1, len(vocabulary) + 1)))
+    texts = []
+    for _ in range(posts):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=words_per_post)
+        # Some capitalised sentence starts, as in real posts
+        if rng.random() < 0.5:
+            words[0] = words[0].capitalize()
+        texts.append(" ".join(words))
+    return texts
+
+
+def measure(capacity, texts, repeat=1):
+    pipeline = TextPipeline(word_cache_size=capacity)
+    tokenize = pipeline.tokenizer.tokenize
+    words = sum(len(t.split()) for t in texts)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            tokenize(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    stats = pipeline.word_cache.stats() if pipeline.word_cache else {"size": 0, "hit_rate": 0.0}
+    return {
+        "capacity": capacity,
+        "words_per_s": words / best,
+        "hit_rate": stats["hit_rate"],
+        "size": stats["size"],
+    }
+
+
+def run_benchmark(capacities=CAPACITIES, posts=5000, words_per_post=30, vocab_size=50_000,
+                  s=1.1, seed=0, repeat=1):
+    texts = zipf_texts(posts, words_per_post, vocab_size, s, seed)
+    results = [measure(c, texts, repeat) for c in capacities]
+    base = results[0]["words_per_s"]
+    for r in results:
+        r["speedup"] = r["words_per_s"] / base
+    return {
+        "capacities": results,
+        "meta": {"posts": posts, "words_per_post": words_per_post, "vocab": vocab_size, "s": s, "seed": seed},
+    }
+
+
+def format_report(report):
+    lines = [f"{'capacity':>10}{'words/s':>12}{'hit rate':>10}{'size':>9}{'speedup':>9}"]
+    for r in report["capacities"]:
+        lines.append(
+            f"{r['capacity']:>10}{r['words_per_s']:>12.0f}{r['hit_rate']:>10.1%}"
+            f"{r['size']:>9}{r['speedup']:>8.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--capacities", type=int, nargs="+", default=list(CAPACITIES))
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=30)
+    parser.add_argument("--vocab", type=int, default=50_000)
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.capacities, args.posts, args.words, args.vocab, args.zipf, args.seed, args.repeat)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
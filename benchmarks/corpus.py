@@ -0,0 +1,171 @@
+import json
+import random
+from pathlib import Path
+
+KEYWORDS_FILE = Path(__file__).parent.parent / "src" / "data" / "keywords.json"
+
+# -------------------
+# Post kinds and length profiles
+# -------------------
+KINDS = ("clean", "spam", "offensive", "directional", "markup", "formula")
+
+# (min words, max words) for every length profile
+LENGTHS = {
+    "short": (4, 12),
+    "medium": (20, 60),
+    "long": (150, 400),
+}
+
+# Neutral vocabulary used as filler; words that contain a lexicon
+# substring (e.g. "whatever" contains "hate") are dropped at load time.
+FILLER = [
+    "the", "a", "an", "and", "or", "but", "so", "very", "really", "just",
+    "today", "tomorrow", "yesterday", "morning", "evening", "weekend", "week",
+    "coffee", "tea", "breakfast", "lunch", "dinner", "pizza", "salad", "bread",
+    "sunny", "rainy", "cloudy", "warm", "cold", "nice", "great", "good", "fine",
+    "park", "beach", "city", "river", "mountain", "garden", "street", "house",
+    "friend", "family", "teacher", "student", "neighbor", "team", "class",
+    "book", "movie", "song", "album", "game", "photo", "picture", "story",
+    "walk", "run", "read", "cook", "paint", "sing", "dance", "learn", "study",
+    "happy", "calm", "busy", "tired", "excited", "curious", "proud", "lucky",
+    "with", "from", "about", "after", "before", "around", "near", "over",
+    "this", "that", "some", "many", "every", "little", "big", "new", "old",
+    "music", "guitar", "piano", "soccer", "tennis", "bike", "train", "bus",
+    "project", "homework", "exam", "notes", "library", "office", "meeting",
+]
+
+URLS = [
+    "http://example.com", "https://shop.example.net/deal", "http://site.org/a?b=1",
+    "https://news.example.com/story/42", "http://promo.example.io",
+]
+
+HASHTAGS = ["#fun", "#sunday", "#coding", "#travel", "#food", "#music", "#news", "#pics"]
+MENTIONS = ["@alice", "@bob", "@karol", "@johan", "@team", "@news"]
+EMOTICONS = [":-)", ":)", ":D", ";)", ":P", "XD", ":-("]
+EMOJIS = ["\U0001F600", "\U0001F389", "\U0001F31E", "\U0001F44D", "\U0001F60D"]
+MARKUP = ["*{}*", "-{}-", "_{}_", "//{}//"]
+FORMULAS = [
+    r"$\frac{x+1}{y-1}$", r"$x^2 + y^2 = z^2$", r"$\sqrt{16}$",
+    r"$\sqrt[3]{x}$", r"$a_1 + a_2$", r"$(a+b)*c$", r"$\frac{1}{2}$",
+]
+
+
+class CorpusGenerator:
+    """
+    Deterministic generator of synthetic posts built from the
+    categories of keywords.json.
+    """
+
+    def __init__(self, keywords_file=KEYWORDS_FILE, seed=0):
+        with open(keywords_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.data = data
+        self.random = random.Random(seed)
+
+        substrings = (
+            data["badwords"] + data["sexwords"] + data["violence"] + data["politics"]
+        )
+        exact = set(
+            data["pronouns"] + data["pronouns_self"] + data["pronouns_other"]
+            + data["pronouns_group"] + data["aux_verbs"]
+        )
+        self.filler = [
+            w for w in FILLER
+            if w not in exact and not any(s.lower() in w for s in substrings)
+        ]
+        self.harmful = data["badwords"] + data["sexwords"] + data["violence"]
+        self.phrases = data["spamwords"] + data["fakeclaims"]
+
+    # -------------------
+    # Helpers
+    # -------------------
+    def _length(self, length):
+        low, high = LENGTHS[length]
+        return self.random.randint(low, high)
+
+    def _filler(self, n):
+        return [self.random.choice(self.filler) for _ in range(n)]
+
+    def _insert(self, words, extra):
+        """Inserts every item of extra at a random position of words."""
+        for item in extra:
+            words.insert(self.random.randint(0, len(words)), item)
+        return words
+
+    # -------------------
+    # Post kinds
+    # -------------------
+    def clean(self, n):
+        words = self._filler(n)
+        if self.random.random() < 0.3:
+            words.append(self.random.choice(EMOTICONS))
+        return words
+
+    def spam(self, n):
+        words = self._filler(max(n - 4, 1))
+        choice = self.random.randrange(3)
+        if choice == 0:
+            extra = [self.random.choice(URLS) for _ in range(4)]
+        elif choice == 1:
+            extra = [self.random.choice(HASHTAGS) for _ in range(4)]
+        else:
+            extra = [self.random.choice(self.phrases)]
+        return self._insert(words, extra)
+
+    def offensive(self, n):
+        words = self._filler(max(n - 2, 1))
+        extra = [self.random.choice(self.harmful)]
+        if self.random.random() < 0.3:
+            extra.append(self.random.choice(self.data["politics"]))
+        return self._insert(words, extra)
+
+    def directional(self, n):
+        words = self._filler(max(n - 3, 1))
+        pronouns = self.random.choice(
+            [self.data["pronouns_self"], self.data["pronouns_other"]]
+        )
+        extra = [
+            self.random.choice(pronouns),
+            self.random.choice(self.data["aux_verbs"]),
+            self.random.choice(self.harmful),
+        ]
+        return words[:len(words) // 2] + extra + words[len(words) // 2:]
+
+    def markup(self, n):
+        words = self._filler(n)
+        extra = [
+            self.random.choice(MARKUP).format(self.random.choice(self.filler)),
+            self.random.choice(MENTIONS),
+            self.random.choice(HASHTAGS),
+            self.random.choice(URLS),
+            self.random.choice(EMOTICONS),
+            self.random.choice(EMOJIS),
+        ]
+        return self._insert(words, extra)
+
+    def formula(self, n):
+        words = self._filler(n)
+        extra = [self.random.choice(FORMULAS) for _ in range(1 + n // 40)]
+        return self._insert(words, extra)
+
+    # -------------------
+    # Public API
+    # -------------------
+    def post(self, kind, length="medium"):
+        """Returns one synthetic post of the given kind and length profile."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown post kind: {kind}")
+        words = getattr(self, kind)(self._length(length))
+        return " ".join(words)
+
+    def corpus(self, size, kinds=KINDS, lengths=tuple(LENGTHS)):
+        """
+        Returns a list of (kind, length, text) tuples, cycling through
+        every kind and length profile so the mix is balanced.
+        """
+        posts = []
+        combos = [(k, l) for k in kinds for l in lengths]
+        for i in range(size):
+            kind, length = combos[i % len(combos)]
+            posts.append((kind, length, self.post(kind, length)))
+        return posts
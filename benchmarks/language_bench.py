@@ -0,0 +1,162 @@
+"""
+Per-post latency with every language merged into one lexicon vs routed to per-language partitions.
+
+    python -m benchmarks.language_bench --languages 1 2 4 8 --posts 400
+
+keywords.json is the English partition. Every further language gets a
+partition of the same size made of deterministic pseudo-words, plus its
+stopwords (PROFILES for es/fr/de/it/pt, pseudo-words for the rest). Posts
+are spread evenly over the languages and mix stopwords, keywords and
+filler of their language. With `merged` every post is scanned against the
+terms of all languages; with `routed` LanguageGuesser picks one or two
+partitions per post. `routed_ok` is the share of posts whose partitions
+include their real language.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from src.language import PROFILES
+from src.lexicon import CATEGORIES, SHARED_CATEGORIES, Lexicon
+from src.pipeline import TextPipeline
+
+LANGUAGES = (1, 2, 4, 8)
+SYLLABLES = ("ka", "zu", "mo", "ri", "ven", "tal", "bor", "qui", "nex", "dal", "fo", "sha", "gri", "pel")
+
+
+def pseudo_word(rng, syllables=3):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+
+def language_codes(n):
+    """en first, then the built-in profiles, then synthetic codes."""
+    builtin = [code for code in PROFILES if code != "en"]
+    return ["en"] + (builtin + [f"x{i}" for i in range(n)])[:n - 1]
+
+
+def multilingual_data(n, seed=0):
+    """keywords.json plus n-1 synthetic partitions of the same size."""
+    base = Lexicon.from_file()
+    rng = random.Random(seed)
+    data = {key: list(base.data[key]) for key in CATEGORIES}
+    data["languages"] = {}
+    for code in language_codes(n)[1:]:
+        part = {}
+        for key in CATEGORIES:
+            if key in SHARED_CATEGORIES:
+                continue
+            phrase = key in ("spamwords", "fakeclaims")
+            part[key] = [
+                " ".join(pseudo_word(rng) for _ in range(2)) if phrase else pseudo_word(rng)
+                for _ in base.data[key]
+            ]
+        if code not in PROFILES:
+            part["stopwords"] = [pseudo_word(rng, 2) for _ in range(25)]
+        data["languages"][code] = part
+    return data
+
+
+def posts(lexicon, count, seed=0):
+    """(language, text) pairs, languages in turn."""
+    rng = random.Random(seed)
+    english = CorpusGenerator(seed=seed)
+    filler = {code: [pseudo_word(rng) for _ in range(60)] for code in lexicon.languages}
+    out = []
+    for i in range(count):
+        code = lexicon.languages[i % len(lexicon.languages)]
+        if code == "en":
+            out.append((code, english.post(english.random.choice(("clean", "spam", "offensive")))))
+            continue
+        part = lexicon.partitions[code]
+        stopwords = part.get("stopwords") or PROFILES[code]["stopwords"].split()
+        words = []
+        for _ in range(rng.randint(20, 60)):
+            r = rng.random()
+            if r < 0.35:
+                words.append(rng.choice(stopwords))
+            elif r < 0.45:
+                words.append(rng.choice(part[rng.choice(("badwords", "violence", "spamwords"))]))
+            else:
+                words.append(rng.choice(filler[code]))
+        out.append((code, " ".join(words)))
+    return out
+
+
+def measure(pipeline, texts, repeat):
+    """Per-post classify latency in µs (best of `repeat` per post)."""
+    latencies = []
+    for text in texts:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pipeline.classify(text)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        latencies.append(best * 1e6)
+    return latencies
+
+
+def run_benchmark(languages=LANGUAGES, count=400, repeat=3, seed=0):
+    results = []
+    for n in languages:
+        lexicon = Lexicon(multilingual_data(n, seed))
+        sample = posts(lexicon, count, seed)
+        texts = [text for _, text in sample]
+        row = {"languages": n, "terms": sum(len(v) for v in lexicon.categories.values())}
+        for mode, route in (("merged", False), ("routed", True)):
+            # No word cache: every word pays for the terms it is checked against
+            pipeline = TextPipeline(lexicon=lexicon, word_cache_size=0, route_languages=route)
+            pipeline.classify_batch(texts[:20])  # build the partitions first
+            latencies = measure(pipeline, texts, repeat)
+            row[mode] = {
+                "mean_us": statistics.fmean(latencies),
+                "p50_us": statistics.median(latencies),
+                "p95_us": statistics.quantiles(latencies, n=20)[18],
+            }
+            if route:
+                guesser = pipeline.stages.language_guesser
+                hits = [guesser is None or code in guesser.guess(text) for code, text in sample]
+                row["routed_ok"] = sum(hits) / len(hits)
+        row["speedup"] = row["merged"]["mean_us"] / row["routed"]["mean_us"]
+        results.append(row)
+    return {"results": results, "meta": {"posts": count, "repeat": repeat, "seed": seed}}
+
+
+def format_report(report):
+    lines = [
+        f"{'languages':>10}{'terms':>8}{'merged µs':>11}{'routed µs':>11}"
+        f"{'merged p95':>12}{'routed p95':>12}{'speedup':>9}{'routed ok':>11}"
+    ]
+    for r in report["results"]:
+        lines.append(
+            f"{r['languages']:>10}{r['terms']:>8}{r['merged']['mean_us']:>11.0f}{r['routed']['mean_us']:>11.0f}"
+            f"{r['merged']['p95_us']:>12.0f}{r['routed']['p95_us']:>12.0f}{r['speedup']:>8.2f}x"
+            f"{r['routed_ok']:>11.1%}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--languages", type=int, nargs="+", default=list(LANGUAGES))
+    parser.add_argument("--posts", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.languages, args.posts, args.repeat, args.seed)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Local load generator for the Flask app in app.py.
+
+    python -m benchmarks.loadtest --start-server --route api --concurrency 8 --rate 200 --duration 30
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --server-pid 4242 --input posts.jsonl
+"""
+import argparse
+import itertools
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.pipeline_bench import percentile
+
+ROOT = Path(__file__).parent.parent
+
+
+# -------------------
+# Inputs
+# -------------------
+def load_texts(path=None, size=2000, seed=0):
+    """
+    Post texts used as request bodies: a recorded JSONL file (one JSON
+    string or {"text": ...} object per line) or a synthetic corpus.
+    """
+    if path is None:
+        return [text for _, _, text in CorpusGenerator(seed=seed).corpus(size)]
+
+    texts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            texts.append(record["text"] if isinstance(record, dict) else record)
+    if not texts:
+        raise ValueError(f"No posts found in {path}")
+    return texts
+
+
+def build_request(base_url, route, text):
+    if route == "form":
+        body = urllib.parse.urlencode({"user_text": text}).encode("utf-8")
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        return urllib.request.Request(base_url + "/", data=body, headers=headers)
+    if route == "api":
+        body = json.dumps({"text": text}).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        return urllib.request.Request(base_url + "/api/moderate", data=body, headers=headers)
+    raise ValueError(f"Unknown route: {route}")
+
+
+# -------------------
+# Local server
+# -------------------
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, command=None):
+    """Starts app.py with the Flask CLI (threaded, no reloader) on localhost."""
+    command = command or [
+        sys.executable, "-m", "flask", "--app", "app", "run",
+        "--host", "127.0.0.1", "--port", str(port), "--no-reload",
+    ]
+    return subprocess.Popen(
+        command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_until_ready(base_url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/", timeout=1):
+                return
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    raise TimeoutError(f"Server at {base_url} did not start in {timeout}s")
+
+
+# -------------------
+# Server memory
+# -------------------
+def read_rss_kb(pid):
+    """Resident set size of a process in KiB (Linux /proc, `ps` elsewhere)."""
+    status = Path(f"/proc/{pid}/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+        return None
+    out = subprocess.run(["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True)
+    return int(out.stdout.strip()) if out.stdout.strip() else None
+
+
+class RssSampler(threading.Thread):
+    """Samples the server RSS every `interval` seconds until stopped."""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        start = time.monotonic()
+        while not self._stop_event.is_set():
+            rss = read_rss_kb(self.pid)
+            if rss is not None:
+                self.samples.append((round(time.monotonic() - start, 2), rss))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# -------------------
+# Load generation
+# -------------------
+def latency_summary(latencies):
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": percentile(values, 50) * 1000,
+        "p90_ms": percentile(values, 90) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0,
+    }
+
+
+def run_load(base_url, texts, routes=("api",), concurrency=8, rate=0.0,
+             duration=10.0, total=None, timeout=30.0):
+    """
+    Drives the server from `concurrency` threads.
+
+    With rate > 0 the load is open-loop: request i is due at start + i / rate
+    and its latency is measured from that due time, so queueing inside the
+    server shows up in the tail instead of silently lowering the rate.
+    With rate == 0 every thread sends back-to-back (closed loop).
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = {route: [] for route in routes}
+    errors = {}
+    clock = time.perf_counter
+    start = clock()
+    end = start + duration
+
+    def worker():
+        while True:
+            i = next(counter)
+            if total is not None and i >= total:
+                return
+            due = start + i / rate if rate else clock()
+            if due >= end:
+                return
+            delay = due - clock()
+            if delay > 0:
+                time.sleep(delay)
+
+            route = routes[i % len(routes)]
+            req = build_request(base_url, route, texts[i % len(texts)])
+            try:
+                with urllib.request.urlopen(req, timeout=timeout) as resp:
+                    resp.read()
+                error = None
+            except urllib.error.HTTPError as e:
+                error = f"HTTP {e.code}"
+            except (urllib.error.URLError, OSError) as e:
+                error = type(e).__name__
+            elapsed = clock() - due
+
+            with lock:
+                if error is None:
+                    latencies[route].append(elapsed)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = clock() - start
+
+    ok = sum(len(v) for v in latencies.values())
+    failed = sum(errors.values())
+    return {
+        "requests": ok + failed,
+        "ok": ok,
+        "errors": errors,
+        "error_rate": failed / (ok + failed) if ok + failed else 0.0,
+        "elapsed_s": elapsed,
+        "throughput": ok / elapsed if elapsed else 0.0,
+        "latency": latency_summary([x for v in latencies.values() for x in v]),
+        "routes": {route: latency_summary(v) for route, v in latencies.items()},
+    }
+
+
+def format_report(report):
+    lat = report["latency"]
+    lines = [
+        f"requests   {report['requests']} ({report['ok']} ok, error rate {report['error_rate']:.2%})",
+        f"throughput {report['throughput']:.1f} req/s over {report['elapsed_s']:.1f}s",
+        f"latency    p50 {lat['p50_ms']:.1f}  p90 {lat['p90_ms']:.1f}  p95 {lat['p95_ms']:.1f}"
+        f"  p99 {lat['p99_ms']:.1f}  max {lat['max_ms']:.1f} ms",
+    ]
+    for error, count in report["errors"].items():
+        lines.append(f"error      {error}: {count}")
+    rss = report.get("rss_kb")
+    if rss:
+        values = [kb for _, kb in rss]
+        lines.append(
+            f"server rss start {values[0] / 1024:.1f}  peak {max(values) / 1024:.1f}"
+            f"  end {values[-1] / 1024:.1f} MiB ({len(values)} samples)"
+        )
+    return "\n".join(lines)
+
+
+# -------------------
+# Command line
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="base URL of an already running local server")
+    target.add_argument("--start-server", action="store_true", help="start app.py on a free port")
+    parser.add_argument("--server-pid", type=int, help="PID to sample RSS from when using --url")
+    parser.add_argument("--route", choices=["form", "api", "both"], default="api")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="requests/s, 0 = as fast as possible")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--input", help="JSONL file of recorded post texts (replay mode)")
+    parser.add_argument("--size", type=int, default=2000, help="synthetic posts when no --input")
+    parser.add_argument("--rss-interval", type=float, default=0.5)
+    parser.add_argument("--out", help="save the JSON report here")
+    args = parser.parse_args(argv)
+
+    texts = load_texts(args.input, args.size)
+    routes = ("form", "api") if args.route == "both" else (args.route,)
+
+    server = None
+    pid = args.server_pid
+    base_url = (args.url or "").rstrip("/")
+    if args.start_server:
+        port = free_port()
+        server = start_server(port)
+        pid = server.pid
+        base_url = f"http://127.0.0.1:{port}"
+
+    sampler = None
+    try:
+        wait_until_ready(base_url)
+        if pid:
+            sampler = RssSampler(pid, args.rss_interval)
+            sampler.start()
+        report = run_load(
+            base_url, texts, routes, args.concurrency, args.rate,
+            args.duration, args.requests,
+        )
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.terminate()
+            server.wait()
+
+    report["rss_kb"] = sampler.samples if sampler else []
+    report["config"] = {
+        "routes": routes,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "duration": args.duration,
+        "input": args.input or f"synthetic:{args.size}",
+    }
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Throughput and latency benchmark for every stage of TextPipeline.
+
+    python -m benchmarks.pipeline_bench run --size 3000 --out baseline.json
+    python -m benchmarks.pipeline_bench compare baseline.json current.json --threshold 0.10
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from src.pipeline import TextPipeline
+from src.post_processor import transform_post
+
+# Metrics checked by `compare`; True means "higher is better"
+COMPARED_METRICS = {
+    "throughput": True,
+    "p50_ms": False,
+    "p95_ms": False,
+}
+
+
+# -------------------
+# Statistics
+# -------------------
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(durations):
+    """Turns a list of durations (seconds) into the reported figures."""
+    values = sorted(durations)
+    total = sum(values)
+    return {
+        "posts": len(values),
+        "throughput": len(values) / total if total else 0.0,
+        "mean_ms": total / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+
+# -------------------
+# Measurement
+# -------------------
+def pipeline_stages(pipeline):
+    """Callables measured in isolation, keyed by stage name."""
+    return {
+        "tokenize": pipeline.tokenizer.tokenize,
+        "spam_dfa": pipeline.spam_dfa.process_text,
+        "content_dfa": pipeline.content_dfa.process_text,
+        "censorship": pipeline.censorship_fst.process_text,
+        "transform_post": transform_post,
+        "classify": pipeline.classify,
+        # run() is lazy: reading the rendered text forces every step
+        "end_to_end": lambda text: pipeline.run(text)["final"]["text"],
+    }
+
+
+def time_stage(func, texts, repeat=1):
+    durations = []
+    clock = time.perf_counter
+    for text in texts:
+        best = None
+        for _ in range(repeat):
+            start = clock()
+            func(text)
+            elapsed = clock() - start
+            best = elapsed if best is None else min(best, elapsed)
+        durations.append(best)
+    return durations
+
+
+def run_benchmark(size=3000, seed=0, repeat=1, warmup=200, pipeline=None):
+    pipeline = pipeline or TextPipeline()
+    corpus = CorpusGenerator(seed=seed).corpus(size)
+    texts = [text for _, _, text in corpus]
+
+    stages = pipeline_stages(pipeline)
+    for func in stages.values():
+        for text in texts[:warmup]:
+            func(text)
+
+    report = {"stages": {}, "kinds": {}}
+    for name, func in stages.items():
+        durations = time_stage(func, texts, repeat)
+        report["stages"][name] = summarize(durations)
+        if name == "end_to_end":
+            by_kind = {}
+            for (kind, _, _), d in zip(corpus, durations):
+                by_kind.setdefault(kind, []).append(d)
+            report["kinds"] = {k: summarize(v) for k, v in by_kind.items()}
+
+    report["meta"] = {
+        "size": size,
+        "seed": seed,
+        "repeat": repeat,
+        "bytes": sum(len(t.encode("utf-8")) for t in texts),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    return report
+
+
+# -------------------
+# Comparison
+# -------------------
+def compare(baseline, current, threshold=0.10):
+    """
+    Returns the list of regressions between two reports: every metric
+    in COMPARED_METRICS that got worse by more than `threshold` (relative).
+    """
+    regressions = []
+    for stage, base in baseline["stages"].items():
+        cur = current["stages"].get(stage)
+        if cur is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base[metric], cur[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append({
+                    "stage": stage,
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "change": change,
+                })
+    return regressions
+
+
+def format_report(report):
+    lines = [f"{'stage':<16}{'posts/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for section in ("stages", "kinds"):
+        for name, s in report[section].items():
+            label = name if section == "stages" else f"  e2e:{name}"
+            lines.append(
+                f"{label:<16}{s['throughput']:>12.0f}{s['p50_ms']:>10.3f}"
+                f"{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+            )
+    return "\n".join(lines)
+
+
+# -------------------
+# Command line
+# -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_p = sub.add_parser("run", help="benchmark the pipeline and save a JSON report")
+    run_p.add_argument("--size", type=int, default=3000)
+    run_p.add_argument("--seed", type=int, default=0)
+    run_p.add_argument("--repeat", type=int, default=1)
+    run_p.add_argument("--out", default="bench_results.json")
+
+    cmp_p = sub.add_parser("compare", help="flag regressions against a baseline")
+    cmp_p.add_argument("baseline")
+    cmp_p.add_argument("current")
+    cmp_p.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_benchmark(args.size, args.seed, args.repeat)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(format_report(report))
+        print(f"\nSaved to {args.out}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    regressions = compare(baseline, current, args.threshold)
+    for r in regressions:
+        print(
+            f"REGRESSION {r['stage']}.{r['metric']}: "
+            f"{r['baseline']:.3f} -> {r['current']:.3f} ({r['change']:+.1%})"
+        )
+    if not regressions:
+        print(f"No regressions above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Per-post latency of run() with and without the clean-post prefilter, for several shares of clean traffic.
+
+    python -m benchmarks.prefilter_bench --clean-shares 0.5 0.8 0.95 --posts 400
+
+Clean posts come from CorpusGenerator("clean"), the rest cycle through the
+other kinds. Each post is run to its final result (rendering included),
+best of `repeat`. `cleared` is the share of posts the prefilter clears;
+`overhead_us` is the mean cost of the prefilter scan on the posts it does
+not clear, paid on top of the full pipeline.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.corpus import KINDS, CorpusGenerator
+from src.pipeline import TextPipeline
+
+CLEAN_SHARES = (0.5, 0.8, 0.95)
+
+
+def mixed_posts(count, clean_share, seed=0):
+    """count posts, clean_share of them clean, in random order."""
+    gen = CorpusGenerator(seed=seed)
+    rng = random.Random(seed)
+    others = [kind for kind in KINDS if kind != "clean"]
+    n_clean = round(count * clean_share)
+    texts = [gen.post("clean", rng.choice(("short", "medium"))) for _ in range(n_clean)]
+    texts += [gen.post(others[i % len(others)], rng.choice(("short", "medium"))) for i in range(count - n_clean)]
+    rng.shuffle(texts)
+    return texts
+
+
+def measure(pipeline, texts, repeat):
+    """Per-post run() latency in µs, final result included (best of `repeat` per post)."""
+    latencies = []
+    for text in texts:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pipeline.run(text)["final"].to_dict()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        latencies.append(best * 1e6)
+    return latencies
+
+
+def summary(latencies):
+    ordered = sorted(latencies)
+    return {
+        "mean_us": statistics.fmean(ordered),
+        "p50_us": ordered[len(ordered) // 2],
+        "p95_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def run_benchmark(clean_shares=CLEAN_SHARES, count=400, repeat=3, seed=0):
+    full, filtered = TextPipeline(prefilter=False), TextPipeline()
+    prefilter = filtered.stages.prefilter
+    results = []
+    for share in clean_shares:
+        texts = mixed_posts(count, share, seed)
+        cleared = [prefilter.clear(text) for text in texts]
+        rejected = [text for text, ok in zip(texts, cleared) if not ok]
+        start = time.perf_counter()
+        for text in rejected:
+            prefilter.clear(text)
+        overhead = (time.perf_counter() - start) / max(len(rejected), 1) * 1e6
+        row = {
+            "clean_share": share,
+            "cleared": sum(cleared) / len(texts),
+            "off": summary(measure(full, texts, repeat)),
+            "on": summary(measure(filtered, texts, repeat)),
+            "overhead_us": overhead,
+        }
+        row["speedup"] = row["off"]["mean_us"] / row["on"]["mean_us"]
+        results.append(row)
+    return {"results": results, "meta": {"posts": count, "repeat": repeat, "seed": seed}}
+
+
+def format_report(report):
+    lines = [
+        f"{'clean':>7}{'cleared':>9}{'off µs':>9}{'on µs':>9}{'off p95':>9}{'on p95':>9}"
+        f"{'speedup':>9}{'overhead µs':>13}"
+    ]
+    for r in report["results"]:
+        lines.append(
+            f"{r['clean_share']:>7.0%}{r['cleared']:>9.1%}{r['off']['mean_us']:>9.0f}{r['on']['mean_us']:>9.0f}"
+            f"{r['off']['p95_us']:>9.0f}{r['on']['p95_us']:>9.0f}{r['speedup']:>8.2f}x{r['overhead_us']:>13.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clean-shares", type=float, nargs="+", default=list(CLEAN_SHARES))
+    parser.add_argument("--posts", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.clean_shares, args.posts, args.repeat, args.seed)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
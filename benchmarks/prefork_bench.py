@@ -0,0 +1,166 @@
+"""
+Total memory of N forked workers: a pipeline per worker vs one shared by copy-on-write.
+
+    python -m benchmarks.prefork_bench --workers 1 2 4 8 --requests 200
+
+Linux only (os.fork and /proc/<pid>/smaps_rollup). Every mode runs in a
+fresh interpreter so nothing is imported before it decides to:
+
+- per_worker: the master only forks; each worker imports app.py and builds
+  its own TextPipeline (a pre-fork server without --preload).
+- shared: the master imports app.py once and forks (--preload).
+- frozen: same, with create_app(prefork=True): warm-up plus gc.freeze().
+
+Each worker then serves `requests` posts of the synthetic corpus through
+the Flask test client, and the PSS of master plus workers is summed. PSS
+charges every shared page to its processes in equal parts, so the sum is
+the real footprint of the whole server.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+MODES = ("per_worker", "shared", "frozen")
+WORKERS = (1, 2, 4, 8)
+
+
+def memory(pid="self"):
+    """Rss, Pss and USS (private clean + dirty) of a process, in kB."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[key] = int(value.split()[0])
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def serve(app, requests, seed):
+    """The worker's share of traffic: form and API posts of the synthetic corpus."""
+    from benchmarks.corpus import CorpusGenerator
+
+    client = app.test_client()
+    for i, (_, _, text) in enumerate(CorpusGenerator(seed=seed).corpus(requests)):
+        if i % 2:
+            client.post("/api/moderate", json={"text": text})
+        else:
+            client.post("/", data={"user_text": text})
+
+
+def run_mode(mode, workers, requests):
+    """Forks the workers of one mode and measures them. Runs in its own interpreter."""
+    app = None
+    if mode != "per_worker":
+        os.environ["PREFORK"] = "1" if mode == "frozen" else "0"
+        import app as app_module
+        app = app_module.app
+
+    children = []
+    for seed in range(workers):
+        ready_r, ready_w = os.pipe()
+        release_r, release_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(ready_r)
+                os.close(release_w)
+                if app is None:
+                    import app as app_module
+                    worker_app = app_module.app
+                else:
+                    worker_app = app
+                serve(worker_app, requests, seed)
+                os.write(ready_w, b"1")
+                os.read(release_r, 1)  # stay alive until the master has measured
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        os.close(release_r)
+        children.append((pid, ready_r, release_w))
+
+    for _, ready_r, _ in children:
+        if os.read(ready_r, 1) != b"1":
+            raise RuntimeError(f"a worker failed in mode {mode}")
+    master = memory()
+    worker_memory = [memory(pid) for pid, _, _ in children]
+    for pid, ready_r, release_w in children:
+        os.write(release_w, b"1")
+        os.close(release_w)
+        os.close(ready_r)
+        os.waitpid(pid, 0)
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "master_pss_kb": master["pss"],
+        "total_pss_kb": master["pss"] + sum(m["pss"] for m in worker_memory),
+        "total_rss_kb": master["rss"] + sum(m["rss"] for m in worker_memory),
+        "worker_uss_kb": sum(m["uss"] for m in worker_memory) / workers,
+    }
+
+
+def measure(mode, workers, requests):
+    """run_mode in a fresh interpreter."""
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.prefork_bench", "--mode", mode,
+         "--workers", str(workers), "--requests", str(requests)],
+        check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run_benchmark(workers=WORKERS, requests=200, modes=MODES):
+    results = [measure(mode, n, requests) for n in workers for mode in modes]
+    baseline = {r["workers"]: r["total_pss_kb"] for r in results if r["mode"] == "per_worker"}
+    for r in results:
+        base = baseline.get(r["workers"])
+        r["saving"] = 1 - r["total_pss_kb"] / base if base else None
+    return {"results": results, "meta": {"requests": requests}}
+
+
+def format_report(report):
+    lines = [f"{'workers':>8}{'mode':>12}{'total PSS MB':>14}{'total RSS MB':>14}{'worker USS MB':>15}{'saving':>9}"]
+    for r in report["results"]:
+        saving = "" if r["saving"] is None else f"{r['saving']:.0%}"
+        lines.append(
+            f"{r['workers']:>8}{r['mode']:>12}{r['total_pss_kb'] / 1024:>14.1f}"
+            f"{r['total_rss_kb'] / 1024:>14.1f}{r['worker_uss_kb'] / 1024:>15.1f}{saving:>9}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=list(WORKERS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        # Internal: one measurement, printed as JSON for measure()
+        print(json.dumps(run_mode(args.mode, args.workers[0], args.requests)))
+        return 0
+
+    report = run_benchmark(args.workers, args.requests, args.modes)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Re-moderation after a lexicon change: every archived post vs the posts the PostIndex finds.
+
+    python -m benchmarks.remoderation_bench --posts 2000 10000 50000
+
+For each archive size, corpus posts (every kind) are classified with
+keywords.json and stored in a fresh PostIndex (`index_us` per post,
+`index_mb` on disk). A fixed number of them (`--marked`) also contain a
+new pseudo-word. The new lexicon adds that word to badwords. `full_s`
+classifies the whole archive again with classify_batch. `targeted_s` is
+TextPipeline.remoderate(): the diff, the index lookup and the
+re-classification of the affected posts only.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from src.lexicon import Lexicon
+from src.pipeline import TextPipeline
+from src.post_index import PostIndex
+
+SIZES = (2000, 10_000, 50_000)
+NEW_TERM = "zorblax"
+
+
+def archive(count, marked=50, seed=0):
+    """count corpus posts; `marked` of them with NEW_TERM slipped in."""
+    rng = random.Random(seed)
+    texts = [text for _, _, text in CorpusGenerator(seed=seed).corpus(count)]
+    for i in rng.sample(range(count), min(marked, count)):
+        words = texts[i].split()
+        words.insert(rng.randrange(len(words) + 1), NEW_TERM)
+        texts[i] = " ".join(words)
+    return texts
+
+
+def run_benchmark(sizes=SIZES, marked=50, seed=0):
+    old = Lexicon.from_file()
+    data = json.loads(json.dumps(old.data))
+    data["badwords"].append(NEW_TERM)
+    new = Lexicon(data)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            texts = archive(size, marked, seed)
+            ids = [f"post{i}" for i in range(size)]
+            verdicts = TextPipeline(lexicon=old).classify_batch(texts)
+
+            path = os.path.join(tmp, f"posts-{size}.db")
+            index = PostIndex(path, batch_size=1000)
+            index.set_baseline(old)
+            start = time.perf_counter()
+            index.put_many(
+                [(i, t, v["spam_state"], v["content_state"]) for i, t, v in zip(ids, texts, verdicts)],
+                old.version,
+            )
+            index.flush()
+            index_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            TextPipeline(lexicon=new).classify_batch(texts)
+            full_s = time.perf_counter() - start
+
+            report = TextPipeline(lexicon=new, post_index=index).remoderate()
+            results.append({
+                "posts": size,
+                "affected": report["affected"],
+                "changed": report["changed"],
+                "index_us": index_s / size * 1e6,
+                "index_mb": index.stats()["bytes"] / 2 ** 20,
+                "full_s": full_s,
+                "targeted_s": report["seconds"],
+                "speedup": full_s / report["seconds"],
+            })
+            index.close()
+    return {"results": results, "meta": {"marked": marked, "seed": seed, "term": NEW_TERM}}
+
+
+def format_report(report):
+    lines = [
+        f"{'posts':>8}{'affected':>10}{'changed':>9}{'index µs':>10}{'index MB':>10}"
+        f"{'full s':>9}{'targeted s':>12}{'speedup':>10}"
+    ]
+    for r in report["results"]:
+        lines.append(
+            f"{r['posts']:>8}{r['affected']:>10}{r['changed']:>9}{r['index_us']:>10.0f}{r['index_mb']:>10.1f}"
+            f"{r['full_s']:>9.2f}{r['targeted_s']:>12.3f}{r['speedup']:>9.0f}x"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--marked", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.posts, args.marked, args.seed)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
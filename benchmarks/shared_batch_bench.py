@@ -0,0 +1,120 @@
+"""
+Process-pool batch moderation: texts and results pickled through pipes vs one shared memory segment.
+
+    python -m benchmarks.shared_batch_bench --post-kb 1 16 64 --batch-mb 8 --workers 4
+
+Linux only (fork). For each post size, a batch of about `batch_mb` MB of
+corpus text (posts of every kind joined up to the size) goes through a
+BatchPool with each transport, best of `repeat` after a warm-up batch:
+
+- `*_ipc_ms`: transport only. The results are computed once up front and
+  the forked workers look them up instead of moderating, so both paths
+  move the same texts and the same results and nothing else differs.
+- `*_s`: the whole classify_batch call, moderation included.
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from src import shared_batch
+from src.shared_batch import TRANSPORTS, BatchPool
+
+# Results the workers of a transport-only pool return, by text; filled before the fork
+KNOWN = {}
+
+POST_KB = (1, 16, 64)
+
+
+def large_posts(count, kb, seed=0):
+    """count posts of about kb KB each, made of corpus posts of every kind."""
+    corpus = [text for _, _, text in CorpusGenerator(seed=seed).corpus(2000)]
+    posts, i = [], 0
+    for _ in range(count):
+        parts, size = [], 0
+        while size < kb * 1024:
+            parts.append(corpus[i % len(corpus)])
+            size += len(parts[-1]) + 1
+            i += 1
+        posts.append(" ".join(parts))
+    return posts
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def known_results(texts):
+    return [KNOWN[text] for text in texts]
+
+
+def transport_only(texts, workers, transport, repeat):
+    """Best classify_batch time of a pool whose workers look the results up instead of moderating."""
+    moderate, shared_batch._moderate = shared_batch._moderate, known_results
+    try:
+        with BatchPool(workers, transport=transport, context="fork") as pool:
+            pool.classify_batch(texts)
+            return best_time(lambda: pool.classify_batch(texts), repeat)
+    finally:
+        shared_batch._moderate = moderate
+
+
+def run_benchmark(post_kb=POST_KB, batch_mb=8, workers=4, repeat=3, seed=0):
+    shared_batch._init_worker({})
+    results = []
+    for kb in post_kb:
+        texts = large_posts(max(1, int(batch_mb * 1024 / kb)), kb, seed)
+        KNOWN.clear()
+        KNOWN.update(zip(texts, shared_batch._moderate(texts)))
+        row = {"post_kb": kb, "posts": len(texts)}
+        for transport in TRANSPORTS:
+            row[f"{transport}_ipc_ms"] = transport_only(texts, workers, transport, repeat) * 1e3
+            with BatchPool(workers, transport=transport, context="fork") as pool:
+                pool.classify_batch(texts)
+                row[f"{transport}_s"] = best_time(lambda: pool.classify_batch(texts), repeat)
+        row["ipc_speedup"] = row["pickle_ipc_ms"] / row["shared_ipc_ms"]
+        results.append(row)
+    return {"results": results, "meta": {"batch_mb": batch_mb, "workers": workers, "repeat": repeat, "seed": seed}}
+
+
+def format_report(report):
+    lines = [
+        f"{'post KB':>8}{'posts':>7}{'pickle ipc ms':>15}{'shared ipc ms':>15}{'speedup':>9}"
+        f"{'pickle s':>10}{'shared s':>10}"
+    ]
+    for r in report["results"]:
+        lines.append(
+            f"{r['post_kb']:>8}{r['posts']:>7}{r['pickle_ipc_ms']:>15.1f}{r['shared_ipc_ms']:>15.1f}"
+            f"{r['ipc_speedup']:>8.1f}x{r['pickle_s']:>10.2f}{r['shared_s']:>10.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--post-kb", type=int, nargs="+", default=list(POST_KB))
+    parser.add_argument("--batch-mb", type=float, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.post_kb, args.batch_mb, args.workers, args.repeat, args.seed)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
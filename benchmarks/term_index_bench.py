@@ -0,0 +1,229 @@
+"""
+Lookup speed and memory of bulk terms: Python sets per worker vs one memory-mapped TermIndex.
+
+    python -m benchmarks.term_index_bench --terms 10000 100000 1000000 --workers 4
+
+Linux only (os.fork and /proc/<pid>/smaps_rollup). For each size, a
+deterministic list of pseudo-terms (most of them badwords, the rest spread
+over the other single-word categories) is written as a TERMS file and
+compiled once with `build` (`build_s`, `file_mb`). Then, in a fresh
+interpreter per mode:
+
+- sets: the master parses the TERMS file into one set per category, as
+  Lexicon does with keywords.json. A word is classified by looking up
+  every one of its substrings, the fastest pure-Python way to match
+  substring categories against that many terms.
+- mmap: the master opens the trie file with TermIndex; nothing is parsed.
+
+The master then forks `workers` workers that each classify the same
+sample of words (corpus words, terms, and terms inside longer words), and
+the PSS of master plus workers is summed. `load_ms` is the master's
+startup, `lookup_us` the mean time per word in a worker.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.prefork_bench import memory
+from src.term_index import INDEX_CATEGORIES, SUBSTRING_COUNT, CATEGORY_KINDS, TermIndex, build, read_terms
+
+MODES = ("sets", "mmap")
+SIZES = (10_000, 100_000, 1_000_000)
+SYLLABLES = ("ka", "zu", "mo", "ri", "ven", "tal", "bor", "qui", "nex", "dal", "fo", "sha", "gri", "pel",
+             "dro", "lix", "mun", "tep", "wor", "yas")
+
+
+def synthetic_terms(count, seed=0):
+    """count distinct (category, term) pairs; terms of 3 to 5 syllables."""
+    rng = random.Random(seed)
+    weights = [60, 10, 10, 10] + [2] * (len(INDEX_CATEGORIES) - SUBSTRING_COUNT)
+    seen, terms = set(), []
+    while len(terms) < count:
+        term = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5)))
+        if rng.random() < 0.3:
+            term += str(rng.randint(0, 99))
+        if term not in seen:
+            seen.add(term)
+            terms.append((rng.choices(INDEX_CATEGORIES, weights)[0], term))
+    return terms
+
+
+def sample_words(terms, count=5000, seed=0):
+    """Corpus words, indexed terms and terms inside longer words, shuffled."""
+    rng = random.Random(seed)
+    gen = CorpusGenerator(seed=seed)
+    words = []
+    while len(words) < count // 2:
+        words += gen.post("clean").lower().split()
+    words = words[:count // 2]
+    picked = rng.sample(terms, min(count - len(words), len(terms)))
+    words += [t if i % 2 else "x" + t + "s" for i, (_, t) in enumerate(picked)]
+    rng.shuffle(words)
+    return words
+
+
+class SetLexicon:
+    """One set per category, parsed from the TERMS file (the `sets` baseline)."""
+
+    def __init__(self, path):
+        self.sets = {category: set() for category in INDEX_CATEGORIES}
+        for category, term in read_terms(path):
+            self.sets[category].add(term.lower())
+        self.substring = [(CATEGORY_KINDS[c], self.sets[c]) for c in INDEX_CATEGORIES[:SUBSTRING_COUNT]]
+        self.exact = [(CATEGORY_KINDS[c], self.sets[c]) for c in INDEX_CATEGORIES[SUBSTRING_COUNT:]]
+
+    def classify(self, word_lower):
+        n = len(word_lower)
+        substrings = {word_lower[i:j] for i in range(n) for j in range(i + 1, n + 1)}
+        for kind, terms in self.substring:
+            if not substrings.isdisjoint(terms):
+                return kind
+        for kind, terms in self.exact:
+            if word_lower in terms:
+                return kind
+        return None
+
+
+def run_mode(mode, terms_file, trie_file, workers, words):
+    """Loads one structure in the master, forks the workers and measures. Runs in its own interpreter."""
+    start = time.perf_counter()
+    matcher = SetLexicon(terms_file) if mode == "sets" else TermIndex(trie_file)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    children = []
+    for _ in range(workers):
+        ready_r, ready_w = os.pipe()
+        release_r, release_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(ready_r)
+                os.close(release_w)
+                start = time.perf_counter()
+                for word in words:
+                    matcher.classify(word)
+                elapsed = time.perf_counter() - start
+                os.write(ready_w, json.dumps(elapsed / len(words) * 1e6).encode() + b"\n")
+                os.read(release_r, 1)  # stay alive until the master has measured
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        os.close(release_r)
+        children.append((pid, ready_r, release_w))
+
+    lookups = []
+    for _, ready_r, _ in children:
+        line = b""
+        while not line.endswith(b"\n"):
+            chunk = os.read(ready_r, 64)
+            if not chunk:
+                raise RuntimeError(f"a worker failed in mode {mode}")
+            line += chunk
+        lookups.append(json.loads(line))
+    master = memory()
+    worker_memory = [memory(pid) for pid, _, _ in children]
+    for pid, ready_r, release_w in children:
+        os.write(release_w, b"1")
+        os.close(release_w)
+        os.close(ready_r)
+        os.waitpid(pid, 0)
+
+    return {
+        "mode": mode,
+        "load_ms": load_ms,
+        "lookup_us": sum(lookups) / len(lookups),
+        "master_rss_kb": master["rss"],
+        "total_pss_kb": master["pss"] + sum(m["pss"] for m in worker_memory),
+        "worker_uss_kb": sum(m["uss"] for m in worker_memory) / workers,
+    }
+
+
+def measure(mode, terms_file, trie_file, workers, words_file):
+    """run_mode in a fresh interpreter."""
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.term_index_bench", "--mode", mode, "--terms-file", terms_file,
+         "--trie-file", trie_file, "--workers", str(workers), "--words-file", words_file],
+        check=True, capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run_benchmark(sizes=SIZES, workers=4, words=5000, modes=MODES, seed=0):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            terms = synthetic_terms(size, seed)
+            terms_file = os.path.join(tmp, f"terms-{size}.tsv")
+            trie_file = os.path.join(tmp, f"terms-{size}.trie")
+            words_file = os.path.join(tmp, f"words-{size}.json")
+            with open(terms_file, "w", encoding="utf-8") as f:
+                f.writelines(f"{category}\t{term}\n" for category, term in terms)
+            with open(words_file, "w", encoding="utf-8") as f:
+                json.dump(sample_words(terms, words, seed), f)
+            start = time.perf_counter()
+            build(terms, trie_file)
+            build_s = time.perf_counter() - start
+            for mode in modes:
+                row = measure(mode, terms_file, trie_file, workers, words_file)
+                row.update(terms=size, workers=workers, build_s=build_s,
+                           file_mb=os.path.getsize(trie_file) / 2 ** 20)
+                results.append(row)
+    return {"results": results, "meta": {"workers": workers, "words": words, "seed": seed}}
+
+
+def format_report(report):
+    lines = [
+        f"{'terms':>9}{'mode':>6}{'load ms':>10}{'lookup µs':>11}{'total PSS MB':>14}"
+        f"{'worker USS MB':>15}{'file MB':>9}{'build s':>9}"
+    ]
+    for r in report["results"]:
+        lines.append(
+            f"{r['terms']:>9}{r['mode']:>6}{r['load_ms']:>10.1f}{r['lookup_us']:>11.1f}"
+            f"{r['total_pss_kb'] / 1024:>14.1f}{r['worker_uss_kb'] / 1024:>15.1f}"
+            f"{r['file_mb']:>9.1f}{r['build_s']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--terms", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--terms-file", help=argparse.SUPPRESS)
+    parser.add_argument("--trie-file", help=argparse.SUPPRESS)
+    parser.add_argument("--words-file", help=argparse.SUPPRESS)
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    if args.mode:
+        # Internal: one measurement, printed as JSON for measure()
+        with open(args.words_file, encoding="utf-8") as f:
+            words = json.load(f)
+        print(json.dumps(run_mode(args.mode, args.terms_file, args.trie_file, args.workers, words)))
+        return 0
+
+    report = run_benchmark(args.terms, args.workers, args.words, args.modes, args.seed)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Adversarial inputs for the tokenizer, CensorshipFST and transform_post: fails if time per byte grows with size.
+
+    python -m benchmarks.worst_case_bench --sizes 1000 4000 16000 64000 --tolerance 2.0
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+
+from src.pipeline import TextPipeline
+from src.post_processor import transform_post
+
+SIZES = (1_000, 4_000, 16_000, 64_000)
+TOLERANCE = 2.0
+
+
+def repeat_to(unit, size, prefix=""):
+    """prefix followed by as many whole copies of unit as fit in size characters."""
+    return prefix + unit * max(1, (size - len(prefix)) // len(unit))
+
+
+def phrase_prefixes(lexicon):
+    """Every spamword/fakeclaim without its last word: each one starts a match that fails."""
+    prefixes = [p.rsplit(" ", 1)[0] for p in lexicon.spamwords + lexicon.fakeclaims if " " in p]
+    return " ".join(prefixes) + " "
+
+
+def elongate(text):
+    return "".join(c * 3 if c.isalpha() else c for c in text)
+
+
+def worst_cases(lexicon):
+    """name -> function(size) returning a crafted input of about `size` characters."""
+    prefixes = phrase_prefixes(lexicon)
+    return {
+        # One huge word of a repeated letter: elongation patterns restarted at every position
+        "letter_run": lambda n: "a" * n,
+        "two_letter_runs": lambda n: "k" * (n // 2) + "i" * (n - n // 2),
+        "long_word": lambda n: repeat_to("abcdefghij", n),
+        # post.tx markers that never close, and many that do
+        "unterminated_markers": lambda n: repeat_to("word ", n, prefix="*a -b _c //d "),
+        "unterminated_marker_word": lambda n: repeat_to("a", n, prefix="*"),
+        "many_markers": lambda n: repeat_to("*a -b _c //d ", n),
+        "closed_markers": lambda n: repeat_to("*a* -b- _c_ //d// ", n),
+        # Unbalanced formulas force the re.split fallback
+        "dollar_runs": lambda n: repeat_to("$a ", n),
+        "unterminated_formula": lambda n: repeat_to("x + ", n, prefix="$"),
+        "long_formula": lambda n: "$" + repeat_to("x + ", n - 2) + "x$",
+        # Phrase matches that start everywhere and never complete
+        "phrase_prefixes": lambda n: repeat_to(prefixes, n),
+        "obfuscated_prefixes": lambda n: repeat_to(elongate(prefixes), n),
+        "leetspeak": lambda n: repeat_to("$h!t 5tup1d fr33 ", n),
+        # One parse-tree node per few bytes on a single line
+        "mentions_hashtags": lambda n: repeat_to("@a #b ", n),
+        "emoji_glued": lambda n: repeat_to("a\U0001F600", n),
+    }
+
+
+def stages(pipeline):
+    return {
+        "tokenize": pipeline.tokenizer.tokenize,
+        "censor": pipeline.censorship_fst.censor,
+        "transform": transform_post,
+    }
+
+
+def per_byte(func, text, repeat):
+    """Best of `repeat` runs, with the collector off as in timeit."""
+    best = None
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func(text)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        if enabled:
+            gc.enable()
+    return best / len(text)
+
+
+def run_benchmark(sizes=SIZES, tolerance=TOLERANCE, repeat=3, cases=None, pipeline=None):
+    """
+    Seconds per byte of every stage on every case and size. `growth` is the
+    per-byte time at the largest size over the smallest per-byte time seen
+    at a smaller size; a stage is linear when growth <= tolerance.
+    """
+    # No word cache: repeated words must be classified every time
+    pipeline = pipeline or TextPipeline(word_cache_size=0)
+    generators = worst_cases(pipeline.stages.lexicon)
+    results = []
+    for name in cases or generators:
+        texts = [generators[name](size) for size in sizes]
+        for stage, func in stages(pipeline).items():
+            timings = [per_byte(func, text, repeat) for text in texts]
+            growth = timings[-1] / min(timings[:-1]) if len(timings) > 1 else 1.0
+            results.append({
+                "case": name,
+                "stage": stage,
+                "us_per_byte": [t * 1e6 for t in timings],
+                "growth": growth,
+                "linear": growth <= tolerance,
+            })
+    return {
+        "results": results,
+        "linear": all(r["linear"] for r in results),
+        "meta": {"sizes": list(sizes), "tolerance": tolerance, "repeat": repeat},
+    }
+
+
+def format_report(report):
+    sizes = report["meta"]["sizes"]
+    lines = [f"{'case':<26}{'stage':<11}" + "".join(f"{s:>10}" for s in sizes) + f"{'growth':>9}"]
+    for r in report["results"]:
+        flag = "" if r["linear"] else "  <-- grows"
+        lines.append(
+            f"{r['case']:<26}{r['stage']:<11}"
+            + "".join(f"{t:>10.2f}" for t in r["us_per_byte"])
+            + f"{r['growth']:>8.2f}x{flag}"
+        )
+    lines.append(f"(µs per byte; tolerance {report['meta']['tolerance']}x)")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--cases", nargs="+")
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.tolerance, args.repeat, args.cases)
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved to {args.out}")
+    return 0 if report["linear"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
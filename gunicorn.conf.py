@@ -0,0 +1,21 @@
+# Servidor pre-fork: gunicorn -c gunicorn.conf.py
+#
+# The master imports app.py once (preload_app) with PREFORK=1, so
+# create_app() warms the pipeline up and calls gc.freeze() before the
+# workers are forked. Workers share the lexicon, the compiled regexes and
+# the textX metamodel with the master through copy-on-write.
+import os
+
+os.environ.setdefault("PREFORK", "1")
+
+wsgi_app = "app:app"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+
+
+def post_fork(server, worker):
+    # Los hilos no sobreviven al fork: cada worker vigila keywords.json por su cuenta
+    if os.environ.get("LEXICON_WATCH") == "1":
+        from app import app
+        app.extensions["pipeline"].watch_lexicon()
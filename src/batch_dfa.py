@@ -0,0 +1,136 @@
+import copy
+import itertools
+
+import numpy as np
+
+from src.session import collect_warnings
+
+# Every token kind RegexTokenizer emits, in column order; PAD never moves a state
+TOKEN_KINDS = (
+    "URL", "HASHTAG", "MENTION",
+    "BADWORD", "SEXWORD", "VIOLENCE", "POLITIC",
+    "PRONOUN_SELF", "PRONOUN_OTHER", "PRONOUN_GROUP", "PRONOUN", "AUX_VERB",
+    "SPAMWORD", "FAKECLAIM",
+    "EMOJI", "NEG_EMOJI", "WORD",
+)
+TOKEN_IDS = {kind: i for i, kind in enumerate(TOKEN_KINDS)}
+PAD = len(TOKEN_KINDS)
+
+
+def transition_table(dfa, tokens=TOKEN_KINDS):
+    """
+    Enumerates dfa.transition over every reachable state and every token,
+    starting from dfa.q0. Returns (states, table) where table[i, t] is the
+    index of the state reached from states[i] on token id t; the extra
+    last column (PAD) keeps the state.
+    """
+    dfa = copy.copy(dfa)
+    states, index, rows = [dfa.q0], {dfa.q0: 0}, []
+    i = 0
+    while i < len(states):
+        row = []
+        for tok in tokens:
+            dfa.state = states[i]
+            dfa.transition(tok)
+            if dfa.state not in index:
+                index[dfa.state] = len(states)
+                states.append(dfa.state)
+            row.append(index[dfa.state])
+        row.append(i)
+        rows.append(row)
+        i += 1
+    return states, np.array(rows, dtype=np.intp)
+
+
+class BatchDFA:
+    """
+    Runs SpamDFA, ContentDFA and DirectionalityDFA over a whole batch at
+    once. Token lists are encoded into a padded (posts x positions) matrix
+    of token IDs and every post advances with one fancy-indexing step per
+    position: state = T[state, tokens[:, i]]. The end-of-input mappings
+    are lookup tables too, so the final labels come out of one indexing
+    operation. The tables are enumerated from the scalar DFAs, so both
+    paths agree by construction.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        spam_dfa = stages.spam_dfa.fork()
+        content_dfa = stages.content_dfa.fork()
+
+        self.spam_states, self.spam_table = transition_table(spam_dfa)
+        self.content_states, self.content_table = transition_table(content_dfa)
+        self.direction_states, self.direction_table = transition_table(content_dfa.direction_dfa)
+
+        # Final labels: spam by state, content by (content state, direction state)
+        self.spam_final = np.empty(len(self.spam_states), dtype=object)
+        for i, state in enumerate(self.spam_states):
+            spam_dfa.state = state
+            self.spam_final[i] = spam_dfa.end_of_input()
+
+        self.content_final = np.empty((len(self.content_states), len(self.direction_states)), dtype=object)
+        for i, state in enumerate(self.content_states):
+            for j, direction in enumerate(self.direction_states):
+                content_dfa.state = state
+                content_dfa.direction_dfa.state = direction
+                self.content_final[i, j] = content_dfa.end_of_input()
+
+    @staticmethod
+    def encode(token_lists):
+        """
+        Padded int matrix of token IDs plus the length of every row.
+        Rows shorter than the longest one are filled with PAD.
+        """
+        lengths = np.fromiter(map(len, token_lists), dtype=np.intp, count=len(token_lists))
+        width = int(lengths.max()) if len(lengths) else 0
+        matrix = np.full((len(token_lists), width), PAD, dtype=np.uint8)
+        flat = np.fromiter(
+            map(TOKEN_IDS.__getitem__, itertools.chain.from_iterable(token_lists)),
+            dtype=np.uint8, count=int(lengths.sum()),
+        )
+        matrix[np.arange(width) < lengths[:, None]] = flat
+        return matrix, lengths
+
+    def run(self, token_lists):
+        """
+        Final (spam, content) labels for each token list, as two object
+        arrays. Rows are sorted by length so step i only touches the posts
+        that still have a token at position i.
+        """
+        matrix, lengths = self.encode(token_lists)
+        order = np.argsort(-lengths, kind="stable")
+        matrix, sorted_lengths = matrix[order], lengths[order]
+        # active[i]: number of posts with more than i tokens
+        active = np.searchsorted(-sorted_lengths, -np.arange(matrix.shape[1]), side="left")
+
+        n = len(token_lists)
+        spam = np.zeros(n, dtype=np.intp)
+        content = np.zeros(n, dtype=np.intp)
+        direction = np.zeros(n, dtype=np.intp)
+        for i in range(matrix.shape[1]):
+            k = active[i]
+            column = matrix[:k, i]
+            spam[:k] = self.spam_table[spam[:k], column]
+            content[:k] = self.content_table[content[:k], column]
+            direction[:k] = self.direction_table[direction[:k], column]
+
+        spam_labels = np.empty(n, dtype=object)
+        content_labels = np.empty(n, dtype=object)
+        spam_labels[order] = self.spam_final[spam]
+        content_labels[order] = self.content_final[content, direction]
+        return spam_labels, content_labels
+
+    def classify(self, texts):
+        """Same verdicts as TextPipeline.classify_batch, in input order."""
+        tokenize = self.stages.tokenizer.tokenize
+        spam_labels, content_labels = self.run([tokenize(text) for text in texts])
+        version = self.stages.version
+        return [
+            {
+                "spam_state": spam_state,
+                "content_state": content_state,
+                "dfa_warnings": collect_warnings(spam_state, content_state),
+                "lexicon_version": version,
+            }
+            for spam_state, content_state in zip(spam_labels.tolist(), content_labels.tolist())
+        ]
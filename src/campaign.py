@@ -0,0 +1,166 @@
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+_TOKEN = re.compile(r"\w+")
+_PRIME = (1 << 61) - 1
+
+
+class CampaignDetector:
+    """
+    Cross-post detector for spam campaigns: many slightly varied copies of
+    the same text posted within a short time.
+
+    Each post becomes a MinHash signature of its word shingles. Signatures
+    are split into `bands` LSH bands; two posts share a bucket in some band
+    with high probability when their Jaccard similarity is high. Only the
+    posts that share a bucket are compared, so lookup and insert cost
+    O(bands * max_bucket), independent of the window size.
+
+    Posts of fewer than `min_words` words ("thanks", "Happy birthday!")
+    are ignored: short stock replies repeat all day without being a
+    campaign, and have too few shingles to tell apart.
+
+    The window keeps the last `window` posts (and, with `max_age`, only
+    those seen in the last `max_age` seconds); older posts are evicted from
+    the index as new ones arrive, so memory stays capped.
+    """
+
+    def __init__(self, window=10_000, num_perm=64, bands=16, shingle_size=3,
+                 similarity=0.7, min_duplicates=3, max_age=None, max_bucket=64,
+                 seed=1, clock=time.monotonic, min_words=4):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.window = window
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.min_words = min_words
+        self.similarity = similarity
+        self.min_duplicates = min_duplicates
+        self.max_age = max_age
+        self.max_bucket = max_bucket
+        self.clock = clock
+
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)
+        ]
+
+        self.entries = OrderedDict()  # id -> (signature, band keys, timestamp)
+        self.buckets = {}             # band key -> [ids], oldest first
+        self.next_id = 0
+        self.flagged = 0
+        self._lock = threading.Lock()
+
+    # -------------------
+    # Signatures
+    # -------------------
+    def shingles(self, text):
+        """Word shingles of text; none for a text of fewer than min_words words."""
+        words = _TOKEN.findall(text.lower())
+        if len(words) < max(self.min_words, 1):
+            return set()
+        k = self.shingle_size
+        if len(words) <= k:
+            return {" ".join(words)} if words else set()
+        return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+    def signature(self, text):
+        """MinHash signature (tuple of num_perm ints), or None for a text too short to have one."""
+        hashes = [zlib.crc32(s.encode("utf-8")) for s in self.shingles(text)]
+        if not hashes:
+            return None
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self.permutations)
+
+    def band_keys(self, signature):
+        r = self.rows
+        return [hash((band, signature[band * r:(band + 1) * r])) for band in range(self.bands)]
+
+    @staticmethod
+    def estimate(sig_a, sig_b):
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(x == y for x, y in zip(sig_a, sig_b)) / len(sig_a)
+
+    # -------------------
+    # Window
+    # -------------------
+    def evict(self, now):
+        while self.entries:
+            oldest, (_, keys, seen) = next(iter(self.entries.items()))
+            expired = self.max_age is not None and now - seen > self.max_age
+            if len(self.entries) <= self.window and not expired:
+                return
+            del self.entries[oldest]
+            for key in keys:
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    continue
+                try:
+                    bucket.remove(oldest)
+                except ValueError:  # already pushed out of a full bucket
+                    pass
+                if not bucket:
+                    del self.buckets[key]
+
+    def near_duplicates(self, signature, keys):
+        candidates = set()
+        for key in keys:
+            candidates.update(self.buckets.get(key, ()))
+        return sum(
+            1 for c in candidates
+            if self.estimate(signature, self.entries[c][0]) >= self.similarity
+        )
+
+    def query(self, text):
+        """Near-duplicates of text in the window, without recording it."""
+        signature = self.signature(text)
+        if signature is None:
+            return 0
+        with self._lock:
+            self.evict(self.clock())
+            return self.near_duplicates(signature, self.band_keys(signature))
+
+    def observe(self, text):
+        """Counts the near-duplicates of text in the window, then records it."""
+        signature = self.signature(text)
+        if signature is None:
+            return 0
+        keys = self.band_keys(signature)
+        with self._lock:
+            now = self.clock()
+            self.evict(now)
+            count = self.near_duplicates(signature, keys)
+
+            post_id = self.next_id
+            self.next_id += 1
+            self.entries[post_id] = (signature, keys, now)
+            for key in keys:
+                bucket = self.buckets.setdefault(key, [])
+                bucket.append(post_id)
+                if len(bucket) > self.max_bucket:
+                    bucket.pop(0)
+            self.evict(now)
+        return count
+
+    def check(self, text):
+        """Records text and returns "qCampaign" if it has enough recent near-duplicates."""
+        if self.observe(text) >= self.min_duplicates:
+            self.flagged += 1
+            return "qCampaign"
+        return "qSafe"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def stats(self):
+        return {
+            "posts": len(self.entries),
+            "buckets": len(self.buckets),
+            "window": self.window,
+            "flagged": self.flagged,
+        }
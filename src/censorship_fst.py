@@ -1,16 +1,30 @@
-from pathlib import Path
-import json
+import re
+
+from .lexicon import Lexicon
+from .term_index import MASKED_KINDS
+
+_WORD = re.compile(r"[^\W\d_]+")
 
 class CensorshipFST:
-    def __init__(self):
-        # Upload keywords from keywords.json
-        keywords_file = Path(__file__).parent / "data" / "keywords.json"
-        with open(keywords_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
+    def __init__(self, lexicon=None, normalizer=None, term_index=None):
+        # Upload keywords from keywords.json (or reuse an already loaded lexicon)
+        if lexicon is None:
+            lexicon = Lexicon.from_file()
+        self.lexicon = lexicon
+        data = lexicon.categories
         self.badwords = set(word.lower() for word in data.get("badwords", []))
         self.sexwords = set(word.lower() for word in data.get("sexwords", []))
         self.violence = set(word.lower() for word in data.get("violence", []))
-        
+        # Optional bulk terms (TermIndex): their badwords, sexwords and violence words are masked too
+        self.term_index = term_index
+
+        # Optional second pass for obfuscated spellings (b4dw0rd, stuuupid)
+        self.normalizer = normalizer
+        if normalizer is not None:
+            self.obfuscated = normalizer.compile(
+                self.badwords | self.sexwords | self.violence, whole=True
+            )
+
         # States
         self.q0 = "q0"
         self.qC = "qC"
@@ -21,6 +35,28 @@ class CensorshipFST:
         self.state = self.q0
 
     def process_text(self, text):
+        return self.censor(text).strip()
+
+    def process_text_traced(self, text, trace):
+        """
+        process_text that records one step per word in trace (a
+        TransitionTrace): q0 -> qC for a masked word (by either pass),
+        q0 -> q0 for the others, then $ -> qF.
+        """
+        censored = self.censor(text)
+        record = trace.record
+        for m in _WORD.finditer(text):
+            masked = censored[m.start():m.end()] == "*" * (m.end() - m.start())
+            record("censorship", m.group(), self.q0, self.qC if masked else self.q0)
+        record("censorship", "$", self.q0, self.qF)
+        return censored.strip()
+
+    def censor(self, text):
+        """
+        Same masking as process_text without stripping the result, so the
+        output has exactly the length of the input. Texts cut at whitespace
+        can be censored piece by piece and concatenated.
+        """
         self.reset()
         output = []
         word_buffer = []  # To create words character by character
@@ -43,7 +79,8 @@ class CensorshipFST:
                     word = "".join(word_buffer)
                     word_lower = word.lower()
 
-                    if word_lower in self.badwords or word_lower in self.sexwords or word_lower in self.violence:
+                    if word_lower in self.badwords or word_lower in self.sexwords or word_lower in self.violence \
+                            or (self.term_index is not None and self.term_index.get(word_lower) in MASKED_KINDS):
                         # Transition to state qC for censorship
                         self.state = self.qC
                         # Each letter is converted to *
@@ -67,4 +104,29 @@ class CensorshipFST:
 
         # End of text → final state qF
         self.state = self.qF
-        return "".join(output).strip()
+        censored = "".join(output)
+        if self.normalizer is not None:
+            censored = self.mask_obfuscated(text, censored)
+        return censored[:-1]
+
+    def mask_obfuscated(self, text, censored):
+        """
+        Second pass over the folded text: masks the words that only match
+        once leetspeak, accents and repeated letters are normalized. Folding
+        keeps every offset, so the mask lands on the original characters.
+        """
+        folded = self.normalizer.fold(text)
+        if folded == text and not self.normalizer.has_elongation(text):
+            return censored
+
+        chars = None
+        for m in _WORD.finditer(folded):
+            word = m.group().lower()
+            original = text[m.start():m.end()].lower()
+            if self.normalizer.is_obfuscated(original, word) and (
+                self.obfuscated.fullmatch(word)
+                or (self.term_index is not None and self.term_index.get(word) in MASKED_KINDS)
+            ):
+                chars = chars or list(censored)
+                chars[m.start():m.end()] = "*" * (m.end() - m.start())
+        return "".join(chars) if chars else censored
@@ -1,11 +1,12 @@
-from pathlib import Path
+import copy
+
 from .preprocessing import RegexTokenizer
 from .directionality_dfa import DirectionalityDFA
 
 class ContentDFA:
-    def __init__(self):
-        keywords_file = Path(__file__).parent / "data" / "keywords.json"
-        self.tokenizer = RegexTokenizer(str(keywords_file))
+    def __init__(self, lexicon=None, normalizer=None, tokenizer=None):
+        # Shares the pipeline's tokenizer, or the lexicon's word sets, else loads keywords.json
+        self.tokenizer = tokenizer or RegexTokenizer("data/keywords.json", lexicon=lexicon, normalizer=normalizer)
         # -------------------
         # Intermediate states
         # -------------------
@@ -42,6 +43,12 @@ class ContentDFA:
         self.state = self.q0
         self.direction_dfa.reset()
 
+    def fork(self):
+        """Independent copy of the current content and directionality states; shares the tokenizer."""
+        forked = copy.copy(self)
+        forked.direction_dfa = copy.copy(self.direction_dfa)
+        return forked
+
     # -------------------
     # Transitions
     # -------------------
@@ -105,13 +112,38 @@ class ContentDFA:
     # -------------------
     def process_text(self, text):
         """Processes a complete text token by token"""
-        self.reset()
         tokens = self.tokenizer.tokenize(text) if self.tokenizer else text.split()
+        return self.process_tokens(tokens)
+
+    def process_tokens(self, tokens):
+        """Runs an already tokenized text (e.g. the pipeline's own tokens)."""
+        self.reset()
         for tok in tokens:
             self.direction_dfa.transition(tok)  # updates directionality
             self.transition(tok)                # updates content
         return self.end_of_input()
 
+    def process_tokens_traced(self, tokens, trace):
+        """
+        process_tokens that records every step of the content and
+        directionality DFAs in trace (a TransitionTrace).
+        """
+        self.reset()
+        record = trace.record
+        direction = self.direction_dfa
+        for tok in tokens:
+            before = direction.state
+            direction.transition(tok)
+            record("direction", tok, before, direction.state)
+            before = self.state
+            self.transition(tok)
+            record("content", tok, before, self.state)
+        before_direction, before = direction.state, self.state
+        final = self.end_of_input()
+        record("direction", "$", before_direction, direction.state)
+        record("content", "$", before, final)
+        return final
+
     # -------------------
     # End of input
     # -------------------
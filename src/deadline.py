@@ -0,0 +1,52 @@
+import time
+
+# Words classified between two deadline checks in the tokenizer
+DEADLINE_STRIDE = 256
+
+
+class DeadlineExceeded(Exception):
+    """A stage ran out of time; the caller falls back to a degraded result."""
+
+
+class Deadline:
+    """
+    Time budget of one request, measured on a monotonic clock.
+
+    Stages call expired() between steps and inside long loops. When one of
+    them gives up (or returns a partial result) it calls degrade(stage):
+    `degraded` lists those stages in order, and `on_degrade` runs once,
+    the first time, so the owner can count degraded requests.
+    """
+
+    def __init__(self, seconds, clock=time.monotonic, on_degrade=None):
+        self.clock = clock
+        self.expires_at = clock() + seconds
+        self.on_degrade = on_degrade
+        self.degraded = []
+
+    @classmethod
+    def coerce(cls, deadline, on_degrade=None):
+        """A Deadline from a number of seconds; an existing Deadline is returned as is."""
+        if deadline is None:
+            return None
+        if not isinstance(deadline, Deadline):
+            deadline = cls(deadline)
+        if deadline.on_degrade is None:
+            deadline.on_degrade = on_degrade
+        return deadline
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        return self.clock() >= self.expires_at
+
+    def check(self):
+        """Raises DeadlineExceeded once the budget is spent."""
+        if self.expired():
+            raise DeadlineExceeded
+
+    def degrade(self, stage):
+        if not self.degraded and self.on_degrade is not None:
+            self.on_degrade()
+        self.degraded.append(stage)
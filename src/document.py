@@ -0,0 +1,134 @@
+import re
+import tempfile
+from pathlib import Path
+
+from src.post_processor import transform_post
+
+DOCUMENT_CHUNK = 64 * 1024
+# Last whitespace character of a chunk
+_LAST_SPACE = re.compile(r"\s(?=\S*\Z)")
+
+
+def iter_segments(stream, chunk_size=DOCUMENT_CHUNK, line_limit=4, overlap=0):
+    """
+    Reads `stream` in chunks of `chunk_size` characters and yields segments
+    that end at a line break, so formulas and markup on one line are
+    rendered together. A line longer than `line_limit` chunks is cut at its
+    last whitespace instead, so no word is split between two segments. A
+    run with no whitespace at all is cut once it reaches `line_limit`
+    chunks, keeping its last `overlap` characters for the next segment.
+    No segment is longer than (line_limit + 1) * chunk_size.
+
+    Only the new chunk is searched: the carried text holds no line break,
+    and the end of its last whitespace is kept from earlier chunks.
+    """
+    limit = line_limit * chunk_size
+    carry, space = "", 0    # space: end of the last whitespace in carry, 0 if none
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        text = carry + chunk
+        last = _LAST_SPACE.search(chunk)
+        if last:
+            space = len(carry) + last.end()
+        newline = chunk.rfind("\n")
+        if newline >= 0:
+            cut = len(carry) + newline + 1
+        elif len(text) >= limit:
+            cut = space or max(len(text) - overlap, 1)
+        else:
+            cut = 0
+        if cut:
+            yield text[:cut]
+        carry = text[cut:]
+        space = max(space - cut, 0)
+    if carry:
+        yield carry
+
+
+def open_source(source):
+    """
+    Returns (stream, close) for a path or a file-like object. Paths are
+    opened as UTF-8 text; the caller's streams are left open.
+    """
+    if isinstance(source, (str, Path)):
+        stream = open(source, encoding="utf-8")
+        return stream, stream.close
+    return source, lambda: None
+
+
+def moderate_document(pipeline, source, writer, chunk_size=DOCUMENT_CHUNK, render=True):
+    """
+    Moderates a document of any size with memory bounded by `chunk_size`.
+
+    Pass 1 classifies the text through a ModerationSession, which keeps
+    phrases and words split across chunks intact; a stream that cannot be
+    rewound is copied to a temporary file on the way. Pass 2 re-reads the
+    text segment by segment, censors it when pass 1 raised a warning and
+    writes each segment to `writer` (rendered with transform_post, or the
+    censored plain text when render=False). Rendered segments are
+    separated by a newline.
+    """
+    stream, close = open_source(source)
+    spool = None
+    try:
+        session = pipeline.open()
+        if stream.seekable():
+            start = stream.tell()
+        else:
+            spool = tempfile.TemporaryFile("w+", encoding="utf-8")
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            session.feed(chunk)
+            if spool is not None:
+                spool.write(chunk)
+        verdict = session.verdict()
+
+        if spool is not None:
+            spool.seek(0)
+            stream = spool
+        else:
+            stream.seek(start)
+
+        censor = bool(verdict["dfa_warnings"])
+        censorship_fst = session.stages.censorship_fst
+        # A run without whitespace cut in two keeps a term that ends it whole
+        lexicon = session.stages.lexicon
+        overlap = max((len(term) for terms in lexicon.categories.values() for term in terms), default=0)
+        enhancements = []
+        first = True
+        for segment in iter_segments(stream, chunk_size, overlap=overlap):
+            if censor:
+                segment = censorship_fst.censor(segment)
+            if render:
+                if not segment.strip():
+                    continue
+                rendered = transform_post(segment)
+                for note in rendered["enhancements"]:
+                    if note not in enhancements:
+                        enhancements.append(note)
+                writer.write(rendered["text"] if first else "\n" + rendered["text"])
+            else:
+                writer.write(segment)
+            first = False
+    finally:
+        if spool is not None:
+            spool.close()
+        close()
+
+    return {
+        "warnings": [
+            pipeline.warning_fst.generate_warning(w)
+            for w in verdict["dfa_warnings"]
+            if w
+        ],
+        "spam_state": verdict["spam_state"],
+        "content_state": verdict["content_state"],
+        "dfa_warnings": verdict["dfa_warnings"],
+        "enhancements": enhancements,
+        "chars": session.chars,
+        "lexicon_version": verdict["lexicon_version"],
+    }
@@ -0,0 +1,160 @@
+import hashlib
+import math
+import operator
+import os
+import threading
+import time
+from array import array
+
+
+class SlidingCountMin:
+    """
+    Count-min sketch over the last `slots` time slots: one table of
+    depth x width counters per slot, plus their running sum. Expiring a
+    slot subtracts its table from the sum and clears it, so estimates only
+    ever read the sum.
+    """
+
+    def __init__(self, width, depth, slots):
+        self.size = width * depth
+        self.tables = [array("I", bytes(4 * self.size)) for _ in range(slots)]
+        self.counts = [0] * slots        # items per slot
+        self.sum = array("I", bytes(4 * self.size))
+        self.total = 0                   # items in the window
+        self.current = 0
+
+    def expire(self, steps):
+        """Moves to the slot `steps` ahead, clearing every slot passed on the way."""
+        for _ in range(min(steps, len(self.tables))):
+            self.current = (self.current + 1) % len(self.tables)
+            old = self.tables[self.current]
+            if self.counts[self.current]:
+                self.sum = array("I", map(operator.sub, self.sum, old))
+                self.total -= self.counts[self.current]
+                self.tables[self.current] = array("I", bytes(4 * self.size))
+                self.counts[self.current] = 0
+
+    def add(self, cells):
+        table, total = self.tables[self.current], self.sum
+        for cell in cells:
+            table[cell] += 1
+            total[cell] += 1
+        self.counts[self.current] += 1
+        self.total += 1
+
+    def estimate(self, cells):
+        total = self.sum
+        return min(total[cell] for cell in cells)
+
+    @property
+    def nbytes(self):
+        return 4 * self.size * (len(self.tables) + 1)
+
+
+class FloodDetector:
+    """
+    Per-author flood detector: an author who posts more than `max_posts`
+    times, or more than `max_spam` posts with a spam signal, within about
+    `window` seconds.
+
+    Authors are never stored. Each author ID is hashed (with a per-process
+    key, so IDs cannot be crafted to collide) to one counter per row of two
+    count-min sketches, one for posts and one for spam signals. Memory is
+    fixed by width, depth and slots, whatever the number of authors.
+
+    A count-min estimate never falls below the true count. It exceeds it
+    by at most e / width * N (N: posts of all authors in the window) with
+    probability at least 1 - exp(-depth). With the defaults, that is
+    N / 1500 with probability 98%: at 100 posts per second, at most 4
+    posts too many. So a flooding author is always flagged, and an author
+    below the limit only when they share counters with heavy posters in
+    every row.
+
+    The window is made of `slots` slots of window / slots seconds; the
+    oldest slot is dropped as a new one starts, so counts cover between
+    window - window / slots and window seconds.
+    """
+
+    def __init__(self, max_posts=30, max_spam=3, window=60.0, slots=6, width=4096, depth=4,
+                 seed=None, clock=time.monotonic):
+        if slots < 2:
+            raise ValueError("slots must be at least 2")
+        self.max_posts = max_posts
+        self.max_spam = max_spam
+        self.window = window
+        self.slot_seconds = window / slots
+        self.width = width
+        self.depth = depth
+        self.clock = clock
+        self.key = os.urandom(16) if seed is None else seed.to_bytes(16, "little")
+
+        self.posts = SlidingCountMin(width, depth, slots)
+        self.spam = SlidingCountMin(width, depth, slots)
+        self.slot = int(clock() // self.slot_seconds)
+        self.flagged = 0
+        self._lock = threading.Lock()
+
+    # -------------------
+    # Sketch
+    # -------------------
+    def cells(self, author):
+        """One counter per row for author: double hashing of a keyed BLAKE2b digest."""
+        digest = hashlib.blake2b(str(author).encode("utf-8"), digest_size=16, key=self.key).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        width = self.width
+        return [row * width + (h1 + row * h2) % width for row in range(self.depth)]
+
+    def advance(self, now):
+        slot = int(now // self.slot_seconds)
+        if slot > self.slot:
+            self.posts.expire(slot - self.slot)
+            self.spam.expire(slot - self.slot)
+            self.slot = slot
+
+    # -------------------
+    # Authors
+    # -------------------
+    def query(self, author):
+        """(posts, spam posts) of author in the window, estimated, without recording anything."""
+        cells = self.cells(author)
+        with self._lock:
+            self.advance(self.clock())
+            return self.posts.estimate(cells), self.spam.estimate(cells)
+
+    def observe(self, author, spam=False):
+        """Records one post by author (with a spam signal or not) and returns query(author)."""
+        cells = self.cells(author)
+        with self._lock:
+            self.advance(self.clock())
+            self.posts.add(cells)
+            if spam:
+                self.spam.add(cells)
+            return self.posts.estimate(cells), self.spam.estimate(cells)
+
+    def check(self, author, spam=False):
+        """Records the post and returns "qFlood" if its author is over either limit."""
+        posts, spam_posts = self.observe(author, spam)
+        if posts > self.max_posts or spam_posts > self.max_spam:
+            self.flagged += 1
+            return "qFlood"
+        return "qSafe"
+
+    @property
+    def nbytes(self):
+        return self.posts.nbytes + self.spam.nbytes
+
+    def stats(self):
+        with self._lock:
+            self.advance(self.clock())
+            posts, spam = self.posts.total, self.spam.total
+        return {
+            "posts": posts,
+            "spam_posts": spam,
+            "window": self.window,
+            "flagged": self.flagged,
+            "bytes": self.nbytes,
+            # Overestimate bound of one author's count, and the probability it holds
+            "error_bound": math.e / self.width * posts,
+            "confidence": 1 - math.exp(-self.depth),
+        }
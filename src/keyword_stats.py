@@ -0,0 +1,280 @@
+"""
+Lexicon hit counts merged across workers: `python -m src.keyword_stats report DIR`.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+from pathlib import Path
+
+from src.lexicon import CATEGORIES, EXACT_CATEGORIES, SUBSTRING_CATEGORIES, Lexicon
+
+# Token kind -> keywords.json category, for the kinds that come from a lexicon entry
+KIND_CATEGORIES = {
+    **dict(SUBSTRING_CATEGORIES),
+    **dict(EXACT_CATEGORIES),
+    "NEG_EMOJI": "bademojis",
+    "SPAMWORD": "spamwords",
+    "FAKECLAIM": "fakeclaims",
+}
+SUBSTRING_KINDS = frozenset(kind for kind, _ in SUBSTRING_CATEGORIES)
+# Kinds counted per lexeme; phrases are counted where they are replaced
+WORD_KINDS = frozenset(KIND_CATEGORIES) - {"SPAMWORD", "FAKECLAIM"}
+# Distinct (kind, word, folded) resolutions remembered per counters object
+MATCH_MEMO_SIZE = 10_000
+FILE_PREFIX = "keyword-hits-"
+
+
+class KeywordCounters:
+    """
+    Hit counts of every entry of one Lexicon, in flat arrays.
+
+    Every (category, term) gets an index. hit() runs for each lexeme whose
+    token kind comes from the lexicon: the entries behind it are resolved
+    once per distinct (kind, word, folded spelling) and memoized, so a
+    repeated word costs one dict lookup and a few array increments. A
+    substring match credits every term of the category the word contains,
+    and also counts as `inside` when the word is not the term itself: an
+    entry whose hits are mostly inside other words is too broad.
+
+    Increments are not locked; with many threads the counts are approximate.
+    """
+
+    def __init__(self, lexicon, normalizer=None):
+        self.version = lexicon.version
+        self.normalizer = normalizer
+        self.keywords = [(c, t) for c in CATEGORIES for t in lexicon.categories[c]]
+        self.index = {key: i for i, key in enumerate(self.keywords)}
+        self.hits = array("Q", bytes(8 * len(self.keywords)))
+        self.inside = array("Q", bytes(8 * len(self.keywords)))
+        self.category_hits = array("Q", bytes(8 * len(CATEGORIES)))
+        self.category_index = {c: i for i, c in enumerate(CATEGORIES)}
+        self.kinds = WORD_KINDS
+        self._terms = {
+            kind: [(self.index[(category, t)], t.lower()) for t in lexicon.categories[category]]
+            for kind, category in KIND_CATEGORIES.items()
+        }
+        self._phrases = {
+            kind: [self.index[(KIND_CATEGORIES[kind], t)] for t in terms]
+            for kind, terms in (("SPAMWORD", lexicon.spamwords), ("FAKECLAIM", lexicon.fakeclaims))
+        }
+        self._patterns = {}
+        self._matches = {}
+
+    # -------------------
+    # Matching path
+    # -------------------
+    def hit(self, kind, word_lower, folded=None):
+        """Counts one token of `kind` read from word_lower (folded: its folded spelling)."""
+        key = (kind, word_lower, folded)
+        matched = self._matches.get(key)
+        if matched is None:
+            if len(self._matches) >= MATCH_MEMO_SIZE:
+                self._matches = {}
+            matched = self._matches[key] = self.resolve(kind, word_lower, folded)
+        hits, inside = self.hits, self.inside
+        for i, is_inside in matched:
+            hits[i] += 1
+            if is_inside:
+                inside[i] += 1
+        self.category_hits[self.category_index[KIND_CATEGORIES[kind]]] += 1
+
+    def hit_phrase(self, kind, position, n=1):
+        """Counts n matches of the phrase at `position` of lexicon.spamwords / fakeclaims."""
+        self.hits[self._phrases[kind][position]] += n
+        self.category_hits[self.category_index[KIND_CATEGORIES[kind]]] += n
+
+    def resolve(self, kind, word_lower, folded=None):
+        """Entries behind one token, as (index, inside) pairs."""
+        terms = self._terms[kind]
+        if kind in SUBSTRING_KINDS:
+            matched = [(i, t != word_lower) for i, t in terms if t in word_lower]
+        else:
+            matched = [(i, False) for i, t in terms if t == word_lower]
+        if matched or folded is None or self.normalizer is None:
+            return tuple(matched)
+        # Obfuscated spelling: the entries whose tolerant pattern matches
+        for i, pattern in self.patterns(kind):
+            if kind in SUBSTRING_KINDS and pattern.search(folded):
+                matched.append((i, pattern.fullmatch(folded) is None))
+            elif pattern.fullmatch(folded):
+                matched.append((i, False))
+        return tuple(matched)
+
+    def patterns(self, kind):
+        """One elongation-tolerant pattern per term of kind's category, built on first use."""
+        if kind not in self._patterns:
+            self._patterns[kind] = [
+                (i, self.normalizer.compile([t], whole=kind not in SUBSTRING_KINDS))
+                for i, t in self._terms[kind]
+            ]
+        return self._patterns[kind]
+
+    def grouped(self):
+        """category -> term -> [hits, inside], for the entries hit at least once."""
+        grouped = {}
+        for i, (category, term) in enumerate(self.keywords):
+            if self.hits[i]:
+                grouped.setdefault(category, {})[term] = [self.hits[i], self.inside[i]]
+        return grouped
+
+    def reset(self):
+        for counts in (self.hits, self.inside, self.category_hits):
+            counts[:] = array("Q", bytes(8 * len(counts)))
+
+    def __len__(self):
+        return len(self.keywords)
+
+
+class KeywordStats:
+    """
+    Owner of the KeywordCounters of a pipeline, one per Lexicon it builds
+    stages for (versions and language partitions).
+
+    snapshot() sums them by lexicon version and entry name. With a
+    `directory`, tick() (called once per request) writes this process's
+    snapshot to DIRECTORY/keyword-hits-<pid>.json every `flush_interval`
+    seconds, and merge() adds up the files of every worker. A forked
+    worker starts from zero; the parent's counts are its own.
+    """
+
+    def __init__(self, directory=None, flush_interval=30.0, clock=time.time):
+        self.directory = Path(directory) if directory is not None else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._counters = []
+        self._pid = os.getpid()
+        self._next_flush = clock() + flush_interval
+
+    def counters(self, lexicon, normalizer=None):
+        """New KeywordCounters for lexicon, included in every snapshot from now on."""
+        counters = KeywordCounters(lexicon, normalizer)
+        self._counters.append(counters)
+        return counters
+
+    def reset(self):
+        for counters in self._counters:
+            counters.reset()
+
+    # -------------------
+    # Per request
+    # -------------------
+    def tick(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.reset()
+            self._next_flush = self.clock() + self.flush_interval
+        if self.directory is not None and self.clock() >= self._next_flush:
+            self.flush()
+
+    def flush(self):
+        """Writes this process's snapshot to its file in directory (atomically)."""
+        self._next_flush = self.clock() + self.flush_interval
+        if self.directory is None:
+            return None
+        path = self.directory / f"{FILE_PREFIX}{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    # -------------------
+    # Reports
+    # -------------------
+    def snapshot(self):
+        """version -> {"categories": {category: hits}, "keywords": {category: {term: [hits, inside]}}}."""
+        versions = {}
+        for counters in list(self._counters):
+            merge_into(versions, counters.version, {
+                "categories": dict(zip(CATEGORIES, counters.category_hits)),
+                "keywords": counters.grouped(),
+            })
+        return versions
+
+    def merged(self):
+        """Snapshot of every worker: the files in directory, with this process's counts up to date."""
+        if self.directory is None:
+            return self.snapshot()
+        self.flush()
+        return merge(self.directory)
+
+    def report(self, lexicon=None, top=20):
+        return report(self.merged(), lexicon, top)
+
+
+def merge_into(versions, version, snapshot):
+    """Adds one snapshot of `version` into versions (same shape as KeywordStats.snapshot)."""
+    target = versions.setdefault(version, {"categories": {}, "keywords": {}})
+    for category, n in snapshot["categories"].items():
+        target["categories"][category] = target["categories"].get(category, 0) + n
+    for category, terms in snapshot["keywords"].items():
+        merged = target["keywords"].setdefault(category, {})
+        for term, (hits, inside) in terms.items():
+            previous = merged.get(term, [0, 0])
+            merged[term] = [previous[0] + hits, previous[1] + inside]
+    return versions
+
+
+def merge(directory):
+    """Sum of every keyword-hits-<pid>.json in directory."""
+    versions = {}
+    for path in sorted(Path(directory).glob(f"{FILE_PREFIX}*.json")):
+        try:
+            snapshot = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):  # a worker is replacing it right now
+            continue
+        for version, counts in snapshot.items():
+            merge_into(versions, version, counts)
+    return versions
+
+
+def report(versions, lexicon=None, top=20):
+    """
+    Per version: hits per category, the `top` entries, and the entries
+    whose hits are mostly inside longer words (`broad`). With a lexicon,
+    its version also lists the entries that never matched (`dead`).
+    """
+    out = {}
+    for version, counts in versions.items():
+        entries = [
+            {"category": c, "term": t, "hits": hits, "inside": inside}
+            for c, terms in counts["keywords"].items() for t, (hits, inside) in terms.items()
+        ]
+        entries.sort(key=lambda e: (-e["hits"], e["category"], e["term"]))
+        out[version] = {
+            "categories": counts["categories"],
+            "top": entries[:top],
+            "broad": sorted(
+                (e for e in entries if e["inside"] * 2 > e["hits"]),
+                key=lambda e: (-e["inside"], e["category"], e["term"]),
+            )[:top],
+        }
+        if lexicon is not None and lexicon.version == version:
+            out[version]["dead"] = [
+                {"category": c, "term": t}
+                for c in CATEGORIES for t in lexicon.categories[c]
+                if t not in counts["keywords"].get(c, {})
+            ]
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("report")
+    command.add_argument("directory")
+    command.add_argument("--keywords-file", help="lists the entries of this lexicon that never matched")
+    command.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    lexicon = Lexicon.from_file(args.keywords_file) if args.keywords_file else None
+    print(json.dumps(report(merge(args.directory), lexicon, args.top), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
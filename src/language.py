@@ -0,0 +1,113 @@
+import re
+
+# Most frequent function words of each language, plus letters and
+# punctuation that (almost) only that language uses. A few hundred
+# characters of a post are enough to tell them apart.
+PROFILES = {
+    "en": {
+        "stopwords": "the and is are you that this with for have not was but what they "
+                     "be it of to in on my your just so all will can do",
+        "chars": "",
+    },
+    "es": {
+        "stopwords": "el la los las de que y en un una es por con para no se lo su al "
+                     "del pero más como muy está yo tu",
+        "chars": "ñ¿¡",
+    },
+    "fr": {
+        "stopwords": "le la les de des et est un une que qui dans pour pas sur au du "
+                     "ce il elle je tu vous nous avec mais",
+        "chars": "çœèêàù",
+    },
+    "de": {
+        "stopwords": "der die das und ist nicht ein eine zu den mit sich auf für ich "
+                     "du wir sie es auch aber wie dem",
+        "chars": "ßäöü",
+    },
+    "it": {
+        "stopwords": "il lo la gli le di che e è un una per non con del della sono ma "
+                     "come anche io tu questo molto",
+        "chars": "ìò",
+    },
+    "pt": {
+        "stopwords": "o a os as de que e é um uma em para com não do da por se mas "
+                     "você eu muito está isso",
+        "chars": "ãõç",
+    },
+}
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+
+class LanguageGuesser:
+    """
+    Picks the lexicon partitions a post should be scanned against.
+
+    Each language scores one point per stopword among the first
+    `sample_words` words and `char_weight` points per distinctive
+    character. guess() returns the best language, plus the runner-up when
+    it scores at least `margin` of the best (mixed or ambiguous posts), up
+    to `max_languages`. A post with no evidence at all goes to `default`.
+    """
+
+    def __init__(self, profiles=None, default="en", max_languages=2,
+                 sample_words=64, char_weight=2, margin=0.5):
+        profiles = PROFILES if profiles is None else profiles
+        self.languages = tuple(profiles)
+        self.default = default if default in profiles else self.languages[0]
+        self.max_languages = max_languages
+        self.sample_words = sample_words
+        self.sample_chars = sample_words * 8
+        self.char_weight = char_weight
+        self.margin = margin
+        # word -> languages that list it; char -> languages that use it
+        self.stopwords = {}
+        self.chars = {}
+        for language, profile in profiles.items():
+            words = profile.get("stopwords", ())
+            for word in words.split() if isinstance(words, str) else words:
+                self.stopwords.setdefault(word.lower(), []).append(language)
+            for char in profile.get("chars", ""):
+                self.chars.setdefault(char, []).append(language)
+
+    @classmethod
+    def from_lexicon(cls, lexicon, **options):
+        """
+        One profile per language of the lexicon: the partition's own
+        "stopwords" and "chars" when it has them, else PROFILES.
+        """
+        profiles = {}
+        for language, part in lexicon.partitions.items():
+            builtin = PROFILES.get(language, {})
+            profiles[language] = {
+                "stopwords": part.get("stopwords", builtin.get("stopwords", ())),
+                "chars": part.get("chars", builtin.get("chars", "")),
+            }
+        return cls(profiles, default=lexicon.languages[0], **options)
+
+    def scores(self, text):
+        """language -> score of text (only languages with some evidence)."""
+        scores = {}
+        sample = text[:self.sample_chars].lower()
+        for i, m in enumerate(_WORD.finditer(sample)):
+            if i == self.sample_words:
+                break
+            for language in self.stopwords.get(m.group(), ()):
+                scores[language] = scores.get(language, 0) + 1
+        if self.chars:
+            for char in set(sample).intersection(self.chars):
+                for language in self.chars[char]:
+                    scores[language] = scores.get(language, 0) + self.char_weight
+        return scores
+
+    def guess(self, text):
+        """Tuple of the languages to scan text against, best first."""
+        scores = self.scores(text)
+        if not scores:
+            return (self.default,)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        best = ranked[0][1]
+        return tuple(
+            language for language, score in ranked[:self.max_languages]
+            if score >= best * self.margin
+        )
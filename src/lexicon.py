@@ -0,0 +1,244 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+
+KEYWORDS_FILE = Path(__file__).parent / "data" / "keywords.json"
+EMOJI_RANGE = r"\U0001F300-\U0001FAFF"
+EMOJI_PATTERN = re.compile(f"[{EMOJI_RANGE}]")
+
+# Category precedence of RegexTokenizer: substring checks, then exact checks
+SUBSTRING_CATEGORIES = (
+    ("BADWORD", "badwords"),
+    ("SEXWORD", "sexwords"),
+    ("VIOLENCE", "violence"),
+    ("POLITIC", "politics"),
+)
+EXACT_CATEGORIES = (
+    ("PRONOUN_SELF", "pronouns_self"),
+    ("PRONOUN_OTHER", "pronouns_other"),
+    ("PRONOUN_GROUP", "pronouns_group"),
+    ("PRONOUN", "pronouns"),
+    ("AUX_VERB", "aux_verbs"),
+)
+CATEGORIES = (
+    "badwords", "sexwords", "violence", "politics", "pronouns", "pronouns_self",
+    "pronouns_other", "pronouns_group", "aux_verbs", "bademojis", "spamwords", "fakeclaims",
+)
+# Categories that belong to no language: every partition keeps all of them
+SHARED_CATEGORIES = ("bademojis",)
+# Language of the top-level categories when keywords.json does not name one
+DEFAULT_LANGUAGE = "en"
+
+
+class Lexicon:
+    """
+    Versioned snapshot of keywords.json. The Lexicon keeps its own copy of
+    the data, so editing the caller's dict afterwards changes neither its
+    containers nor its version.
+
+    Every stage built from the same Lexicon shares its containers and
+    precompiled phrase patterns, so the file is parsed once per version.
+    The version is a short hash of the canonical JSON of the data, however
+    it was loaded: the same content always gets the same version, even
+    reformatted, with keys or the terms of a list in another order (every
+    list is read as a set; phrases of equal length are tried in alphabetical
+    order), and any edit of the terms gets a new one.
+
+    The top-level categories are the terms of one language ("language",
+    "en" by default). An optional "languages" object adds one partition
+    per further language, each with any of the categories plus optional
+    "stopwords" and "chars" for LanguageGuesser:
+
+        {"badwords": [...], ..., "languages": {"es": {"badwords": [...]}}}
+
+    The Lexicon itself scans every language at once; partition() gives
+    the Lexicon of only some of them.
+    """
+
+    def __init__(self, data, version=None):
+        self.version = self.content_version(data) if version is None else version
+        self.data = copy.deepcopy(data)
+        self.partitions = self.split_partitions(self.data)
+        self.languages = tuple(self.partitions)
+        self.categories = self.merge_partitions(self.languages)
+        self._subsets = {}
+        categories = self.categories
+
+        # Simple word sets
+        self.badwords = frozenset(categories["badwords"])
+        self.sexwords = frozenset(categories["sexwords"])
+        self.violence = frozenset(categories["violence"])
+        self.politics = frozenset(categories["politics"])
+        self.pronouns = frozenset(categories["pronouns"])
+        self.pronouns_self = frozenset(categories["pronouns_self"])
+        self.pronouns_other = frozenset(categories["pronouns_other"])
+        self.pronouns_group = frozenset(categories["pronouns_group"])
+        self.aux_verbs = frozenset(categories["aux_verbs"])
+        self.bad_emojis = frozenset(categories["bademojis"])
+
+        # Multi-word phrases, longest first (then alphabetical, whatever the file's order)
+        self.spamwords = tuple(sorted(categories["spamwords"], key=lambda x: (-len(x), x)))
+        self.fakeclaims = tuple(sorted(categories["fakeclaims"], key=lambda x: (-len(x), x)))
+        self.phrase_patterns = {
+            "SPAMWORD": tuple(self.compile_phrase(p) for p in self.spamwords),
+            "FAKECLAIM": tuple(self.compile_phrase(p) for p in self.fakeclaims),
+        }
+        self.word_index = self.build_word_index()
+
+        # Longest phrase in words: how much context a phrase can span
+        self.max_phrase_words = max(
+            (len(p.split()) for p in self.spamwords + self.fakeclaims), default=1
+        )
+
+    @staticmethod
+    def split_partitions(data):
+        """
+        language -> its own data, default language first. The top level must
+        have every category; a language partition may leave some out.
+        """
+        default = {key: data[key] for key in CATEGORIES}
+        for key in ("stopwords", "chars"):
+            if key in data:
+                default[key] = data[key]
+        partitions = {data.get("language", DEFAULT_LANGUAGE): default}
+        for language, part in sorted(data.get("languages", {}).items()):
+            partitions.setdefault(language, {}).update(part)
+        return partitions
+
+    def merge_partitions(self, languages):
+        """
+        Categories of the given languages merged into one flat dict (first
+        occurrence of a term wins). SHARED_CATEGORIES come from every partition.
+        """
+        merged = {}
+        for key in CATEGORIES:
+            sources = self.languages if key in SHARED_CATEGORIES else languages
+            terms = (t for language in sources for t in self.partitions[language].get(key, ()))
+            merged[key] = list(dict.fromkeys(terms))
+        return merged
+
+    def partition(self, languages):
+        """
+        Lexicon of only the given languages (unknown ones are ignored), with
+        the same version. Built once per subset; self when that is every
+        language or none of them.
+        """
+        key = tuple(language for language in self.languages if language in languages)
+        if not key or key == self.languages:
+            return self
+        subset = self._subsets.get(key)
+        if subset is None:
+            first, shared = self.partitions[key[0]], self.merge_partitions(())
+            data = {k: shared[k] if k in SHARED_CATEGORIES else first.get(k, []) for k in CATEGORIES}
+            data.update({k: first[k] for k in ("stopwords", "chars") if k in first})
+            data["language"] = key[0]
+            data["languages"] = {language: self.partitions[language] for language in key[1:]}
+            subset = self._subsets.setdefault(key, Lexicon(data, version=self.version))
+        return subset
+
+    def build_word_index(self):
+        """
+        Maps every word of the exact categories (and every bad emoji) to its
+        final token kind, with the tokenizer's precedence already resolved:
+        a word that contains a badword, sexword, violence or politics term
+        gets that category first, then the first exact category that lists
+        it wins. Words are matched lowercased, so entries with capitals can
+        never match and are left out, as in the sequential checks.
+        """
+        index = {}
+        for emoji in self.bad_emojis:
+            if EMOJI_PATTERN.match(emoji):
+                index[emoji] = "NEG_EMOJI"
+        for kind, attr in reversed(EXACT_CATEGORIES):
+            for word in getattr(self, attr):
+                if word == word.lower():
+                    index[word] = kind
+        for word in index:
+            for kind, attr in SUBSTRING_CATEGORIES:
+                if any(term in word for term in getattr(self, attr)):
+                    index[word] = kind
+                    break
+        return index
+
+    @staticmethod
+    def compile_phrase(phrase):
+        return re.compile(r'\b' + re.escape(phrase) + r'\b', re.IGNORECASE)
+
+    @staticmethod
+    def content_version(data):
+        """First 12 hex digits of the SHA-256 of the canonical JSON dump of data (see canonical)."""
+        raw = json.dumps(Lexicon.canonical(data), sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()[:12]
+
+    @staticmethod
+    def canonical(value):
+        """value with every list sorted, at any depth: term order does not change a Lexicon."""
+        if isinstance(value, dict):
+            return {key: Lexicon.canonical(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return sorted(
+                (Lexicon.canonical(item) for item in value),
+                key=lambda item: json.dumps(item, sort_keys=True, ensure_ascii=False),
+            )
+        return value
+
+    @classmethod
+    def from_file(cls, path=KEYWORDS_FILE):
+        # Same hash as Lexicon(data): a file and its parsed data get one version
+        return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def __repr__(self):
+        if len(self.languages) > 1:
+            return f"Lexicon(version={self.version!r}, languages={self.languages!r})"
+        return f"Lexicon(version={self.version!r})"
+
+
+class LexiconWatcher(threading.Thread):
+    """
+    Polls a keywords file and calls `on_change()` whenever its modification
+    time or size changes. Errors raised by the callback (e.g. a half-written
+    JSON file) are kept in `last_error` and retried on the next poll.
+    """
+
+    def __init__(self, path, on_change, interval=1.0):
+        super().__init__(daemon=True)
+        self.path = Path(path)
+        self.on_change = on_change
+        self.interval = interval
+        self.last_error = None
+        self._stamp = self._read_stamp()
+        self._stop_event = threading.Event()
+
+    def _read_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def check(self):
+        """Runs one poll; returns True if a change was handled."""
+        stamp = self._read_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        try:
+            self.on_change()
+        except Exception as e:
+            self.last_error = e
+            return False
+        self._stamp = stamp
+        self.last_error = None
+        return True
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
@@ -0,0 +1,162 @@
+import re
+import unicodedata
+
+# Leetspeak and look-alike symbols, one character to one character
+LEET = {
+    "0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b", "9": "g",
+    "@": "a", "$": "s", "!": "i", "|": "l", "+": "t", "€": "e",
+}
+
+_RUN = re.compile(r"\S+")
+_LETTER = re.compile(r"[^\W\d_]")
+_ELONGATION = re.compile(r"([^\W\d_])\1\1")
+
+
+def build_diacritics_table(start=0x00C0, end=0x024F):
+    """
+    Maps every accented Latin letter whose decomposition is one ASCII
+    letter plus combining marks to that letter (é -> e, Ñ -> N).
+    Letters without such a decomposition (ß, æ, ø) are left alone so
+    the table stays one character to one character.
+    """
+    table = {}
+    for code in range(start, end + 1):
+        char = chr(code)
+        base = unicodedata.normalize("NFD", char)
+        if len(base) > 1 and base[0].isascii() and base[0].isalpha() \
+                and all(unicodedata.combining(c) for c in base[1:]):
+            table[code] = base[0]
+    return table
+
+
+def runs(word):
+    """
+    Run-length encoding in one left-to-right pass:
+    "kiiill" -> ("kil", [1, 3, 2]).
+    """
+    chars, counts = [], []
+    for c in word:
+        if chars and chars[-1] == c:
+            counts[-1] += 1
+        else:
+            chars.append(c)
+            counts.append(1)
+    return "".join(chars), counts
+
+
+def elongated_pattern(term):
+    """
+    Regex source that matches `term` with any of its letters repeated more
+    times than in the canonical spelling: "kill" -> k+i+l{2,}.
+    Adjacent quantifiers are always on different letters, so matching
+    never backtracks more than the length of one run. The first letter
+    also refuses to start inside a run of itself ("(?<!k)k+"): a match
+    from the middle of a run is also a match from its start, and without
+    it a search over "kkkk...k" rescans the rest of the run from every
+    position, quadratic in the length of the word.
+    """
+    skeleton, counts = runs(term.lower())
+    parts = []
+    if skeleton[:1].isalpha():
+        parts.append("(?<!%s)" % re.escape(skeleton[0]))
+    for c, n in zip(skeleton, counts):
+        if c.isalpha():
+            parts.append(re.escape(c) + ("+" if n == 1 else "{%d,}" % n))
+        else:
+            parts.append(re.escape(c * n))
+    return "".join(parts)
+
+
+class Normalizer:
+    """
+    Maps obfuscated spellings onto the canonical lexicon.
+
+    fold() applies two precomputed str.translate tables: diacritics
+    everywhere and leetspeak inside runs that contain a letter (so "1234",
+    "!@#" and the "!!" closing "stupid!!" stay as they are). Both tables map one character to one
+    character, which keeps every offset of the folded text equal to the
+    offset in the original text. Repeated letters are not rewritten; they
+    are matched by the elongated patterns of the lexicon instead.
+    """
+
+    def __init__(self, leet=LEET, diacritics=True):
+        self.leet_table = str.maketrans(leet)
+        self.leet_chars = frozenset(leet)
+        # Symbols that end a run are punctuation ("stupid!!"), not letters
+        self.trailing = "".join(c for c in leet if not c.isalnum())
+        self.diacritics_table = build_diacritics_table() if diacritics else {}
+
+    def _fold_run(self, match):
+        run = match.group()
+        if not _LETTER.search(run):
+            return run
+        core = run.rstrip(self.trailing)
+        return core.translate(self.leet_table) + run[len(core):]
+
+    def fold(self, text, run=_RUN):
+        """
+        Same-length canonical spelling of text. `run` matches the units
+        leetspeak is folded in (whitespace-separated runs by default).
+        """
+        if self.diacritics_table:
+            text = text.translate(self.diacritics_table)
+        if not self.leet_chars.isdisjoint(text):
+            text = run.sub(self._fold_run, text)
+        return text
+
+    @staticmethod
+    def has_elongation(text):
+        """True if some letter appears three or more times in a row."""
+        return _ELONGATION.search(text) is not None
+
+    def is_obfuscated(self, word, folded=None):
+        """Worth a second, tolerant lookup: folding changed it or it is elongated."""
+        folded = self.fold(word) if folded is None else folded
+        return folded != word or self.has_elongation(word)
+
+    def compile(self, terms, whole=False):
+        """
+        One elongation-tolerant alternation for a whole category, built from
+        the folded terms. `whole=True` is meant for fullmatch (exact
+        categories), otherwise for search (substring categories).
+        Returns None for an empty category.
+        """
+        terms = sorted({self.fold(t.lower()) for t in terms}, key=lambda t: -len(t))
+        if not terms:
+            return None
+        body = "|".join(elongated_pattern(t) for t in terms)
+        return re.compile(f"(?:{body})" if whole else body)
+
+    def compile_phrases(self, phrases):
+        """Tolerant version of Lexicon.compile_phrase, one pattern per phrase."""
+        return tuple(
+            re.compile(r"\b" + elongated_pattern(self.fold(p.lower())) + r"\b", re.IGNORECASE)
+            for p in phrases
+        )
+
+    def normalize(self, text):
+        """
+        Fully canonical text plus offsets back into the original: folds, then
+        collapses every run of three or more identical letters to one letter.
+        offsets[i] is the index in `text` of normalized character i, and
+        offsets[len(normalized)] == len(text), so normalized[a:b] comes from
+        text[offsets[a]:offsets[b]].
+        """
+        folded = self.fold(text)
+        out, offsets = [], []
+        i, n = 0, len(folded)
+        while i < n:
+            c = folded[i]
+            j = i + 1
+            while j < n and folded[j] == c:
+                j += 1
+            length = j - i
+            if length >= 3 and c.isalpha():
+                out.append(c)
+                offsets.append(i)
+            else:
+                out.append(folded[i:j])
+                offsets.extend(range(i, j))
+            i = j
+        offsets.append(n)
+        return "".join(out), offsets
@@ -1,65 +1,644 @@
+import html
+import threading
+import time
+
 from src.censorship_fst import CensorshipFST
 from src.content_dfa import ContentDFA
+from src.deadline import Deadline, DeadlineExceeded
+from src.document import DOCUMENT_CHUNK, moderate_document
+from src.language import LanguageGuesser
+from src.lexicon import KEYWORDS_FILE, Lexicon, LexiconWatcher
+from src.normalization import Normalizer
+from src.post_index import changed_terms, routing_changed
 from src.post_processor import transform_post
+from src.prefilter import CleanPrefilter
 from src.preprocessing import RegexTokenizer
+from src.result import LazyView
+from src.session import ModerationSession, collect_warnings
 from src.spam_dfa import SpamDFA
+from src.tracing import TransitionTrace
+from src.verdict_store import content_hash
 from src.warning_fst import WarningFST
+from src.word_cache import WordCache
+
+WORD_CACHE_SIZE = 10_000
+
+
+class CompiledStages:
+    """Every lexicon-dependent stage, built together from one Lexicon version."""
+
+    def __init__(self, lexicon, normalizer=None, word_cache=None, route_languages=False,
+                 keyword_stats=None, prefilter=True, term_index=None):
+        self.lexicon = lexicon
+        self.version = lexicon.version
+        self.normalizer = normalizer
+        self.keyword_stats = keyword_stats
+        self.term_index = term_index
+        # One tokenizer (and word cache) shared by every stage
+        self.tokenizer = RegexTokenizer(
+            lexicon=lexicon, normalizer=normalizer, cache=word_cache,
+            keyword_hits=(
+                keyword_stats.counters(lexicon, normalizer) if keyword_stats is not None else None
+            ),
+            term_index=term_index,
+        )
+        self.spam_dfa = SpamDFA(tokenizer=self.tokenizer)
+        self.content_dfa = ContentDFA(tokenizer=self.tokenizer)
+        self.censorship_fst = CensorshipFST(lexicon=lexicon, normalizer=normalizer, term_index=term_index)
+        # Posts it clears skip every other stage; not while counting keywords,
+        # since cleared posts still hold exact entries (pronouns, aux verbs)
+        self.prefilter = (
+            CleanPrefilter(lexicon, normalizer, term_index)
+            if prefilter and keyword_stats is None else None
+        )
+        self._batch_dfa = None
+        # Per-language stages (route); only worth it with more than one language
+        self.word_cache_size = word_cache.capacity if word_cache is not None else 0
+        self.language_guesser = (
+            LanguageGuesser.from_lexicon(lexicon)
+            if route_languages and len(lexicon.languages) > 1 else None
+        )
+        self._routes = {}
+
+    def route(self, text):
+        """
+        Stages of the lexicon partitions text is written in (see
+        LanguageGuesser), built on first use; self when routing is off.
+        The default partition is always scanned too: a few foreign stopwords
+        must not be enough to steer a post away from its terms.
+        """
+        if self.language_guesser is None:
+            return self
+        languages = self.language_guesser.guess(text) + (self.language_guesser.default,)
+        lexicon = self.lexicon.partition(languages)
+        if lexicon is self.lexicon:
+            return self
+        stages = self._routes.get(lexicon.languages)
+        if stages is None:
+            # Own word cache: the same word can be a different kind in another partition
+            cache = WordCache(self.word_cache_size) if self.word_cache_size else None
+            stages = self._routes.setdefault(
+                lexicon.languages,
+                CompiledStages(
+                    lexicon, self.normalizer, cache, keyword_stats=self.keyword_stats,
+                    prefilter=self.prefilter is not None, term_index=self.term_index,
+                ),
+            )
+        return stages
+
+    def batch_dfa(self):
+        """Vectorized DFAs for these stages, built on first use (needs NumPy)."""
+        if self._batch_dfa is None:
+            from src.batch_dfa import BatchDFA
+            self._batch_dfa = BatchDFA(self)
+        return self._batch_dfa
 
 
 class TextPipeline:
-    def __init__(self):
-        self.tokenizer = RegexTokenizer("data/keywords.json")
-        self.spam_dfa = SpamDFA()
-        self.content_dfa = ContentDFA()
-        self.censorship_fst = CensorshipFST()
+    def __init__(self, keywords_file=KEYWORDS_FILE, lexicon=None, normalize=True,
+                 word_cache_size=WORD_CACHE_SIZE, campaign_detector=None, route_languages=False,
+                 verdict_store=None, shadow=None, tracer=None, keyword_stats=None, prefilter=True,
+                 term_index=None, flood_detector=None, post_index=None):
+        self.keywords_file = keywords_file
+        # Leetspeak, accents and repeated letters map onto the canonical lexicon
+        self.normalizer = Normalizer() if normalize else None
+        # Memo of word -> token kind; emptied whenever the lexicon version changes
+        self.word_cache = WordCache(word_cache_size) if word_cache_size else None
         self.warning_fst = WarningFST()
+        # Near-duplicates across recent posts (CampaignDetector); off by default
+        self.campaign_detector = campaign_detector
+        # Posting and spam rates per author (FloodDetector); off by default
+        self.flood_detector = flood_detector
+        # Scan each post only against the partitions of its language(s)
+        self.route_languages = route_languages
+        # Verdicts persisted across restarts (VerdictStore); off by default
+        self.verdict_store = verdict_store
+        # Bulk terms in a memory-mapped trie (TermIndex), shared by every lexicon version
+        self.term_index = term_index
+        # A stored verdict is only valid for the same normalization, routing and bulk terms
+        self._store_suffix = ("" if normalize else "+raw") + ("+routed" if route_languages else "") + (
+            f"+terms-{term_index.version}" if term_index is not None else ""
+        )
+        # Vectorized batches always scan the whole lexicon: their verdicts are not routed ones
+        self._whole_suffix = self._store_suffix.replace("+routed", "", 1)
+        # Candidate engine compared with this pipeline on sampled posts (ShadowRunner)
+        self.shadow = shadow
+        # Sampled transition traces (Tracer); run(trace=True) traces one request
+        self.tracer = tracer
+        # Hit counts per lexicon entry (KeywordStats), to prune keywords.json
+        self.keyword_stats = keyword_stats
+        # Clean posts go straight to the untouched result (CleanPrefilter)
+        self.prefilter = prefilter
+        self.stages = CompiledStages(
+            lexicon or Lexicon.from_file(keywords_file), self.normalizer, self.word_cache,
+            route_languages, keyword_stats, prefilter, term_index,
+        )
+        # Archive of moderated posts and their words (PostIndex), for targeted re-moderation
+        self.post_index = post_index
+        if post_index is not None and post_index.baseline() is None:
+            post_index.set_baseline(self.stages.lexicon, term_index)
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        # Runs that missed their deadline and returned a degraded result
+        self.degraded_count = 0
+        self._degraded_lock = threading.Lock()
+
+    # -------------------
+    # Active stages
+    # -------------------
+    @property
+    def lexicon_version(self):
+        return self.stages.version
+
+    @property
+    def tokenizer(self):
+        return self.stages.tokenizer
+
+    @property
+    def spam_dfa(self):
+        return self.stages.spam_dfa
+
+    @property
+    def content_dfa(self):
+        return self.stages.content_dfa
+
+    @property
+    def censorship_fst(self):
+        return self.stages.censorship_fst
+
+    # -------------------
+    # Lexicon reload
+    # -------------------
+    def reload_lexicon(self, lexicon=None):
+        """
+        Compiles a new lexicon version (keywords_file by default) and swaps it
+        in with a single reference assignment. Runs already in progress keep
+        the stages they started with. Returns the active version.
+        """
+        with self._reload_lock:
+            lexicon = lexicon or Lexicon.from_file(self.keywords_file)
+            if lexicon.version != self.stages.version:
+                self.stages = CompiledStages(
+                    lexicon, self.normalizer, self.word_cache, self.route_languages,
+                    self.keyword_stats, self.prefilter, self.term_index,
+                )
+            return self.stages.version
 
-    def run(self, text):
-        detailed_steps = {}
+    def reload_lexicon_async(self, lexicon=None):
+        """Same as reload_lexicon, compiled on a background thread."""
+        thread = threading.Thread(target=self.reload_lexicon, args=(lexicon,), daemon=True)
+        thread.start()
+        return thread
+
+    def watch_lexicon(self, interval=1.0):
+        """Reloads the lexicon in the background whenever keywords_file changes."""
+        if self._watcher is None:
+            self._watcher = LexiconWatcher(self.keywords_file, self.reload_lexicon, interval)
+            self._watcher.start()
+        return self._watcher
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    # -------------------
+    # Incremental sessions
+    # -------------------
+    def open(self, state=None):
+        """
+        Starts an incremental session (feed chunks, ask for a verdict at any
+        time), or resumes one from ModerationSession.snapshot().
+        """
+        return ModerationSession(self.stages, state)
+
+    # -------------------
+    # Large documents
+    # -------------------
+    def run_document(self, source, writer, chunk_size=DOCUMENT_CHUNK, render=True):
+        """
+        Moderates a file path or file-like object chunk by chunk and streams
+        the censored (and rendered) output to `writer`. Peak memory depends
+        on chunk_size, not on the size of the document.
+        """
+        return moderate_document(self, source, writer, chunk_size, render)
+
+    # -------------------
+    # Verdict only
+    # -------------------
+    def classify(self, text, author=None, post_id=None):
+        """
+        Verdict only: spam and content final states plus the raw warning
+        codes, without censorship, warning messages or HTML rendering.
+        The text is tokenized once for both DFAs.
+        """
+        return self.classify_batch(
+            [text], authors=None if author is None else [author],
+            post_ids=None if post_id is None else [post_id],
+        )[0]
+
+    def classify_batch(self, texts, vectorized=False, authors=None, post_ids=None):
+        """
+        classify() for many texts; one lexicon version for the whole batch.
+        vectorized=True steps every post at once with NumPy (see BatchDFA),
+        always against the whole lexicon. With a verdict store, stored
+        verdicts are fetched in one bulk lookup and only the others are
+        classified (and then stored); while counting keywords, nothing is
+        fetched, only stored. Posts the prefilter clears are safe without a
+        lookup. `authors`, if given, has one author ID (or None)
+        per text, for the flood detector; `post_ids` one post ID (or None)
+        per text, for the post index.
+        """
+        if authors is not None and len(authors) != len(texts):
+            raise ValueError("authors must have one entry per text")
+        if post_ids is not None and len(post_ids) != len(texts):
+            raise ValueError("post_ids must have one entry per text")
+        stages = self.stages
+        if self.keyword_stats is not None:
+            self.keyword_stats.tick()
+        if self.shadow is not None:
+            for text in texts:
+                self.shadow.submit(stages.route(text), text)
+        verdicts = [None] * len(texts)
+        todo = range(len(texts))
+        if stages.prefilter is not None:
+            # The whole lexicon's prefilter also clears for any of its partitions
+            todo = []
+            for i, text in enumerate(texts):
+                if stages.prefilter.clear(text):
+                    verdicts[i] = self._verdict(stages, "qSafe", "qF_Safe")
+                else:
+                    todo.append(i)
+        if self.verdict_store is not None and todo:
+            version = self.store_version(stages, routed=not vectorized)
+            hashes = {i: content_hash(texts[i]) for i in todo}
+            # Not while counting keywords: every post must be tokenized (and counted)
+            stored = (
+                self.verdict_store.get_many([hashes[i] for i in todo], version)
+                if self.keyword_stats is None else {}
+            )
+            for i in todo:
+                if hashes[i] in stored:
+                    verdicts[i] = self._verdict(stages, *stored[hashes[i]])
+            todo = [i for i in todo if hashes[i] not in stored]
+
+        if not todo:
+            computed = []
+        elif vectorized:
+            computed = stages.batch_dfa().classify([texts[i] for i in todo])
+        else:
+            computed = [self._classify(stages.route(texts[i]), texts[i]) for i in todo]
+        for i, verdict in zip(todo, computed):
+            verdicts[i] = verdict
+        if self.verdict_store is not None and computed:
+            self.verdict_store.put_many(
+                [(hashes[i], v["spam_state"], v["content_state"]) for i, v in zip(todo, computed)],
+                version,
+            )
+
+        if self.campaign_detector is not None or (self.flood_detector is not None and authors is not None):
+            for i, (text, verdict) in enumerate(zip(texts, verdicts)):
+                spam, content = verdict["spam_state"], verdict["content_state"]
+                campaign = self.campaign_state(text)
+                flood = self.flood_state(authors[i] if authors is not None else None, spam, campaign)
+                verdict["dfa_warnings"] = collect_warnings(spam, content, campaign, flood)
+        if self.post_index is not None:
+            self.post_index.put_many(
+                [
+                    (self.post_key(post_ids[i] if post_ids is not None else None, text),
+                     text, verdict["spam_state"], verdict["content_state"])
+                    for i, (text, verdict) in enumerate(zip(texts, verdicts))
+                ],
+                stages.version,
+            )
+        return verdicts
+
+    @classmethod
+    def _classify(cls, stages, text, campaign_state=None):
+        tokens = stages.tokenizer.tokenize(text)
+        spam_state = stages.spam_dfa.process_tokens(tokens)
+        content_state = stages.content_dfa.process_tokens(tokens)
+        return cls._verdict(stages, spam_state, content_state, campaign_state)
+
+    @staticmethod
+    def _verdict(stages, spam_state, content_state, campaign_state=None):
+        return {
+            "spam_state": spam_state,
+            "content_state": content_state,
+            "dfa_warnings": collect_warnings(spam_state, content_state, campaign_state),
+            "lexicon_version": stages.version,
+        }
+
+    # -------------------
+    # Verdict store
+    # -------------------
+    def store_version(self, stages=None, routed=True):
+        """
+        Version key of stored verdicts: lexicon version plus the options that
+        change a verdict. routed=False is the key of verdicts computed against
+        the whole lexicon (vectorized batches), with or without route_languages.
+        """
+        return (stages or self.stages).version + (self._store_suffix if routed else self._whole_suffix)
+
+    # -------------------
+    # Re-moderation
+    # -------------------
+    @staticmethod
+    def post_key(post_id, text):
+        """ID of a post in the post index: the caller's, else the hash of its text."""
+        return content_hash(text).hex() if post_id is None else str(post_id)
+
+    def remoderate(self, batch_size=500):
+        """
+        Brings the post index up to date with the active lexicon: only the
+        posts that contain a term added or removed since its baseline
+        (PostIndex.affected) are classified again, and the baseline moves
+        to the active version. Every post is checked when a changed term
+        cannot be looked up, when the bulk terms (TermIndex) are not the
+        ones of the baseline or, with route_languages, when the routing data
+        changed. Returns counts, timing and the posts whose verdict changed.
+        """
+        index = self.post_index
+        if index is None:
+            raise RuntimeError("remoderate() needs a post_index")
+        start = time.perf_counter()
+        stages = self.stages
+        baseline = index.baseline()
+        terms = changed_terms(baseline, stages.lexicon)
+        ids = index.affected(terms) if terms else set()
+        # Bulk terms are not diffed: another TermIndex file means every post is checked
+        terms_version = self.term_index.version if self.term_index is not None else None
+        full = (
+            ids is None or index.baseline_terms() != terms_version
+            or (self.route_languages and routing_changed(baseline, stages.lexicon))
+        )
+        if full:
+            ids = index.post_ids()
+        ids = sorted(ids)
+
+        changes = []
+        for begin in range(0, len(ids), batch_size):
+            posts = index.get_many(ids[begin:begin + batch_size])
+            verdicts = []
+            for post_id, (text, spam_state, content_state) in posts.items():
+                verdict = self._classify(stages.route(text), text)
+                after = (verdict["spam_state"], verdict["content_state"])
+                verdicts.append((post_id, *after))
+                if after != (spam_state, content_state):
+                    changes.append({
+                        "post_id": post_id,
+                        "before": {"spam_state": spam_state, "content_state": content_state},
+                        "after": {"spam_state": after[0], "content_state": after[1]},
+                    })
+            index.update_verdicts(verdicts, stages.version)
+        index.set_baseline(stages.lexicon, self.term_index)
+        return {
+            "from": baseline.version,
+            "to": stages.version,
+            "terms": len(terms),
+            "full_scan": full,
+            "posts": len(index),
+            "affected": len(ids),
+            "changed": len(changes),
+            "seconds": time.perf_counter() - start,
+            "changes": changes,
+        }
+
+    # -------------------
+    # Campaigns
+    # -------------------
+    def campaign_state(self, text):
+        """
+        Records text in the campaign detector and returns "qCampaign" or
+        "qSafe"; None when detection is off. Every call counts as a post.
+        """
+        if self.campaign_detector is None:
+            return None
+        return self.campaign_detector.check(text)
+
+    # -------------------
+    # Floods
+    # -------------------
+    def flood_state(self, author, spam_state, campaign_state=None):
+        """
+        Records a post by author in the flood detector, with a spam signal
+        if it is spam or part of a campaign, and returns "qFlood" or
+        "qSafe"; None when detection is off or the author is unknown.
+        """
+        if self.flood_detector is None or author is None:
+            return None
+        return self.flood_detector.check(author, spam_state != "qSafe" or campaign_state == "qCampaign")
+
+    def record_run(self, detailed_steps, text, stages, deadline, author, post_id, store_key):
+        """
+        Side effects of run() that must not depend on which steps the caller
+        reads: the author's post in the flood detector, the verdict in the
+        store (under store_key, None when there is nothing to store) and the
+        post in the post index. They need the states, so those are computed
+        now when any of them is on. Verdicts of runs whose tokenization was
+        cut by the deadline are neither stored nor indexed.
+        """
+        flood = self.flood_detector is not None and author is not None
+        if not (flood or store_key is not None or self.post_index is not None):
+            return
+        spam, content = detailed_steps["spam_state"], detailed_steps["content_state"]
+        if flood:
+            detailed_steps["flood_state"]
+        if deadline is not None and "tokenize" in deadline.degraded:
+            return
+        if store_key is not None:
+            self.verdict_store.put(*store_key, spam, content)
+        if self.post_index is not None:
+            self.post_index.put(self.post_key(post_id, text), text, spam, content, stages.version)
+
+    # -------------------
+    # Tracing
+    # -------------------
+    def start_trace(self, text, version, force=False):
+        """TransitionTrace for this run (forced, or sampled by the tracer), else None."""
+        if self.tracer is not None:
+            return self.tracer.start(text, version, force)
+        return TransitionTrace() if force else None
+
+    # -------------------
+    # Deadlines
+    # -------------------
+    def count_degraded(self):
+        with self._degraded_lock:
+            self.degraded_count += 1
+
+    # -------------------
+    # Run
+    # -------------------
+    def run(self, text, deadline=None, trace=False, author=None, post_id=None):
+        """
+        Full analysis of text. Both levels of the result are LazyViews:
+        each step runs the first time it (or a step that depends on it)
+        is read, so reading only the warnings skips censorship and
+        rendering. The post is recorded in the campaign detector (if any)
+        right away, whether or not the result is read.
+
+        `deadline` (seconds from now, or a Deadline) bounds the time spent:
+        tokenization stops at the budget, and rendering is replaced by the
+        escaped censored text once it is spent. Such a result has
+        degraded=True and increments degraded_count. States from cut-short
+        tokens may miss what comes after the cut, so the text is then
+        censored whatever the warnings say.
+
+        trace=True (or the tracer's sampling) records every automaton
+        transition in a TransitionTrace, exposed as detailed["trace"]; the
+        automata then run their *_traced methods. Untraced runs keep the
+        plain loops, without a single tracing check inside them.
+
+        A post the prefilter clears (CleanPrefilter) is safe and untouched:
+        its states, censored text and rendering need no stage at all. The
+        tokens are still computed if they are read.
+
+        With an `author` ID, the post is recorded in the flood detector (if
+        any) before run() returns, with the spam state as its spam signal.
+        With a verdict store or a post index, the verdict is stored and the
+        post (under post_id, or the hash of its text) indexed at the same
+        point. The states are then computed eagerly, whatever is read.
+        """
+        # Una sola lectura: una recarga en paralelo no cambia las etapas a mitad de camino
+        # Con route_languages, solo las particiones del idioma del texto
+        stages = self.stages.route(text)
+        deadline = Deadline.coerce(deadline, on_degrade=self.count_degraded)
+        # El detector de campañas debe ver cada publicación una sola vez
+        campaign = self.campaign_state(text)
+        # Recuento de entradas del léxico: volcado periódico para el informe entre workers
+        if self.keyword_stats is not None:
+            self.keyword_stats.tick()
+        # Modo sombra: el candidato se compara en otro hilo, fuera de esta petición
+        if self.shadow is not None:
+            self.shadow.submit(stages, text)
+        # Traza de transiciones: se elige el camino una vez aquí, no dentro de los bucles
+        if trace or self.tracer is not None:
+            trace = self.start_trace(text, stages.version, force=bool(trace))
+        else:
+            trace = None
+        # Publicación limpia: resultado seguro e intacto sin pasar por las etapas
+        # (una traza necesita recorrer los autómatas)
+        clean = trace is None and stages.prefilter is not None and stages.prefilter.clear(text)
+        # Veredicto ya guardado: no hace falta tokenizar para los estados
+        store_key = stored = None
+        if self.verdict_store is not None and not clean:
+            store_key = (content_hash(text), self.store_version(stages))
+            # Una traza necesita recorrer los autómatas, y el recuento de palabras
+            # tokenizar cada publicación: en ambos casos se ignora lo guardado
+            if trace is None and self.keyword_stats is None:
+                stored = self.verdict_store.get(*store_key)
 
         # 1️⃣ Preprocesamiento (tokenización)
-        tokens = self.tokenizer.tokenize(text)
-        detailed_steps["tokens"] = tokens
+        def tokens():
+            return stages.tokenizer.tokenize(text, deadline)
 
-        # 2️⃣ Detección de spam
-        spam_state = self.spam_dfa.process_text(text)
-        detailed_steps["spam_state"] = spam_state
+        # 2️⃣ Detección de spam (sobre los mismos tokens)
+        def spam_state():
+            if clean:
+                return "qSafe"
+            if stored is not None:
+                return stored[0]
+            if trace is not None:
+                return stages.spam_dfa.process_tokens_traced(detailed_steps["tokens"], trace)
+            return stages.spam_dfa.process_tokens(detailed_steps["tokens"])
 
         # 3️⃣ Detección de contenido inapropiado
-        content_state = self.content_dfa.process_text(text)
-        detailed_steps["content_state"] = content_state
+        def content_state():
+            if clean:
+                return "qF_Safe"
+            if stored is not None:
+                return stored[1]
+            if trace is not None:
+                return stages.content_dfa.process_tokens_traced(detailed_steps["tokens"], trace)
+            return stages.content_dfa.process_tokens(detailed_steps["tokens"])
+
+        # Ritmo de publicación del autor: necesita el estado de spam de esta publicación
+        def flood_state():
+            return self.flood_state(author, detailed_steps["spam_state"], campaign)
 
         # 4️⃣ Recolección de advertencias
-        all_warnings = []
-        if spam_state != "qSafe":
-            all_warnings.append(spam_state)
-        if content_state not in ["qF_Safe"]:
-            all_warnings.append(content_state)
-        detailed_steps["dfa_warnings"] = all_warnings
+        def dfa_warnings():
+            spam, content = detailed_steps["spam_state"], detailed_steps["content_state"]
+            return collect_warnings(spam, content, campaign, detailed_steps["flood_state"])
 
         # 5️⃣ Aplicación de censura y transformación
-        if all_warnings:
-            censored_text = self.censorship_fst.process_text(text)
-            readable_warnings = [
+        def censored_text():
+            if clean:
+                return text
+            warnings = detailed_steps["dfa_warnings"]
+            # Tokenización cortada por el deadline: los estados no cubren todo el texto,
+            # así que se censura siempre (una pasada lineal) en vez de devolverlo intacto
+            cut = deadline is not None and "tokenize" in deadline.degraded
+            if not (warnings or cut):
+                return text
+            if trace is not None:
+                return stages.censorship_fst.process_text_traced(text, trace)
+            return stages.censorship_fst.process_text(text)
+
+        def readable_warnings():
+            return [
                 self.warning_fst.generate_warning(w)
-                for w in all_warnings
+                for w in detailed_steps["dfa_warnings"]
                 if w
             ]
-            final_post = transform_post(censored_text)
-        else:
-            censored_text = text
-            readable_warnings = []
-            final_post = transform_post(text)
 
-        detailed_steps["censored_text"] = censored_text
-        detailed_steps["readable_warnings"] = readable_warnings
-        detailed_steps["final_post"] = final_post
+        def final_post():
+            censored = detailed_steps["censored_text"]
+            if clean:
+                return CleanPrefilter.render(censored)
+            if deadline is None:
+                return transform_post(censored)
+            # Sin tiempo: texto censurado y escapado en lugar de HTML renderizado
+            try:
+                deadline.check()
+                return transform_post(censored, deadline)
+            except DeadlineExceeded:
+                deadline.degrade("render")
+                return {"text": html.escape(censored), "enhancements": []}
+
+        def degraded():
+            if deadline is None:
+                return []
+            detailed_steps["final_post"]
+            return list(deadline.degraded)
+
+        def transition_trace():
+            if trace is None:
+                return None
+            # La traza completa: ambos autómatas y la censura
+            detailed_steps["censored_text"]
+            return trace.to_dict()
+
+        detailed_steps = LazyView({
+            "lexicon_version": lambda: stages.version,
+            "languages": lambda: list(stages.lexicon.languages),
+            "tokens": tokens,
+            "spam_state": spam_state,
+            "content_state": content_state,
+            "campaign_state": lambda: campaign,
+            "flood_state": flood_state,
+            "dfa_warnings": dfa_warnings,
+            "censored_text": censored_text,
+            "readable_warnings": readable_warnings,
+            "final_post": final_post,
+            "degraded": degraded,
+            "trace": transition_trace,
+        })
+
+        # Registros con efectos (autor, almacén, archivo): se hacen aquí, lea lo que lea el llamador
+        self.record_run(
+            detailed_steps, text, stages, deadline, author, post_id,
+            store_key if stored is None else None,
+        )
 
         # 6️⃣ Resultado final simplificado
-        final_result = {
-            "text": final_post["text"],  # <-- HTML con fórmulas intactas ($...$)
-            "warnings": readable_warnings
-        }
+        final_result = LazyView({
+            "text": lambda: detailed_steps["final_post"]["text"],  # <-- HTML con fórmulas intactas ($...$)
+            "warnings": lambda: detailed_steps["readable_warnings"],
+            "lexicon_version": lambda: stages.version,
+            "degraded": lambda: bool(detailed_steps["degraded"]),
+        })
 
         # Devolvemos dos niveles: uno para debug, otro para render
         return {
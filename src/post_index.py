@@ -0,0 +1,388 @@
+"""
+Moderated posts and their words, for targeted re-moderation: `python -m src.post_index {stats,remoderate} PATH`.
+"""
+import argparse
+import functools
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from src.lexicon import CATEGORIES, KEYWORDS_FILE, Lexicon
+from src.normalization import Normalizer
+from src.prefilter import caseless, skeleton
+from src.preprocessing import LEXEME
+
+# Most SQLite builds accept 999 bound parameters per statement at least
+IN_CHUNK = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    doc             INTEGER PRIMARY KEY,
+    post_id         TEXT NOT NULL UNIQUE,
+    text            TEXT NOT NULL,
+    spam_state      TEXT NOT NULL,
+    content_state   TEXT NOT NULL,
+    lexicon_version TEXT NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS words (
+    id   INTEGER PRIMARY KEY,
+    word TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS postings (
+    word INTEGER NOT NULL,
+    doc  INTEGER NOT NULL,
+    PRIMARY KEY (word, doc)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Index keys: word runs, and symbols outside ASCII (emojis) one by one.
+# ASCII punctuation is left out: nearly every post has some
+_KEY = re.compile(r"\w+|[^\w\s\x00-\x7f]")
+_normalizer = Normalizer()
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _run_keys(run):
+    fold = _normalizer.fold
+    forms = {run, fold(run, LEXEME), fold(run)}
+    return frozenset(key for form in forms for key in _KEY.findall(skeleton(caseless(form))))
+
+
+def post_keys(text):
+    """
+    Normalized words of a post: the keys of its caseless, repeated-letter
+    free spelling, as written and folded per lexeme and per whitespace
+    run (the folds the tokenizers use).
+
+    Lexemes never span whitespace, so every whitespace run is folded and
+    keyed on its own; runs repeat across posts and their keys are cached.
+    """
+    keys = set()
+    for run in set(text.split()):
+        keys |= _run_keys(run)
+    return keys
+
+
+def term_keys(term):
+    """
+    Key sets of a lexicon term, as written and folded. Every post the term
+    can match has, for one of the sets, a word containing each of its keys.
+    An empty set means the term cannot be looked up (only ASCII symbols).
+    """
+    forms = {term, _normalizer.fold(term.lower())}
+    return {frozenset(_KEY.findall(skeleton(caseless(form)))) for form in forms}
+
+
+def changed_terms(old, new):
+    """Terms added to or removed from any category of any language partition between two Lexicons."""
+    terms = set()
+    for language in set(old.partitions) | set(new.partitions):
+        before, after = old.partitions.get(language, {}), new.partitions.get(language, {})
+        for key in CATEGORIES:
+            terms.update(set(before.get(key, ())) ^ set(after.get(key, ())))
+    return terms
+
+
+def routing_changed(old, new):
+    """True if the languages or the stopwords and chars LanguageGuesser routes with differ."""
+    if old.languages != new.languages:
+        return True
+    return any(
+        old.partitions[language].get(key) != new.partitions[language].get(key)
+        for language in old.languages for key in ("stopwords", "chars")
+    )
+
+
+def _select_in(conn, query, values):
+    """Rows of query for every value, with its `{}` filled by chunks of IN parameters."""
+    rows = []
+    for start in range(0, len(values), IN_CHUNK):
+        chunk = values[start:start + IN_CHUNK]
+        rows.extend(conn.execute(query.format(",".join("?" * len(chunk))), chunk))
+    return rows
+
+
+class PostIndex:
+    """
+    Local SQLite archive of moderated posts (text and verdict) plus an
+    inverted index from their normalized words to post IDs, so a lexicon
+    change only re-moderates the posts that contain a changed term.
+
+    Words are the keys of post_keys(). A term is looked up by its own keys
+    (term_keys): the posts with a word containing each key, found through
+    a scan of the distinct words (not of the posts) and the postings of the
+    words found. That is a superset of the posts the term can match,
+    whether as a substring, folded, elongated or as part of a phrase, so
+    no affected post is missed.
+
+    The index also keeps the lexicon its verdicts are up to date with
+    (`baseline`), and the version of the bulk terms (TermIndex) they were
+    computed with; TextPipeline.remoderate() re-moderates the difference to
+    the active lexicon and moves the baseline.
+
+    Writes are buffered and committed `batch_size` at a time (or once
+    `flush_interval` seconds have passed), in WAL mode, as in VerdictStore.
+    Unlike VerdictStore, the texts are kept: re-moderation needs them.
+    """
+
+    def __init__(self, path, batch_size=256, flush_interval=1.0, clock=time.time):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.pending = {}  # post_id -> (text, spam_state, content_state, version, updated_at)
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+
+    # -------------------
+    # Connection
+    # -------------------
+    @property
+    def conn(self):
+        if self._pid != os.getpid():
+            # Never reuse a connection across fork(); the parent's pending rows are its own
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            if self._pid is not None:
+                self.pending = {}
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._pid in (None, os.getpid()):
+                self._flush()
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+    # -------------------
+    # Writes
+    # -------------------
+    def put(self, post_id, text, spam_state, content_state, version):
+        self.put_many([(post_id, text, spam_state, content_state)], version)
+
+    def put_many(self, posts, version):
+        """Buffers (post_id, text, spam_state, content_state); commits once the batch is full."""
+        now = self.clock()
+        with self._lock:
+            for post_id, text, spam_state, content_state in posts:
+                self.pending[post_id] = (text, spam_state, content_state, version, now)
+            if len(self.pending) >= self.batch_size or now - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = self.clock()
+        if not self.pending:
+            return
+        keys = {post_id: post_keys(row[0]) for post_id, row in self.pending.items()}
+        conn = self.conn
+        conn.execute("BEGIN")
+        # A post stored again may have a new text: the postings of its old words go first.
+        # They are found from the old text, so postings need no index by post
+        old = _select_in(conn, "SELECT doc, text FROM posts WHERE post_id IN ({})", list(self.pending))
+        if old:
+            old = [(doc, post_keys(text)) for doc, text in old]
+            ids = self._word_ids(set().union(*(words for _, words in old)))
+            conn.executemany(
+                "DELETE FROM postings WHERE word = ? AND doc = ?",
+                [(ids[word], doc) for doc, words in old for word in words],
+            )
+            conn.executemany("DELETE FROM posts WHERE doc = ?", [(doc,) for doc, _ in old])
+        words = set().union(*keys.values())
+        conn.executemany("INSERT OR IGNORE INTO words (word) VALUES (?)", [(word,) for word in words])
+        ids = self._word_ids(words)
+        postings = []
+        for post_id, row in self.pending.items():
+            doc = conn.execute(
+                "INSERT INTO posts (post_id, text, spam_state, content_state, lexicon_version, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (post_id, *row),
+            ).lastrowid
+            postings.extend((ids[word], doc) for word in keys[post_id])
+        conn.executemany("INSERT INTO postings VALUES (?, ?)", postings)
+        conn.execute("COMMIT")
+        self.pending = {}
+
+    def _word_ids(self, words):
+        return dict(_select_in(self.conn, "SELECT word, id FROM words WHERE word IN ({})", list(words)))
+
+    def update_verdicts(self, verdicts, version):
+        """New (post_id, spam_state, content_state) of stored posts; their words stay as they are."""
+        self.flush()
+        now = self.clock()
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN")
+            conn.executemany(
+                "UPDATE posts SET spam_state = ?, content_state = ?, lexicon_version = ?, updated_at = ? "
+                "WHERE post_id = ?",
+                [(spam_state, content_state, version, now, post_id) for post_id, spam_state, content_state in verdicts],
+            )
+            conn.execute("COMMIT")
+
+    # -------------------
+    # Lookups
+    # -------------------
+    def get_many(self, post_ids):
+        """post_id -> (text, spam_state, content_state) for the posts stored."""
+        self.flush()
+        with self._lock:
+            rows = _select_in(
+                self.conn,
+                "SELECT post_id, text, spam_state, content_state FROM posts WHERE post_id IN ({})",
+                list(post_ids),
+            )
+        return {post_id: tuple(row) for post_id, *row in rows}
+
+    def post_ids(self):
+        self.flush()
+        with self._lock:
+            return [post_id for post_id, in self.conn.execute("SELECT post_id FROM posts")]
+
+    def containing(self, key):
+        """Row numbers (docs) of the posts with a word that contains key."""
+        with self._lock:
+            return {doc for doc, in self.conn.execute(
+                "SELECT DISTINCT postings.doc FROM words JOIN postings ON postings.word = words.id "
+                "WHERE instr(words.word, ?) > 0",
+                (key,),
+            )}
+
+    def affected(self, terms):
+        """
+        IDs of the posts any of terms may match, a superset; None when some
+        term cannot be looked up and every post has to be checked.
+        """
+        self.flush()
+        docs = set()
+        cache = {}
+        for term in terms:
+            for keys in term_keys(term):
+                if not keys:
+                    return None
+                found = None
+                # Longest keys first: usually the rarest, so the intersection empties sooner
+                for key in sorted(keys, key=len, reverse=True):
+                    if key not in cache:
+                        cache[key] = self.containing(key)
+                    found = cache[key] if found is None else found & cache[key]
+                    if not found:
+                        break
+                docs |= found
+        with self._lock:
+            return {post_id for post_id, in _select_in(
+                self.conn, "SELECT post_id FROM posts WHERE doc IN ({})", list(docs),
+            )}
+
+    # -------------------
+    # Baseline lexicon
+    # -------------------
+    def baseline(self):
+        """The Lexicon the stored verdicts are up to date with, or None for a new index."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'lexicon'").fetchone()
+        if row is None:
+            return None
+        stored = json.loads(row[0])
+        return Lexicon(stored["data"], version=stored["version"])
+
+    def baseline_terms(self):
+        """Version of the TermIndex the stored verdicts were computed with, or None (no bulk terms)."""
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'terms'").fetchone()
+        return row[0] or None if row is not None else None
+
+    def set_baseline(self, lexicon, term_index=None):
+        value = json.dumps({"version": lexicon.version, "data": lexicon.data}, ensure_ascii=False)
+        terms = term_index.version if term_index is not None else ""
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN")
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('lexicon', ?)", (value,))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('terms', ?)", (terms,))
+            conn.execute("COMMIT")
+
+    # -------------------
+    # Reports
+    # -------------------
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def stats(self):
+        self.flush()
+        baseline = self.baseline()
+        with self._lock:
+            conn = self.conn
+            posts = conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+            words = conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+            postings = conn.execute("SELECT COUNT(*) FROM postings").fetchone()[0]
+        return {
+            "path": self.path,
+            "posts": posts,
+            "words": words,
+            "postings": postings,
+            "baseline": baseline.version if baseline is not None else None,
+            "baseline_terms": self.baseline_terms(),
+            "bytes": sum(
+                os.path.getsize(self.path + suffix)
+                for suffix in ("", "-wal") if os.path.exists(self.path + suffix)
+            ),
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats").add_argument("path")
+    remoderate = commands.add_parser("remoderate", help="re-moderate the posts the lexicon change affects")
+    remoderate.add_argument("path")
+    remoderate.add_argument("--keywords-file", default=str(KEYWORDS_FILE))
+    # The verdicts must come from the same stages the app runs: same bulk terms, same routing
+    remoderate.add_argument("--term-index", help="bulk terms file the app loads (TERM_INDEX)")
+    remoderate.add_argument("--route-languages", action="store_true", help="the app routes languages (LANGUAGE_ROUTING=1)")
+    remoderate.add_argument("--changes", type=int, default=20, help="changed posts to print")
+    args = parser.parse_args(argv)
+
+    index = PostIndex(args.path)
+    if args.command == "remoderate":
+        from src.pipeline import TextPipeline
+        from src.term_index import TermIndex
+        terms = TermIndex(args.term_index) if args.term_index else None
+        pipeline = TextPipeline(
+            args.keywords_file, post_index=index, prefilter=False,
+            term_index=terms, route_languages=args.route_languages,
+        )
+        report = pipeline.remoderate()
+        report["changes"] = report["changes"][:args.changes]
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        if terms is not None:
+            terms.close()
+    else:
+        print(json.dumps(index.stats(), indent=2))
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,9 +2,22 @@ import re
 from pyparsing import Path
 from textx import metamodel_from_file
 
+from src.deadline import DeadlineExceeded
+
 grammar_path = Path(__file__).parent / "post.tx"
 post_mm = metamodel_from_file(str(grammar_path))
 
+
+def parse_post(text: str):
+    """
+    post_mm.model_from_str with a trailing newline. Arpeggio caches the
+    line ends of the input only when it contains a "\n"; otherwise every
+    model object's line/column lookup scans the whole input again, which
+    makes a one-line post quadratic in its length. The grammar skips
+    whitespace, so the model is the same.
+    """
+    return post_mm.model_from_str(text + "\n")
+
 # =======================================================
 # 1. Simple replacements (regex)
 # =======================================================
@@ -200,11 +213,14 @@ def render_part(part, enhancements):
 # 4. Final transformation (integration)
 # =======================================================
 
-def transform_post(text: str) -> dict:
+def transform_post(text: str, deadline=None) -> dict:
     """
     Transforms a post by applying visual enhancements and rendering mathematical formulas.
     Returns the final HTML and a list of applied enhancements.
+    With a Deadline, raises DeadlineExceeded between steps once it expires.
     """
+    check = deadline.check if deadline is not None else lambda: None
+
     regex_result = enhance_post(text)
     preprocessed_text = regex_result["text"]
     enhancements = regex_result["enhancements"]
@@ -213,17 +229,23 @@ def transform_post(text: str) -> dict:
 
     try:
         # Try to parse the entire text with TextX
-        model = post_mm.model_from_str(preprocessed_text)
+        check()
+        model = parse_post(preprocessed_text)
         for p in model.parts:
+            check()
             rendered_part = render_part(p, enhancements)
             html_parts.append(rendered_part)
 
+    except DeadlineExceeded:
+        raise
+
     except Exception:
         # If the global parsing fails, try splitting by formulas ($...$)
         html_parts = []
         segments = re.split(r'(\$[^$]+\$)', preprocessed_text)
 
         for segment in segments:
+            check()
             if not segment.strip():
                 continue
 
@@ -231,7 +253,7 @@ def transform_post(text: str) -> dict:
             if segment.startswith('$') and segment.endswith('$'):
                 formula_content = segment[1:-1]
                 try:
-                    formula_model = post_mm.model_from_str(f"${formula_content}$")
+                    formula_model = parse_post(f"${formula_content}$")
                     formula_part = formula_model.parts[0]
                     rendered_formula = render_part(formula_part, enhancements)
                     html_parts.append(rendered_formula)
@@ -0,0 +1,120 @@
+import re
+
+from src.lexicon import EMOJI_RANGE, SUBSTRING_CATEGORIES
+from src.preprocessing import LEXEME
+
+# Characters that make a post more than plain text for some stage:
+#   @ # :// -> mention, hashtag and link tokens and their rendering
+#   * - _ / $ -> bold, italic, underline, font and formula markup (textX)
+#   : ; XD -> emoticons replaced by enhance_post
+#   emojis -> EMOJI and NEG_EMOJI tokens
+#   whitespace other than " \t\n\r" -> textX cannot skip it and renders the post as is
+SPECIAL = re.compile(rf"[@#*\-_/$:;{EMOJI_RANGE}]|XD|[^\S \t\n\r]")
+# Case pairs that re.IGNORECASE matches and str.casefold() keeps apart
+# ("ı" ~ "i"; "İ" casefolds to "i" plus a combining dot)
+FOLD_FIXES = {ord("ı"): "i", 0x307: None}
+_REPEATED = re.compile(r"(.)\1+", re.DOTALL)
+
+
+def term_trie(terms):
+    """
+    Regex source equivalent to the alternation of `terms` (regex sources of
+    single literal terms), factored by common prefix so a position is
+    rejected after one character test instead of one per term.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _trie_source(trie)
+
+
+def _trie_source(node):
+    if "" in node and len(node) == 1:
+        return ""
+    branches = [re.escape(c) + _trie_source(child) for c, child in sorted(node.items()) if c]
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+
+def caseless(text):
+    """
+    Caseless spelling: every pair of characters re.IGNORECASE treats as
+    equal maps to the same string, so a substring of text.lower() (or an
+    IGNORECASE match) stays a substring of caseless(text).
+    """
+    text = text.casefold()
+    return text if text.isascii() else text.translate(FOLD_FIXES)
+
+
+def skeleton(text):
+    """text with every run of a repeated character reduced to one: "kiiill" -> "kil"."""
+    return _REPEATED.sub(r"\1", text)
+
+
+class CleanPrefilter:
+    """
+    One fast scan that proves a post cannot trigger anything.
+
+    A post is clear when it has none of the SPECIAL characters, no term of
+    a substring category (badwords, sexwords, violence, politics), no
+    spamword or fakeclaim phrase and, once folded like the tokenizer folds
+    it, no obfuscated spelling of any of those. Such a post always gets
+    qSafe and qF_Safe, nothing to censor, and transform_post renders it
+    as its words joined by single spaces, so the pipeline can skip every
+    stage. Pronouns and auxiliary verbs are ignored: without a category
+    word the directionality DFA cannot change a verdict.
+
+    Both scans look for the terms anywhere in the caseless text, phrases
+    without word boundaries, and the obfuscated scan compares skeletons,
+    which any elongated spelling reduces to. They are supersets of the
+    tokenizer's checks, so a post the full pipeline would flag is never
+    cleared. The converse does not hold: "skill" is not cleared because it
+    contains "kill". With a TermIndex, its substring-category terms are
+    searched from every position of the lowercased text and folds.
+    """
+
+    def __init__(self, lexicon, normalizer=None, term_index=None):
+        terms = [t for _, attr in SUBSTRING_CATEGORIES for t in getattr(lexicon, attr)]
+        terms += list(lexicon.spamwords) + list(lexicon.fakeclaims)
+        self.normalizer = normalizer
+        # Bulk terms (TermIndex), looked up in the lowercased text as the tokenizer does
+        self.term_index = term_index
+        # None when the lexicon has no such terms: then only SPECIAL matters
+        self.terms = self.obfuscated = None
+        if terms:
+            self.terms = re.compile(term_trie({caseless(t) for t in terms}))
+        if normalizer is not None and terms:
+            folded = {skeleton(caseless(normalizer.fold(t.lower()))) for t in terms}
+            self.obfuscated = re.compile(term_trie(folded))
+
+    def clear(self, text):
+        """True when the full pipeline is certain to leave text safe and untouched."""
+        if SPECIAL.search(text):
+            return False
+        if self.terms is not None and self.terms.search(caseless(text)):
+            return False
+        index = self.term_index
+        # A capital sigma lowers differently at the end of a word than inside the text
+        if index is not None and ("Σ" in text or index.search(text.lower())):
+            return False
+        if self.normalizer is not None and (self.obfuscated is not None or index is not None):
+            # Same folding as RegexTokenizer.replace_obfuscated, per lexeme
+            # and per whitespace run (the tokenizers use one or the other)
+            fold = self.normalizer.fold
+            folds = {fold(text, LEXEME), fold(text)} - {text}
+            if self.normalizer.has_elongation(text):
+                folds.add(text)
+            for folded in folds:
+                if self.obfuscated is not None and self.obfuscated.search(skeleton(caseless(folded))):
+                    return False
+                if index is not None and index.search(folded.lower()):
+                    return False
+        return True
+
+    @staticmethod
+    def render(text):
+        """transform_post of a clear post."""
+        return {"text": " ".join(text.split()), "enhancements": []}
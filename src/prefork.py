@@ -0,0 +1,55 @@
+import gc
+
+# Posts that go through every stage once, so that everything built on first
+# use (textX parser state, regexes compiled by the re module cache, word
+# cache entries) exists before the workers are forked
+WARM_UP_TEXTS = (
+    "Hello @anna, check #news at https://example.com :-) *bold* -italic- _under_ //font//",
+    "You are a stupid person, free money now!!! $\\frac{1}{2} + x^2$",
+    "stuuupid fr33 m0ney \U0001F600 $x +$ $(a$",
+)
+
+
+def warm_up(pipeline, texts=WARM_UP_TEXTS):
+    """
+    Runs every path of the pipeline once, computing every lazy step. The
+    campaign detector, the verdict store, the post index, the shadow runner
+    and the tracer are left out, and keyword hit counts are reset
+    afterwards, so warm-up posts never count as posts, are never archived
+    and are always classified.
+    """
+    detector, pipeline.campaign_detector = pipeline.campaign_detector, None
+    store, pipeline.verdict_store = pipeline.verdict_store, None
+    index, pipeline.post_index = pipeline.post_index, None
+    shadow, pipeline.shadow = pipeline.shadow, None
+    tracer, pipeline.tracer = pipeline.tracer, None
+    try:
+        for text in texts:
+            pipeline.run(text)["detailed"].to_dict()
+        pipeline.classify_batch(list(texts))
+    finally:
+        pipeline.campaign_detector = detector
+        pipeline.verdict_store = store
+        pipeline.post_index = index
+        pipeline.shadow = shadow
+        pipeline.tracer = tracer
+        if pipeline.keyword_stats is not None:
+            pipeline.keyword_stats.reset()
+
+
+def freeze():
+    """
+    Moves every object alive now to the permanent generation. The collector
+    no longer visits them, so it does not write to their pages and a forked
+    worker keeps sharing them with the master (copy-on-write). Returns the
+    number of frozen objects.
+    """
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def prepare_for_fork(pipeline):
+    """Warm up, then freeze: call in the master process right before forking workers."""
+    warm_up(pipeline)
+    return freeze()
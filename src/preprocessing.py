@@ -1,115 +1,242 @@
 import re
-import json
 
-from pyparsing import Path
+from pathlib import Path
+from .deadline import DEADLINE_STRIDE
+from .lexicon import EMOJI_PATTERN, EMOJI_RANGE, Lexicon
+
+# Whitespace-separated runs with every emoji as a run of its own, as
+# text.split() sees them once separate_emojis has padded the emojis
+LEXEME = re.compile(rf"[^\s{EMOJI_RANGE}]+")
+
+# One left-to-right scan that finds every lexeme and its structural kind.
+# Each alternative consumes a whole lexeme, so the scan never resumes in
+# the middle of one. URL, HASHTAG and MENTION are final token kinds; the
+# others still go through the lexicon (classify_plain). WORD goes first
+# because most lexemes are plain words; a word is letters only, so it can
+# never be the start of a URL.
+LEXER = re.compile(rf"""
+    (?P<WORD>[a-zA-Z]++(?![^\s{EMOJI_RANGE}]))
+  | (?P<URL>https?://[^\s{EMOJI_RANGE}]+)
+  | (?P<HASHTAG>\#\w[^\s{EMOJI_RANGE}]*)
+  | (?P<MENTION>@\w[^\s{EMOJI_RANGE}]*)
+  | (?P<EMOJI>[{EMOJI_RANGE}])
+  | (?P<OTHER>[^\s{EMOJI_RANGE}]+)
+""", re.VERBOSE)
+STRUCTURAL_KINDS = frozenset({"URL", "HASHTAG", "MENTION"})
 
 class RegexTokenizer:
-    def __init__(self, keywords_file="keywords.json"):
-        file_path = Path(__file__).parent / keywords_file
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        # Simple word sets
-        self.badwords = set(data["badwords"])
-        self.sexwords = set(data["sexwords"])
-        self.violence = set(data["violence"])
-        self.spamwords = sorted(data["spamwords"], key=lambda x: -len(x))
-        self.fakeclaims = sorted(data["fakeclaims"], key=lambda x: -len(x))
-        self.politics = set(data["politics"])
-        self.pronouns = set(data["pronouns"])
-        self.pronouns_self = set(data["pronouns_self"])
-        self.pronouns_other = set(data["pronouns_other"])
-        self.pronouns_group = set(data["pronouns_group"])
-        self.aux_verbs = set(data["aux_verbs"])
-        self.bad_emojis = set(data["bademojis"])
-
-        # Regex patterns
+    def __init__(self, keywords_file="keywords.json", lexicon=None, normalizer=None, cache=None,
+                 keyword_hits=None, term_index=None):
+        if lexicon is None:
+            lexicon = Lexicon.from_file(Path(__file__).parent / keywords_file)
+        self.lexicon = lexicon
+
+        # Simple word sets (shared with every stage built from the same lexicon)
+        self.badwords = lexicon.badwords
+        self.sexwords = lexicon.sexwords
+        self.violence = lexicon.violence
+        self.spamwords = lexicon.spamwords
+        self.fakeclaims = lexicon.fakeclaims
+        self.politics = lexicon.politics
+        self.pronouns = lexicon.pronouns
+        self.pronouns_self = lexicon.pronouns_self
+        self.pronouns_other = lexicon.pronouns_other
+        self.pronouns_group = lexicon.pronouns_group
+        self.aux_verbs = lexicon.aux_verbs
+        self.bad_emojis = lexicon.bad_emojis
+        # Exact word -> final token kind, precedence already resolved
+        self.word_index = lexicon.word_index
+
+        # Optional memo of word -> token kind (WordCache), tied to this lexicon version
+        self.cache = cache
+        if cache is not None:
+            cache.bind(lexicon.version)
+
+        # Optional per-entry hit counts (KeywordCounters), filled by tokenize
+        self.keyword_hits = keyword_hits
+
+        # Optional bulk terms in a memory-mapped trie (TermIndex), on top of the lexicon
+        self.term_index = term_index
+
+        # Regex patterns (URL, hashtag and mention are the word checks of the
+        # tokenizer before the lexer; see shadow.legacy_tokenize)
         self.patterns = {
             "URL": re.compile(r"(https?:\/\/[^\s]+)"),
             "HASHTAG": re.compile(r"(#[\w\d_]+)"),
             "MENTION": re.compile(r"(@[\w\d_]+)"),
-            "WORD": re.compile(r"\b[a-zA-Z]+\b"),
-            "EMOJI": re.compile(r"[\U0001F300-\U0001FAFF]")
+            "EMOJI": EMOJI_PATTERN
         }
 
-    def replace_phrases(self, text, phrases, token):
-        for phrase in phrases:
-            pattern = re.compile(r'\b' + re.escape(phrase) + r'\b', re.IGNORECASE)
-            text = pattern.sub(token, text)
+        # Optional second lookup for obfuscated spellings (b4dw0rd, stuuupid)
+        self.normalizer = normalizer
+        if normalizer is not None:
+            self.obfuscated_categories = [
+                ("BADWORD", normalizer.compile(self.badwords), "search"),
+                ("SEXWORD", normalizer.compile(self.sexwords), "search"),
+                ("VIOLENCE", normalizer.compile(self.violence), "search"),
+                ("POLITIC", normalizer.compile(self.politics), "search"),
+                ("PRONOUN_SELF", normalizer.compile(self.pronouns_self, whole=True), "fullmatch"),
+                ("PRONOUN_OTHER", normalizer.compile(self.pronouns_other, whole=True), "fullmatch"),
+                ("PRONOUN_GROUP", normalizer.compile(self.pronouns_group, whole=True), "fullmatch"),
+                ("PRONOUN", normalizer.compile(self.pronouns, whole=True), "fullmatch"),
+                ("AUX_VERB", normalizer.compile(self.aux_verbs, whole=True), "fullmatch"),
+            ]
+            self.obfuscated_phrases = {
+                "SPAMWORD": normalizer.compile_phrases(self.spamwords),
+                "FAKECLAIM": normalizer.compile_phrases(self.fakeclaims),
+            }
+
+    def replace_compiled(self, text, token, hits=None):
+        """
+        Replaces every phrase of the lexicon's `token` list (precompiled,
+        longest first, any case) with the token itself. `hits`
+        (KeywordCounters) counts every phrase replaced.
+        """
+        for position, pattern in enumerate(self.lexicon.phrase_patterns[token]):
+            text, n = pattern.subn(token, text)
+            if n and hits is not None:
+                hits.hit_phrase(token, position, n)
         return text
 
-    def separate_emojis(self, text):
-        # Insert spaces before and after each emoji
-        return self.patterns["EMOJI"].sub(r' \g<0> ', text)
-
-    def tokenize(self, text):
-        # 1. Separate emojis attached to words
-        text = self.separate_emojis(text)
-
-        # 2. Replace multi-word phrases first
-        text = self.replace_phrases(text, self.spamwords, "SPAMWORD")
-        text = self.replace_phrases(text, self.fakeclaims, "FAKECLAIM")
-
+    def replace_obfuscated(self, text, run=LEXEME, hits=None):
+        """
+        Replaces phrases written with leetspeak, accents or repeated letters.
+        Works on the folded text and applies the same replacements to the
+        original, so both stay aligned character by character. Leetspeak is
+        folded per lexeme (`run`), so an emoji ends a run as if it were
+        padded with spaces. Returns (text, folded), with folded=None when
+        there is nothing obfuscated in the text. `hits` (KeywordCounters)
+        counts every phrase replaced.
+        """
+        folded = self.normalizer.fold(text, run)
+        if folded == text and not self.normalizer.has_elongation(text):
+            return text, None
+
+        for token, patterns in self.obfuscated_phrases.items():
+            for position, pattern in enumerate(patterns):
+                text_parts, folded_parts, last = [], [], 0
+                for m in pattern.finditer(folded):
+                    text_parts += [text[last:m.start()], token]
+                    folded_parts += [folded[last:m.start()], token]
+                    last = m.end()
+                if text_parts:
+                    text = "".join(text_parts) + text[last:]
+                    folded = "".join(folded_parts) + folded[last:]
+                    if hits is not None:
+                        hits.hit_phrase(token, position, len(text_parts) // 2)
+        return text, folded
+
+    def classify_obfuscated(self, word_lower, folded_lower):
+        """Category of an obfuscated word, or None (same precedence as tokenize)."""
+        if not self.normalizer.is_obfuscated(word_lower, folded_lower):
+            return None
+        kind = None
+        for category, pattern, method in self.obfuscated_categories:
+            if pattern is not None and getattr(pattern, method)(folded_lower):
+                kind = category
+                break
+        if self.term_index is not None:
+            # Bulk terms match the folded spelling as is (no repeated letters)
+            kind = self.term_index.first(kind, folded_lower)
+        return kind
+
+    def tokenize(self, text, deadline=None):
+        """
+        Token kinds of every word in text. With a Deadline, classification
+        stops when it expires: the tokens of the words before that point are
+        returned and the deadline records a "tokenize" degradation. With
+        keyword_hits, the lexicon entries behind every token are counted:
+        phrases where they are replaced, words as they are classified.
+        """
+        hits = self.keyword_hits
+
+        # 1. Replace multi-word phrases first
+        text = self.replace_compiled(text, "SPAMWORD", hits)
+        text = self.replace_compiled(text, "FAKECLAIM", hits)
+
+        # 2. Same for obfuscated phrases, keeping a folded copy of the text
+        folded = None
+        if self.normalizer is not None:
+            text, folded = self.replace_obfuscated(text, hits=hits)
+
+        # 3. One pass of the lexer; emojis are lexemes of their own, so the
+        #    text is never padded around them
+        return self.lex(text, folded, deadline, hits)
+
+    def lex(self, text, folded=None, deadline=None, hits=None):
+        """
+        Token kinds of the lexemes of text, once phrases are replaced.
+        `folded` is the folded copy of text (None when nothing in it is
+        obfuscated). Stops at the deadline, checked every DEADLINE_STRIDE
+        lexemes; counts the entries of every lexicon token in `hits`.
+        """
+        classify = self.classify_plain if self.cache is None else self.classify_plain_cached
+        kinds = hits.kinds if hits is not None else ()
         tokens = []
-        for word in text.split():
-            word_lower = word.lower()
-
-            # URLs, hashtags, mentions
-            if self.patterns["URL"].fullmatch(word):
-                tokens.append("URL")
-                continue
-            if self.patterns["HASHTAG"].match(word):
-                tokens.append("HASHTAG")
-                continue
-            if self.patterns["MENTION"].match(word):
-                tokens.append("MENTION")
-                continue
-
-            # Simple word categories (one word)
-            if any(bw in word_lower for bw in self.badwords):
-                tokens.append("BADWORD")
-                continue
-            if any(sw in word_lower for sw in self.sexwords):
-                tokens.append("SEXWORD")
-                continue
-            if any(vw in word_lower for vw in self.violence):
-                tokens.append("VIOLENCE")
-                continue
-            if any(p in word_lower for p in self.politics):
-                tokens.append("POLITIC")
-                continue
-            if word_lower in self.pronouns_self:
-                tokens.append("PRONOUN_SELF")
-                continue
-            if word_lower in self.pronouns_other:
-                tokens.append("PRONOUN_OTHER")
-                continue
-            if word_lower in self.pronouns_group:
-                tokens.append("PRONOUN_GROUP")
-                continue
-            if word_lower in self.pronouns:
-                tokens.append("PRONOUN")
-                continue
-            if word_lower in self.aux_verbs:
-                tokens.append("AUX_VERB")
-                continue
-
-            # Multi-word phrases already replaced
-            if word in ["SPAMWORD", "FAKECLAIM"]:
-                tokens.append(word)
-                continue
-
-            # Emojis
-            if self.patterns["EMOJI"].match(word):
-                tokens.append("NEG_EMOJI" if word in self.bad_emojis else "EMOJI")
-                continue
-
-            # Normal words
-            if self.patterns["WORD"].match(word):
-                tokens.append("WORD")
-                continue
-
-            # Anything else
-            tokens.append("WORD")
-
+        for i, m in enumerate(LEXER.finditer(text)):
+            if deadline is not None and i % DEADLINE_STRIDE == 0 and deadline.expired():
+                deadline.degrade("tokenize")
+                break
+            kind = m.lastgroup
+            if kind not in STRUCTURAL_KINDS:
+                word = m.group()
+                folded_word = None if folded is None else folded[m.start():m.end()].lower()
+                kind = classify(word, folded_word)
+                if kind in kinds:
+                    hits.hit(kind, word.lower(), folded_word)
+            tokens.append(kind)
         return tokens
+
+    def classify_plain_cached(self, word, folded=None):
+        """classify_plain through the cache. Keys keep the original case ("SPAMWORD" is a marker)."""
+        key = word if folded is None else (word, folded)
+        kind = self.cache.get(key, self.lexicon.version)
+        if kind is None:
+            kind = self.classify_plain(word, folded)
+            self.cache.put(key, kind, self.lexicon.version)
+        return kind
+
+    def classify_plain(self, word, folded=None):
+        """
+        Token kind of a lexeme the lexer did not already type as a URL,
+        hashtag or mention. Words of the exact categories (and bad emojis)
+        are resolved with a single lookup in the lexicon's word_index,
+        which already encodes their precedence; any other word can only be
+        a substring category, an obfuscated spelling, a replaced phrase, an
+        emoji or a WORD. `folded` is the folded spelling of the word, when
+        the text had something obfuscated in it.
+        """
+        word_lower = word.lower()
+        kind = self.word_index.get(word_lower)
+
+        # Substring categories
+        if kind is None:
+            if any(bw in word_lower for bw in self.badwords):
+                kind = "BADWORD"
+            elif any(sw in word_lower for sw in self.sexwords):
+                kind = "SEXWORD"
+            elif any(vw in word_lower for vw in self.violence):
+                kind = "VIOLENCE"
+            elif any(p in word_lower for p in self.politics):
+                kind = "POLITIC"
+        # Bulk terms (TermIndex): whichever kind comes first in tokenizer precedence
+        if self.term_index is not None:
+            kind = self.term_index.first(kind, word_lower)
+        if kind is not None:
+            return kind
+
+        # Obfuscated spellings of the categories above
+        if folded is not None:
+            kind = self.classify_obfuscated(word_lower, folded)
+            if kind:
+                return kind
+
+        # Multi-word phrases already replaced
+        if word in ["SPAMWORD", "FAKECLAIM"]:
+            return word
+
+        # Emojis (bad emojis are in the index)
+        if self.patterns["EMOJI"].match(word):
+            return "EMOJI"
+
+        return "WORD"
@@ -0,0 +1,50 @@
+from collections.abc import Mapping
+
+
+class LazyView(Mapping):
+    """
+    Read-only mapping whose values are computed on first access.
+
+    `fields` maps each key to a zero-argument function. A value is computed
+    the first time its key is read and cached afterwards, so a caller that
+    only reads the warnings never pays for rendering. Iteration yields the
+    keys in the order given; reading values through items() or to_dict()
+    computes them.
+    """
+
+    def __init__(self, fields):
+        self._fields = dict(fields)
+        self._values = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            value = self._fields[key]()
+            self._values[key] = value
+            return value
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    @property
+    def computed(self):
+        """Keys whose value has already been computed."""
+        return [key for key in self._fields if key in self._values]
+
+    def to_dict(self):
+        """Plain dict with every value computed (nested views included)."""
+        return {
+            key: value.to_dict() if isinstance(value, LazyView) else value
+            for key, value in self.items()
+        }
+
+    def __repr__(self):
+        shown = ", ".join(
+            f"{key!r}: {self._values[key]!r}" if key in self._values else f"{key!r}: ..."
+            for key in self._fields
+        )
+        return f"LazyView({{{shown}}})"
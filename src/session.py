@@ -0,0 +1,193 @@
+import bisect
+import re
+
+# First character of a word; the lookbehind also sees text before the scan start
+_WORD_START = re.compile(r"(?<!\S)\S")
+# Uncommitted characters a session holds before it cuts without a commit point
+SESSION_BUFFER = 64 * 1024
+
+
+def collect_warnings(spam_state, content_state, campaign_state=None, flood_state=None):
+    """Raw DFA terminals that require a warning, spam (and campaign, flood) first."""
+    warnings = []
+    if spam_state != "qSafe":
+        warnings.append(spam_state)
+    if campaign_state == "qCampaign":
+        warnings.append(campaign_state)
+    if flood_state == "qFlood":
+        warnings.append(flood_state)
+    if content_state not in ["qF_Safe"]:
+        warnings.append(content_state)
+    return warnings
+
+
+class ModerationSession:
+    """
+    Incremental moderation of text that arrives in pieces.
+
+    feed() only tokenizes the part of the text that no later chunk can
+    change: it keeps back the last `max_phrase_words` words (enough for a
+    multi-word spamword or fakeclaim to still complete, and for a word cut
+    in the middle) and any phrase that crosses that point. Everything
+    before it is tokenized once and advances the spam, content and
+    directionality states. verdict() classifies the pending tail on
+    forked states, so the session can keep receiving chunks afterwards.
+
+    Word starts are found once, scanning only the new text of each chunk.
+    A stream that never completes enough words (one endless word) is cut
+    once more than `max_buffer` characters are pending: before its last
+    word, or inside it, keeping the length of the longest lexicon term.
+
+    The session uses the CompiledStages that were active when it was
+    opened; a lexicon reload does not change it halfway.
+    """
+
+    def __init__(self, stages, state=None, max_buffer=SESSION_BUFFER):
+        self.stages = stages
+        self.tokenizer = stages.tokenizer
+        self.spam_dfa = stages.spam_dfa.fork()
+        self.content_dfa = stages.content_dfa.fork()
+        self.spam_dfa.reset()
+        self.content_dfa.reset()
+        self.buffer = ""
+        self.chars = 0
+        self.max_buffer = max_buffer
+        # Word starts in buffer, known up to offset _scanned
+        self._starts = []
+        self._scanned = 0
+        self.overlap = max(
+            (len(term) for terms in stages.lexicon.categories.values() for term in terms), default=0
+        )
+
+        # Phrase patterns checked at the commit point, with the text they run on
+        self.phrase_patterns = [p for ps in stages.lexicon.phrase_patterns.values() for p in ps]
+        self.obfuscated_patterns = []
+        if self.tokenizer.normalizer is not None:
+            self.obfuscated_patterns = [
+                p for ps in self.tokenizer.obfuscated_phrases.values() for p in ps
+            ]
+
+        if state is not None:
+            self.restore(state)
+
+    @property
+    def lexicon_version(self):
+        return self.stages.version
+
+    # -------------------
+    # Feed
+    # -------------------
+    def feed(self, chunk):
+        """Adds a chunk of text; tokenizes whatever is already final."""
+        self.buffer += chunk
+        self.chars += len(chunk)
+        cut = self.commit_point()
+        if not cut and len(self.buffer) > self.max_buffer:
+            starts = self._starts
+            cut = starts[-1] if starts and starts[-1] else len(self.buffer) - self.overlap
+        if cut:
+            head, self.buffer = self.buffer[:cut], self.buffer[cut:]
+            self._starts = [start - cut for start in self._starts if start >= cut]
+            self._scanned -= cut
+            self.advance(self.tokenizer.tokenize(head))
+        return self
+
+    def advance(self, tokens):
+        for tok in tokens:
+            self.spam_dfa.transition(tok)
+            self.content_dfa.direction_dfa.transition(tok)
+            self.content_dfa.transition(tok)
+
+    def commit_point(self):
+        """
+        Offset in the buffer up to which the text is final: the start of a
+        word with at least `max_phrase_words` words after it (the last one
+        may still grow) that no phrase match crosses. 0 if there is none.
+        """
+        starts = self.word_starts()
+        keep = self.stages.lexicon.max_phrase_words
+        if len(starts) <= keep:
+            return 0
+        index = len(starts) - keep
+
+        # A phrase that crosses the cut is pulled back whole. Only the last
+        # `keep` words before the cut can start such a phrase.
+        moved = True
+        while moved and index:
+            moved = False
+            cut = starts[index]
+            low = starts[max(0, index - keep)]
+            for text, patterns in self.phrase_texts(low):
+                for pattern in patterns:
+                    for m in pattern.finditer(text):
+                        start = low + m.start()
+                        if start >= cut:
+                            break
+                        if cut < low + m.end():
+                            index = bisect.bisect_right(starts, start) - 1
+                            cut = starts[index]
+                            moved = True
+        return starts[index] if index else 0
+
+    def word_starts(self):
+        """Start offsets of the words in buffer, scanning only what was added since the last call."""
+        self._starts.extend(m.start() for m in _WORD_START.finditer(self.buffer, self._scanned))
+        self._scanned = len(self.buffer)
+        return self._starts
+
+    def phrase_texts(self, low):
+        window = self.buffer[low:]
+        yield window, self.phrase_patterns
+        if self.obfuscated_patterns:
+            yield self.tokenizer.normalizer.fold(window), self.obfuscated_patterns
+
+    # -------------------
+    # Verdict
+    # -------------------
+    def verdict(self):
+        """
+        Final states as if the text ended here. The pending tail is
+        classified on forked states, so feeding can continue afterwards.
+        """
+        spam_dfa = self.spam_dfa.fork()
+        content_dfa = self.content_dfa.fork()
+        for tok in self.tokenizer.tokenize(self.buffer):
+            spam_dfa.transition(tok)
+            content_dfa.direction_dfa.transition(tok)
+            content_dfa.transition(tok)
+
+        spam_state = spam_dfa.end_of_input()
+        content_state = content_dfa.end_of_input()
+        return {
+            "spam_state": spam_state,
+            "content_state": content_state,
+            "dfa_warnings": collect_warnings(spam_state, content_state),
+            "lexicon_version": self.stages.version,
+        }
+
+    # -------------------
+    # Snapshot
+    # -------------------
+    def snapshot(self):
+        """JSON-serializable state; restore it with TextPipeline.open(state)."""
+        return {
+            "lexicon_version": self.stages.version,
+            "buffer": self.buffer,
+            "chars": self.chars,
+            "spam_state": self.spam_dfa.state,
+            "content_state": self.content_dfa.state,
+            "direction_state": self.content_dfa.direction_dfa.state,
+        }
+
+    def restore(self, state):
+        if state["lexicon_version"] != self.stages.version:
+            raise ValueError(
+                f"Session was started with lexicon {state['lexicon_version']}, "
+                f"active lexicon is {self.stages.version}"
+            )
+        self.buffer = state["buffer"]
+        self.chars = state["chars"]
+        self._starts, self._scanned = [], 0
+        self.spam_dfa.state = state["spam_state"]
+        self.content_dfa.state = state["content_state"]
+        self.content_dfa.direction_dfa.state = state["direction_state"]
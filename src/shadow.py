@@ -0,0 +1,293 @@
+import copy
+import importlib
+import math
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+
+from src.session import collect_warnings
+
+COMPARED_FIELDS = ("tokens", "spam_state", "content_state", "censored_text")
+
+
+def private_stages(stages):
+    """
+    Copy of stages with automata of its own. The DFAs and the censorship
+    FST keep their state on the object, so the shadow thread must never
+    step the ones request threads are stepping; lexicon data and prefilter
+    are read-only and stay shared. The tokenizer is shared too, unless it
+    counts keyword hits: shadow comparisons are not traffic, so they get a
+    copy that does not count.
+    """
+    private = copy.copy(stages)
+    if stages.tokenizer.keyword_hits is not None:
+        private.tokenizer = copy.copy(stages.tokenizer)
+        private.tokenizer.keyword_hits = None
+    private.spam_dfa = stages.spam_dfa.fork()
+    private.spam_dfa.tokenizer = private.tokenizer
+    private.content_dfa = stages.content_dfa.fork()
+    private.content_dfa.tokenizer = private.tokenizer
+    private.censorship_fst = copy.copy(stages.censorship_fst)
+    return private
+
+
+def reference_engine(stages, tokenize=None):
+    """
+    The current pipeline as an engine: text -> tokens, spam and content
+    states and censored text, exactly as TextPipeline.run computes them
+    (without campaign state, which depends on traffic, not on the text).
+    `tokenize` replaces the stages' tokenizer.
+    """
+    tokenize = tokenize or stages.tokenizer.tokenize
+
+    def moderate(text):
+        tokens = tokenize(text)
+        spam_state = stages.spam_dfa.process_tokens(tokens)
+        content_state = stages.content_dfa.process_tokens(tokens)
+        warned = collect_warnings(spam_state, content_state)
+        return {
+            "tokens": tokens,
+            "spam_state": spam_state,
+            "content_state": content_state,
+            "censored_text": stages.censorship_fst.process_text(text) if warned else text,
+        }
+    return moderate
+
+
+def legacy_classify(tokenizer, word, folded=None):
+    """Token kind of one whitespace-separated word, as legacy_tokenize classifies it."""
+    if tokenizer.patterns["URL"].fullmatch(word):
+        return "URL"
+    if tokenizer.patterns["HASHTAG"].match(word):
+        return "HASHTAG"
+    if tokenizer.patterns["MENTION"].match(word):
+        return "MENTION"
+    return tokenizer.classify_plain(word, folded)
+
+
+def legacy_tokenize(tokenizer, text):
+    """
+    tokenizer.tokenize as it was before the single-pass lexer: pads emojis
+    with spaces, splits on whitespace and classifies every word with
+    legacy_classify. Returns the same tokens; tests use it as the
+    reference the lexer is checked against.
+    """
+    text = tokenizer.patterns["EMOJI"].sub(r" \g<0> ", text)
+    text = tokenizer.replace_compiled(text, "SPAMWORD")
+    text = tokenizer.replace_compiled(text, "FAKECLAIM")
+
+    folded_words = None
+    if tokenizer.normalizer is not None:
+        text, folded = tokenizer.replace_obfuscated(text, run=re.compile(r"\S+"))
+        if folded is not None:
+            folded_words = folded.lower().split()
+
+    words = text.split()
+    if folded_words is None:
+        return [legacy_classify(tokenizer, word) for word in words]
+    return [legacy_classify(tokenizer, word, folded) for word, folded in zip(words, folded_words)]
+
+
+def legacy_tokenizer_engine(stages):
+    """Candidate example: the pipeline with the tokenizer that predates the single-pass lexer."""
+    return reference_engine(stages, lambda text: legacy_tokenize(stages.tokenizer, text))
+
+
+def load_candidate(spec):
+    """'package.module:factory' -> the factory (for SHADOW_CANDIDATE)."""
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+class LatencyHistogram:
+    """
+    Latencies in logarithmic buckets, `per_octave` buckets per doubling
+    from 1 µs, so memory is constant and percentiles are within ~10%.
+    """
+
+    def __init__(self, per_octave=8):
+        self.per_octave = per_octave
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+
+    def record(self, seconds):
+        us = max(seconds * 1e6, 1.0)
+        index = int(math.log2(us) * self.per_octave)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+
+    def upper_bound(self, index):
+        """Upper edge of a bucket, in seconds."""
+        return 2 ** ((index + 1) / self.per_octave) / 1e6
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (0-100), in seconds."""
+        if not self.count:
+            return None
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self.upper_bound(index)
+        return self.upper_bound(max(self.buckets))
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total / self.count * 1e6 if self.count else None,
+            **{f"p{q}_us": None if self.count == 0 else self.percentile(q) * 1e6 for q in (50, 90, 99)},
+            "buckets": {f"{self.upper_bound(i) * 1e6:.1f}": n for i, n in sorted(self.buckets.items())},
+        }
+
+
+class ShadowRunner:
+    """
+    Runs a candidate engine next to the reference on a sample of traffic.
+
+    submit() is all the request pays: one random draw and, for a sampled
+    post, a non-blocking put on a bounded queue (a full queue drops the
+    post and counts it). A daemon thread takes the posts off the queue,
+    runs the reference and the candidate on the same lexicon stages
+    (alternating which goes first), times both into LatencyHistograms and
+    compares tokens, spam and content states and censored text. The last
+    `max_mismatches` differences are kept with their input.
+
+    `candidate` is a factory: candidate(stages) -> engine, where an engine
+    maps text to the dict reference_engine returns. It is called once per
+    lexicon version, with a private_stages() copy: both engines step
+    automata of their own, so comparisons never disturb the state of the
+    ones request threads use. An engine that raises counts as a mismatch.
+    """
+
+    def __init__(self, candidate, sample_rate=0.01, max_queue=1000, max_mismatches=100,
+                 seed=None, clock=time.perf_counter):
+        self.candidate = candidate
+        self.sample_rate = sample_rate
+        self.max_mismatches = max_mismatches
+        self.clock = clock
+        self.random = random.Random(seed)
+        self.queue = queue.Queue(max_queue)
+        self.mismatches = deque(maxlen=max_mismatches)
+        self.latency = {"reference": LatencyHistogram(), "candidate": LatencyHistogram()}
+        self.counts = {"sampled": 0, "dropped": 0, "compared": 0, "mismatched": 0, "errors": 0}
+        self.field_mismatches = dict.fromkeys(COMPARED_FIELDS, 0)
+        self._engines = {}  # stages -> (reference, candidate), one lexicon version each
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    # -------------------
+    # Request path
+    # -------------------
+    def submit(self, stages, text):
+        """Queues text for comparison with probability sample_rate. Never blocks."""
+        if self.sample_rate <= 0 or self.random.random() >= self.sample_rate:
+            return False
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait((stages, text))
+        except queue.Full:
+            self.counts["dropped"] += 1
+            return False
+        self.counts["sampled"] += 1
+        return True
+
+    def _ensure_thread(self):
+        if self._thread is None or self._pid != os.getpid():
+            # Threads do not survive fork(): every process starts its own
+            with self._lock:
+                if self._thread is None or self._pid != os.getpid():
+                    self._pid = os.getpid()
+                    self._thread = threading.Thread(target=self._work, daemon=True)
+                    self._thread.start()
+
+    # -------------------
+    # Shadow thread
+    # -------------------
+    def _work(self):
+        while True:
+            stages, text = self.queue.get()
+            try:
+                self.compare(stages, text)
+            except Exception:  # the reference itself failed, or building the candidate did
+                with self._lock:
+                    self.counts["errors"] += 1
+            finally:
+                self.queue.task_done()
+
+    def engines(self, stages):
+        """(reference, candidate) engines for stages, built once per stages object."""
+        pair = self._engines.get(stages)
+        if pair is None:
+            if any(s.version != stages.version for s in self._engines):
+                self._engines = {}  # a reload: engines of older versions are dropped
+            # Both engines run on the shadow thread's own automata, never on the live ones
+            private = private_stages(stages)
+            pair = self._engines[stages] = (reference_engine(private), self.candidate(private))
+        return pair
+
+    def compare(self, stages, text):
+        """Runs both engines on text, records latencies and any mismatch. Returns the differing fields."""
+        reference, candidate = self.engines(stages)
+        n = self.counts["compared"]
+        order = (("reference", reference), ("candidate", candidate))
+        outputs, error = {}, None
+        for name, engine in order if n % 2 == 0 else order[::-1]:
+            start = self.clock()
+            try:
+                outputs[name] = engine(text)
+            except Exception as e:  # a broken candidate is a mismatch, not a crash
+                if name == "reference":
+                    raise
+                error = repr(e)
+                outputs[name] = {}
+            self.latency[name].record(self.clock() - start)
+
+        ref, cand = outputs["reference"], outputs["candidate"]
+        fields = [f for f in COMPARED_FIELDS if ref.get(f) != cand.get(f)]
+        with self._lock:
+            self.counts["compared"] += 1
+            if error is not None:
+                self.counts["errors"] += 1
+            if fields:
+                self.counts["mismatched"] += 1
+                for field in fields:
+                    self.field_mismatches[field] += 1
+                self.mismatches.append({
+                    "text": text,
+                    "lexicon_version": stages.version,
+                    "fields": fields,
+                    "reference": {f: ref.get(f) for f in fields},
+                    "candidate": {f: cand.get(f) for f in fields},
+                    "error": error,
+                })
+        return fields
+
+    def drain(self):
+        """Blocks until every queued post has been compared."""
+        self.queue.join()
+
+    # -------------------
+    # Report
+    # -------------------
+    def report(self, mismatches=10):
+        reference = self.latency["reference"].to_dict()
+        candidate = self.latency["candidate"].to_dict()
+        compared = self.counts["compared"]
+        return {
+            **self.counts,
+            "sample_rate": self.sample_rate,
+            "mismatch_rate": self.counts["mismatched"] / compared if compared else 0.0,
+            "field_mismatches": dict(self.field_mismatches),
+            "latency": {"reference": reference, "candidate": candidate},
+            "speedup_p50": (reference["p50_us"] / candidate["p50_us"]) if compared else None,
+            "speedup_mean": (reference["mean_us"] / candidate["mean_us"]) if compared else None,
+            "mismatches": list(self.mismatches)[-mismatches:] if mismatches else [],
+        }
@@ -0,0 +1,310 @@
+"""
+Batch moderation in a process pool, with the texts and the results in shared memory.
+"""
+import multiprocessing
+import re
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from src.pipeline import TextPipeline
+from src.session import collect_warnings
+
+# Final states, in code order; a result is one byte per automaton
+SPAM_STATES = ("qSafe", "qSpam")
+CONTENT_STATES = (
+    "qF_Safe", "qF_Offensive", "qF_Hate", "qF_Sex",
+    "qF_Harass", "qF_SelfHarm", "qF_Threats", "qF_Violence",
+)
+SPAM_CODES = {state: i for i, state in enumerate(SPAM_STATES)}
+CONTENT_CODES = {state: i for i, state in enumerate(CONTENT_STATES)}
+
+TRANSPORTS = ("shared", "pickle")
+_MASK = re.compile(r"\*+")
+# Bytes of texts packed per copy into the segment
+_PACK_RUN = 1 << 18
+
+
+def censored_spans(text, censored):
+    """(start, end) of the runs CensorshipFST masked: where censored has '*' and text does not."""
+    return [
+        m.span() for m in _MASK.finditer(censored)
+        if text[m.start():m.end()] != m.group()
+    ]
+
+
+def apply_spans(text, spans):
+    """text with every span masked, as CensorshipFST.censor() would return it."""
+    if not spans:
+        return text
+    parts, last = [], 0
+    for start, end in spans:
+        parts.append(text[last:start])
+        parts.append("*" * (end - start))
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+class SharedBatch:
+    """
+    A batch of texts and room for their results in one shared memory
+    segment, so that pool workers read their texts and write their results
+    in place and nothing is pickled but the segment name and an index range:
+
+        count    int64
+        offsets  uint64[count + 1]      byte offsets of the texts in `data`
+        codes    uint8[count, 2]        spam and content state codes
+        nspans   uint32[count]          masked spans per text
+        spans    uint32[rows, 2]        (start, end) character offsets
+        data     UTF-8 texts, back to back
+
+    The spans of text i start at row offsets[i] // 2 + i. Masked runs are
+    separated by at least one character, so a text of n bytes has at most
+    ceil(n / 2) of them and the rows of two texts never overlap: workers
+    write disjoint ranges without a lock.
+    """
+
+    def __init__(self, shm):
+        self.shm = shm
+        buf = shm.buf
+        self.count = count = int(np.frombuffer(buf, np.int64, 1)[0])
+        position = 8
+        self.offsets = np.frombuffer(buf, np.uint64, count + 1, position)
+        position += _align(8 * (count + 1))
+        self.codes = np.frombuffer(buf, np.uint8, 2 * count, position).reshape(count, 2)
+        position += _align(2 * count)
+        self.nspans = np.frombuffer(buf, np.uint32, count, position)
+        position += _align(4 * count)
+        rows = self.rows(count, int(self.offsets[-1]))
+        self.spans = np.frombuffer(buf, np.uint32, 2 * rows, position).reshape(rows, 2)
+        position += 8 * rows
+        self.data = buf[position:position + int(self.offsets[-1])]
+
+    @staticmethod
+    def rows(count, nbytes):
+        return nbytes // 2 + count
+
+    @classmethod
+    def size(cls, count, nbytes):
+        return (
+            8 + _align(8 * (count + 1)) + _align(2 * count) + _align(4 * count)
+            + 8 * cls.rows(count, nbytes) + nbytes
+        )
+
+    @classmethod
+    def pack(cls, texts, shm=None):
+        """
+        texts packed into shm, or into a new segment when shm is None or too
+        small; the owner of the segment closes and unlinks it. Reusing one
+        segment keeps its pages mapped: a new one is page-faulted anew.
+        """
+        encoded = list(map(str.encode, texts))
+        offsets = np.zeros(len(encoded) + 1, np.uint64)
+        np.cumsum(np.fromiter(map(len, encoded), np.uint64, len(encoded)), out=offsets[1:])
+        size = cls.size(len(encoded), int(offsets[-1]))
+        if shm is None or shm.size < size:
+            shm = shared_memory.SharedMemory(create=True, size=size)
+        # The layout depends on count and total size: header first, then the views
+        header = np.frombuffer(shm.buf, np.int64, 1)
+        header[0] = len(encoded)
+        np.frombuffer(shm.buf, np.uint64, len(offsets), 8)[:] = offsets
+        del header
+        batch = cls(shm)
+        # Texts joined in runs of about _PACK_RUN bytes: one slice assignment per
+        # run, not per text, and the joined copy of a run stays in cache
+        data, bounds = batch.data, offsets.tolist()
+        cuts = np.unique(np.searchsorted(offsets, np.arange(0, bounds[-1], _PACK_RUN), "right") - 1).tolist()
+        for first, last in zip(cuts, cuts[1:] + [len(encoded)]):
+            data[bounds[first]:bounds[last]] = b"".join(encoded[first:last])
+        return batch
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # -------------------
+    # Worker side
+    # -------------------
+    def texts(self, start, stop):
+        """Texts start..stop-1, decoded from the segment."""
+        offsets, data = self.offsets[start:stop + 1].tolist(), self.data
+        return [str(data[a:b], "utf-8") for a, b in zip(offsets, offsets[1:])]
+
+    def span_rows(self, indexes, counts):
+        """Span rows of texts `indexes`, counts[i] from the first row of each (non-empty NumPy arrays)."""
+        first = self.offsets[indexes].astype(np.int64) // 2 + indexes
+        # first[i], first[i] + 1, ... first[i] + counts[i] - 1, for every i
+        ends = np.cumsum(counts)
+        return np.repeat(first - (ends - counts), counts) + np.arange(ends[-1])
+
+    def write(self, start, results):
+        """(spam_state, content_state, spans) of texts start, start + 1, ..."""
+        if not results:
+            return
+        stop = start + len(results)
+        spam, content, spans = zip(*results)
+        self.codes[start:stop, 0] = list(map(SPAM_CODES.__getitem__, spam))
+        self.codes[start:stop, 1] = list(map(CONTENT_CODES.__getitem__, content))
+        counts = np.fromiter(map(len, spans), np.int64, len(spans))
+        self.nspans[start:stop] = counts
+        masked = np.flatnonzero(counts)
+        if len(masked):
+            rows = self.span_rows(masked + start, counts[masked])
+            self.spans[rows] = [span for i in masked.tolist() for span in spans[i]]
+
+    # -------------------
+    # Caller side
+    # -------------------
+    def results(self):
+        """(spam_state, content_state, spans) written for every text."""
+        spam, content = self.codes.T.tolist() if self.count else ([], [])
+        masked = [[] for _ in range(self.count)]
+        # Only texts with spans are sliced, from one gather of all their rows
+        indexes = np.flatnonzero(self.nspans)
+        if len(indexes):
+            counts = self.nspans[indexes].astype(np.int64)
+            rows = self.spans[self.span_rows(indexes, counts)].tolist()
+            position = 0
+            for i, count in zip(indexes.tolist(), counts.tolist()):
+                masked[i] = rows[position:position + count]
+                position += count
+        return list(zip(map(SPAM_STATES.__getitem__, spam), map(CONTENT_STATES.__getitem__, content), masked))
+
+    def release(self):
+        """Drops the views into the segment, which stays mapped; it can be unmapped once they are gone."""
+        self.offsets = self.codes = self.nspans = self.spans = None
+        self.data.release()
+
+    def close(self):
+        self.release()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# -------------------
+# Workers
+# -------------------
+_pipeline = None
+_segment = None
+
+
+def _init_worker(options):
+    global _pipeline
+    _pipeline = TextPipeline(**options)
+
+
+def _moderate(texts):
+    """(spam_state, content_state, masked spans) per text, with the worker's pipeline."""
+    stages = _pipeline.stages
+    results = []
+    for text, verdict in zip(texts, _pipeline.classify_batch(texts)):
+        spans = []
+        if verdict["dfa_warnings"]:
+            spans = censored_spans(text, stages.route(text).censorship_fst.censor(text))
+        results.append((verdict["spam_state"], verdict["content_state"], spans))
+    return results
+
+
+def _moderate_shared(name, start, stop):
+    global _segment
+    # The pool reuses its segment from batch to batch: keep it mapped until a new one comes
+    if _segment is None or _segment.name != name:
+        if _segment is not None:
+            _segment.close()
+        _segment = shared_memory.SharedMemory(name=name)
+    batch = SharedBatch(_segment)
+    try:
+        batch.write(start, _moderate(batch.texts(start, stop)))
+    finally:
+        batch.release()
+    return stop - start
+
+
+class BatchPool:
+    """
+    Moderates batches in `workers` processes, each with its own
+    TextPipeline(**options). With transport="shared" the texts are packed
+    once into a SharedBatch: workers decode their slices in place and write
+    state codes and masked spans back, so only segment names and index
+    ranges are pickled. transport="pickle" sends the texts and receives the
+    same results through the pool's pipes, for comparison.
+
+    classify_batch() returns, per text, the spam and content states, the
+    warning codes and the censored text, as run() would give them for a
+    post without campaign or flood checks.
+    """
+
+    def __init__(self, workers=None, transport="shared", chunks_per_worker=4, context=None, **options):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"transport must be one of {TRANSPORTS}")
+        self.transport = transport
+        self.workers = workers or multiprocessing.cpu_count()
+        self.chunks_per_worker = chunks_per_worker
+        self._segment = None
+        # Workers must share this process's resource tracker: one of their own
+        # would unlink the segments they attach to when they exit
+        resource_tracker.ensure_running()
+        self._pool = multiprocessing.get_context(context).Pool(self.workers, _init_worker, (options,))
+
+    def ranges(self, count):
+        step = max(1, -(-count // (self.workers * self.chunks_per_worker)))
+        return [(start, min(start + step, count)) for start in range(0, count, step)]
+
+    def classify_batch(self, texts):
+        """One verdict per text, in order; the batch is split into chunks_per_worker ranges per worker."""
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.transport == "pickle":
+            results = []
+            for chunk in self._pool.map(_moderate, [texts[a:b] for a, b in self.ranges(len(texts))]):
+                results.extend(chunk)
+        else:
+            batch = SharedBatch.pack(texts, self._segment)
+            if batch.shm is not self._segment:
+                self._unlink_segment()
+                self._segment = batch.shm
+            try:
+                self._pool.starmap(_moderate_shared, [(batch.name, a, b) for a, b in self.ranges(len(texts))])
+                results = batch.results()
+            finally:
+                batch.release()
+        return [self._verdict(text, *result) for text, result in zip(texts, results)]
+
+    @staticmethod
+    def _verdict(text, spam_state, content_state, spans):
+        warnings = collect_warnings(spam_state, content_state)
+        return {
+            "spam_state": spam_state,
+            "content_state": content_state,
+            "dfa_warnings": warnings,
+            "censored_text": apply_spans(text, spans).strip() if warnings else text,
+        }
+
+    def _unlink_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+        self._unlink_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
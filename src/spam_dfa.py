@@ -1,10 +1,11 @@
-from pathlib import Path
+import copy
+
 from .preprocessing import RegexTokenizer
 
 class SpamDFA:
-    def __init__(self):
-        keywords_file = Path(__file__).parent / "data" / "keywords.json"
-        self.tokenizer = RegexTokenizer(str(keywords_file))
+    def __init__(self, lexicon=None, normalizer=None, tokenizer=None):
+        # Shares the pipeline's tokenizer, or the lexicon's word sets, else loads keywords.json
+        self.tokenizer = tokenizer or RegexTokenizer("data/keywords.json", lexicon=lexicon, normalizer=normalizer)
 
         # -------------------
         # States
@@ -28,6 +29,10 @@ class SpamDFA:
     def reset(self):
         self.state = self.q0
 
+    def fork(self):
+        """Independent copy of the current state; shares the tokenizer."""
+        return copy.copy(self)
+
     # -------------------
     # Transitions
     # -------------------
@@ -119,12 +124,28 @@ class SpamDFA:
     # Process text
     # -------------------
     def process_text(self, text):
-        self.reset()
         tokens = self.tokenizer.tokenize(text) if self.tokenizer else text.split()
+        return self.process_tokens(tokens)
+
+    def process_tokens(self, tokens):
+        """Runs an already tokenized text (e.g. the pipeline's own tokens)."""
+        self.reset()
         for tok in tokens:
             self.transition(tok)
         return self.end_of_input()
 
+    def process_tokens_traced(self, tokens, trace):
+        """process_tokens that records every (token, from, to) step in trace (a TransitionTrace)."""
+        self.reset()
+        record = trace.record
+        for tok in tokens:
+            before = self.state
+            self.transition(tok)
+            record("spam", tok, before, self.state)
+        final = self.end_of_input()
+        record("spam", "$", self.state, final)
+        return final
+
     # -------------------
     # End of input ($)
     # -------------------
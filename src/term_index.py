@@ -0,0 +1,366 @@
+"""
+Bulk lexicon terms compiled to a memory-mapped double-array trie: `python -m src.term_index build TERMS OUT`.
+"""
+import argparse
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+
+from src.lexicon import EXACT_CATEGORIES, SUBSTRING_CATEGORIES
+
+MAGIC = b"LEXTRIE1"
+FORMAT = 1
+# Value of a trie node: index in INDEX_CATEGORIES, in tokenizer precedence
+INDEX_CATEGORIES = tuple(attr for _, attr in SUBSTRING_CATEGORIES + EXACT_CATEGORIES)
+CATEGORY_KINDS = {attr: kind for kind, attr in SUBSTRING_CATEGORIES + EXACT_CATEGORIES}
+SUBSTRING_COUNT = len(SUBSTRING_CATEGORIES)
+# Token kind -> precedence; kinds the index never produces (NEG_EMOJI) rank last
+KIND_RANK = {CATEGORY_KINDS[c]: i for i, c in enumerate(INDEX_CATEGORIES)}
+# Whole words CensorshipFST masks
+MASKED_KINDS = frozenset({"BADWORD", "SEXWORD", "VIOLENCE"})
+NO_VALUE = -1
+
+
+def read_terms(path):
+    """(category, term) pairs of a TERMS file: one `category<TAB>term` per line, # comments."""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            category, sep, term = line.partition("\t")
+            if not sep or not term:
+                raise ValueError(f"{path}:{number}: expected category<TAB>term")
+            yield category, term
+
+
+def build(entries, path):
+    """
+    Compiles (category, term) pairs into a trie file at path and returns
+    its header. Terms are lowercased like the tokenizer lowercases words;
+    a term listed under several categories keeps the first one in
+    tokenizer precedence. Categories are the single-word ones of
+    keywords.json (INDEX_CATEGORIES); phrases and emojis stay there.
+    """
+    best = {}
+    for category, term in entries:
+        if category not in INDEX_CATEGORIES:
+            raise ValueError(f"unknown category {category!r}, expected one of {INDEX_CATEGORIES}")
+        key = term.lower().encode("utf-8")
+        if not key:
+            continue
+        value = INDEX_CATEGORIES.index(category)
+        if best.get(key, value) >= value:
+            best[key] = value
+    keys = sorted(best)
+    values = [best[k] for k in keys]
+
+    # Only the bytes that occur get a code, so transitions stay close together
+    alphabet = sorted({b for k in keys for b in k})
+    codes = bytearray(256)
+    for i, b in enumerate(alphabet, 1):
+        codes[b] = i
+    base, check, value = _double_array(keys, values, codes, len(alphabet))
+
+    digest = hashlib.sha256()
+    for k, v in zip(keys, values):
+        digest.update(k + b"\0" + bytes([v]) + b"\n")
+    header = {
+        "format": FORMAT,
+        "byteorder": sys.byteorder,
+        "categories": list(INDEX_CATEGORIES),
+        "terms": len(keys),
+        "size": len(base),
+        "version": digest.hexdigest()[:12],
+    }
+    raw = json.dumps(header).encode("utf-8")
+    raw += b" " * (-(len(MAGIC) + 4 + len(raw)) % 8)        # arrays start 8-byte aligned
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + len(raw).to_bytes(4, "little") + raw + bytes(codes))
+        base.tofile(f)
+        check.tofile(f)
+        value.tofile(f)
+    os.replace(tmp, path)
+    return header
+
+
+def _double_array(keys, values, codes, alphabet_size):
+    """
+    base/check/value arrays of the trie of sorted keys. A node is the
+    range of keys that share its prefix; the children of state s with
+    codes c1 < c2 < ... go to base[s] + ci, and check[t] == s proves t is
+    a child of s. base values are found first-fit along a linked list of
+    the free slots, which keeps the arrays about as long as the number of
+    nodes and never rescans the occupied ones.
+    """
+    size = 0
+    base, check, value = array("i"), array("i"), array("b")
+    used = bytearray()
+    # Free slots as a doubly linked list (-1 ends it)
+    nxt, prv = array("i"), array("i")
+    head = tail = -1
+
+    def grow(n):
+        nonlocal size, head, tail
+        if n <= size:
+            return
+        new = max(n, 2 * size, 1024)
+        extra = new - size
+        base.extend(array("i", bytes(4 * extra)))
+        check.extend(array("i", [-1]) * extra)
+        value.extend(array("b", [NO_VALUE]) * extra)
+        used.extend(bytes(extra))
+        nxt.extend(array("i", range(size + 1, new + 1)))
+        prv.extend(array("i", range(size - 1, new - 1)))
+        nxt[new - 1] = -1
+        prv[size] = tail
+        if tail >= 0:
+            nxt[tail] = size
+        else:
+            head = size
+        tail = new - 1
+        size = new
+
+    def occupy(t):
+        nonlocal head, tail
+        used[t] = 1
+        before, after = prv[t], nxt[t]
+        if before >= 0:
+            nxt[before] = after
+        else:
+            head = after
+        if after >= 0:
+            prv[after] = before
+        else:
+            tail = before
+
+    grow(max(1024, 2 * len(keys)))
+    occupy(0)                                                     # root
+    max_index, hint = 0, 1
+    stack = [(0, 0, len(keys), 0)]
+    while stack:
+        state, lo, hi, depth = stack.pop()
+        if lo < hi and len(keys[lo]) == depth:                    # keys[lo] ends here (sorted first)
+            value[state] = values[lo]
+            lo += 1
+        labels, ranges = [], []
+        j = lo
+        while j < hi:
+            byte = keys[j][depth]
+            if byte == 255:
+                k = hi
+            else:
+                k = bisect.bisect_left(keys, keys[j][:depth] + bytes([byte + 1]), j, hi)
+            labels.append(codes[byte])
+            ranges.append((j, k))
+            j = k
+        if not labels:
+            continue
+
+        # First-fit base: every base + label must be free. Most nodes have
+        # one child and take the first free slot; the others scan from
+        # `hint`, moved forward when the slots before it keep failing
+        first, last = labels[0], labels[-1]
+        if len(labels) == 1:
+            free = head
+            while free >= 0 and free - first < 1:
+                free = nxt[free]
+            if free < 0:
+                free = size
+                grow(size + 1)
+            b = free - first
+        else:
+            pos, tries = hint, 0
+            while True:
+                pos = used.find(0, pos)
+                if pos < 0:
+                    pos = size
+                    grow(2 * size)
+                b = pos - first
+                if b >= 1:
+                    grow(b + last + 1)
+                    if all(not used[b + c] for c in labels[1:]):
+                        break
+                pos += 1
+                tries += 1
+            if tries > 32:
+                hint = pos
+        base[state] = b
+        for c, (j, k) in zip(labels, ranges):
+            t = b + c
+            occupy(t)
+            check[t] = state
+            stack.append((t, j, k, depth + 1))
+        max_index = max(max_index, b + last)
+
+    # Room for base + any code from the last used state, so lookups need no bounds check
+    end = max_index + alphabet_size + 1
+    grow(end)
+    return base[:end], check[:end], value[:end]
+
+
+class TermIndex:
+    """
+    Read-only view of a trie file built by build(), through mmap.
+
+    Nothing is parsed or copied at startup: the arrays are memoryviews of
+    the mapping, so every process that opens (or inherits) the same file
+    shares its physical pages, and only the pages lookups touch are read.
+    Words are looked up as the tokenizer sees them (lowercased):
+    classify() walks the trie from every position of the word, so terms
+    of substring categories match anywhere and terms of exact categories
+    only as the whole word, with the tokenizer's precedence.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        if buf[:len(MAGIC)] != MAGIC:
+            buf.release()
+            self._mmap.close()
+            raise ValueError(f"{self.path}: not a term index")
+        start = len(MAGIC) + 4
+        length = int.from_bytes(buf[len(MAGIC):start], "little")
+        self.header = json.loads(bytes(buf[start:start + length]))
+        if self.header["format"] != FORMAT or self.header["byteorder"] != sys.byteorder:
+            buf.release()
+            self._mmap.close()
+            raise ValueError(f"{self.path}: format {self.header['format']} ({self.header['byteorder']}) not supported")
+        offset = start + length
+        size = self.header["size"]
+        self.codes = bytes(buf[offset:offset + 256])
+        offset += 256
+        self.base = buf[offset:offset + 4 * size].cast("i")
+        offset += 4 * size
+        self.check = buf[offset:offset + 4 * size].cast("i")
+        offset += 4 * size
+        self.value = buf[offset:offset + size].cast("b")
+        self._buf = buf
+        self.version = self.header["version"]
+        self.kinds = tuple(CATEGORY_KINDS[c] for c in self.header["categories"])
+
+    def __len__(self):
+        return self.header["terms"]
+
+    @property
+    def nbytes(self):
+        return len(self._mmap)
+
+    # -------------------
+    # Lookups
+    # -------------------
+    def classify(self, word_lower):
+        """Token kind of a lowercased word from the indexed terms, or None."""
+        data = word_lower.encode("utf-8")
+        codes, base, check, value = self.codes, self.base, self.check, self.value
+        n = len(data)
+        inside = exact = NO_VALUE
+        for i in range(n):
+            state = 0
+            for j in range(i, n):
+                code = codes[data[j]]
+                if not code:
+                    break
+                t = base[state] + code
+                if check[t] != state:
+                    break
+                state = t
+                v = value[t]
+                if v == NO_VALUE:
+                    continue
+                if v < SUBSTRING_COUNT:
+                    if v == 0:                       # first category: nothing can outrank it
+                        return self.kinds[0]
+                    if inside == NO_VALUE or v < inside:
+                        inside = v
+                elif i == 0 and j == n - 1:
+                    exact = v
+        if inside != NO_VALUE:
+            return self.kinds[inside]
+        return None if exact == NO_VALUE else self.kinds[exact]
+
+    def first(self, kind, word_lower):
+        """Whichever of kind and classify(word_lower) comes first in tokenizer precedence."""
+        indexed = self.classify(word_lower)
+        if indexed is None:
+            return kind
+        if kind is None or KIND_RANK[indexed] < KIND_RANK.get(kind, len(KIND_RANK)):
+            return indexed
+        return kind
+
+    def get(self, word_lower):
+        """Kind of the term that is exactly word_lower, or None."""
+        codes, base, check = self.codes, self.base, self.check
+        state = 0
+        for byte in word_lower.encode("utf-8"):
+            code = codes[byte]
+            if not code:
+                return None
+            t = base[state] + code
+            if check[t] != state:
+                return None
+            state = t
+        v = self.value[state] if state else NO_VALUE
+        return None if v == NO_VALUE else self.kinds[v]
+
+    def search(self, text_lower):
+        """True if a term of a substring category occurs anywhere in text_lower."""
+        data = text_lower.encode("utf-8")
+        codes, base, check, value = self.codes, self.base, self.check, self.value
+        n = len(data)
+        for i in range(n):
+            if not codes[data[i]]:
+                continue
+            state = 0
+            for j in range(i, n):
+                code = codes[data[j]]
+                if not code:
+                    break
+                t = base[state] + code
+                if check[t] != state:
+                    break
+                state = t
+                if 0 <= value[t] < SUBSTRING_COUNT:
+                    return True
+        return False
+
+    def close(self):
+        for view in (self.base, self.check, self.value, self._buf):
+            view.release()
+        self._mmap.close()
+
+    def stats(self):
+        return {"path": self.path, "bytes": self.nbytes, **self.header}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser("build", help="compile a category<TAB>term file")
+    command.add_argument("terms")
+    command.add_argument("out")
+    command = commands.add_parser("stats")
+    command.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        header = build(read_terms(args.terms), args.out)
+        print(f"{header['terms']} terms, {os.path.getsize(args.out)} bytes -> {args.out}")
+        return 0
+    index = TermIndex(args.path)
+    print(json.dumps(index.stats(), indent=2))
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import random
+from collections import deque
+
+TRACE_CAPACITY = 1024
+
+
+class TransitionTrace:
+    """
+    Transitions of one run, in a ring buffer allocated up front.
+
+    record(machine, token, from_state, to_state) stores one step; once
+    `capacity` steps are stored, each new one overwrites the oldest, so a
+    very long post keeps its last `capacity` steps and counts the rest in
+    `dropped`. Only the *_traced methods of the automata write here; their
+    plain methods never see a trace.
+    """
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        self.capacity = capacity
+        self.entries = [None] * capacity
+        self.recorded = 0
+
+    def record(self, machine, token, from_state, to_state):
+        self.entries[self.recorded % self.capacity] = (machine, token, from_state, to_state)
+        self.recorded += 1
+
+    @property
+    def dropped(self):
+        return max(0, self.recorded - self.capacity)
+
+    def __len__(self):
+        return min(self.recorded, self.capacity)
+
+    def events(self, machine=None):
+        """Stored steps oldest first, as (machine, token, from_state, to_state)."""
+        start = self.recorded % self.capacity if self.recorded > self.capacity else 0
+        ordered = self.entries[start:len(self)] + self.entries[:start]
+        return [e for e in ordered if machine is None or e[0] == machine]
+
+    def to_dict(self):
+        return {
+            "capacity": self.capacity,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "events": [
+                {"machine": m, "token": t, "from": a, "to": b} for m, t, a, b in self.events()
+            ],
+        }
+
+
+class Tracer:
+    """
+    Decides which runs are traced: every run that asks for it, plus a
+    random `sample_rate` of the others. The last `keep` traces are kept
+    with their text and lexicon version for the admin report.
+    """
+
+    def __init__(self, sample_rate=0.0, capacity=TRACE_CAPACITY, keep=100, seed=None):
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.random = random.Random(seed)
+        self.recent = deque(maxlen=keep)
+
+    def start(self, text, version, force=False):
+        """A new TransitionTrace for this run, or None when it is not traced."""
+        if not force and (self.sample_rate <= 0 or self.random.random() >= self.sample_rate):
+            return None
+        trace = TransitionTrace(self.capacity)
+        self.recent.append((text, version, trace))
+        return trace
+
+    def report(self, limit=10):
+        """Last `limit` traces, newest last (steps recorded so far)."""
+        recent = list(self.recent)[-limit:] if limit else []
+        return {
+            "sample_rate": self.sample_rate,
+            "traces": [
+                {"text": text, "lexicon_version": version, **trace.to_dict()}
+                for text, version, trace in recent
+            ],
+        }
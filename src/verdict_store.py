@@ -0,0 +1,270 @@
+"""
+Persistent verdicts: `python -m src.verdict_store {stats,compact} PATH`.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# Most SQLite builds accept 999 bound parameters per statement at least
+IN_CHUNK = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS verdicts (
+    content_hash    BLOB NOT NULL,
+    lexicon_version TEXT NOT NULL,
+    spam_state      TEXT NOT NULL,
+    content_state   TEXT NOT NULL,
+    created_at      REAL NOT NULL,
+    PRIMARY KEY (content_hash, lexicon_version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS verdicts_created_at ON verdicts (created_at);
+"""
+
+
+def content_hash(text):
+    """16-byte digest of a post; the store never keeps the text itself."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class VerdictStore:
+    """
+    Local SQLite file of (content hash, lexicon version) -> spam and content
+    states, so verdicts survive restarts and deploys.
+
+    The database runs in WAL mode: readers never wait for the writer and a
+    commit is one append to the log. Writes are buffered and committed
+    `batch_size` at a time (or once `flush_interval` seconds have passed
+    since the last commit); pending verdicts are answered from memory, and
+    flush()/close() commit them. Every row keeps the time it was written,
+    which makes the table an audit log of what each lexicon version decided.
+
+    `max_rows` caps the table: after every `max_rows // 10` inserts the
+    oldest rows beyond the cap are deleted. compact() also drops old
+    versions and ages and gives the space back to the file system.
+
+    One connection per process, guarded by a lock. A process forked after
+    the store was opened gets a fresh connection on first use.
+    """
+
+    def __init__(self, path, batch_size=256, flush_interval=1.0, max_rows=1_000_000,
+                 clock=time.time):
+        self.path = str(path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.clock = clock
+        self.pending = {}  # (hash, version) -> (spam_state, content_state, created_at)
+        self.hits = 0
+        self.misses = 0
+        self._since_trim = 0
+        self._last_flush = clock()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+
+    # -------------------
+    # Connection
+    # -------------------
+    @property
+    def conn(self):
+        if self._pid != os.getpid():
+            # Never reuse a connection across fork(); the parent's pending rows are its own
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            if self._pid is not None:
+                self.pending = {}
+            self._pid = os.getpid()
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._pid in (None, os.getpid()):
+                self._flush()
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+    # -------------------
+    # Lookups
+    # -------------------
+    def get(self, text_hash, version):
+        """(spam_state, content_state) or None."""
+        return self.get_many([text_hash], version).get(text_hash)
+
+    def get_many(self, hashes, version):
+        """hash -> (spam_state, content_state) for the hashes stored, one IN query per IN_CHUNK."""
+        found = {}
+        with self._lock:
+            missing = []
+            for h in dict.fromkeys(hashes):
+                row = self.pending.get((h, version))
+                if row is None:
+                    missing.append(h)
+                else:
+                    found[h] = row[:2]
+            for start in range(0, len(missing), IN_CHUNK):
+                chunk = missing[start:start + IN_CHUNK]
+                rows = self.conn.execute(
+                    "SELECT content_hash, spam_state, content_state FROM verdicts "
+                    f"WHERE lexicon_version = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    [version, *chunk],
+                )
+                for h, spam_state, content_state in rows:
+                    found[h] = (spam_state, content_state)
+        self.hits += len(found)
+        self.misses += len(set(hashes)) - len(found)
+        return found
+
+    # -------------------
+    # Writes
+    # -------------------
+    def put(self, text_hash, version, spam_state, content_state):
+        self.put_many([(text_hash, spam_state, content_state)], version)
+
+    def put_many(self, verdicts, version):
+        """Buffers (hash, spam_state, content_state) triples; commits once the batch is full."""
+        now = self.clock()
+        with self._lock:
+            for h, spam_state, content_state in verdicts:
+                self.pending[(h, version)] = (spam_state, content_state, now)
+            if len(self.pending) >= self.batch_size or now - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = self.clock()
+        if not self.pending:
+            return
+        rows = [(h, version, *row) for (h, version), row in self.pending.items()]
+        conn = self.conn
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+        self.pending = {}
+        self._since_trim += len(rows)
+        if self.max_rows and self._since_trim >= max(1, self.max_rows // 10):
+            self._trim(self.max_rows)
+
+    def _trim(self, max_rows):
+        """Deletes the oldest rows beyond max_rows; returns how many."""
+        self._since_trim = 0
+        excess = self.conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0] - max_rows
+        if excess <= 0:
+            return 0
+        # No rowid (WITHOUT ROWID table): select the oldest rows by their key
+        self.conn.execute(
+            "DELETE FROM verdicts WHERE (content_hash, lexicon_version) IN "
+            "(SELECT content_hash, lexicon_version FROM verdicts ORDER BY created_at LIMIT ?)",
+            (excess,),
+        )
+        return excess
+
+    # -------------------
+    # Maintenance
+    # -------------------
+    def compact(self, max_rows=None, max_age=None, keep_versions=None):
+        """
+        Deletes rows older than max_age seconds, rows of all but the
+        keep_versions most recent lexicon versions and the oldest rows
+        beyond max_rows (the store's own cap by default), then vacuums the
+        file and truncates the WAL. Returns the number of rows deleted.
+        """
+        with self._lock:
+            self._flush()
+            conn = self.conn
+            before = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            if max_age is not None:
+                conn.execute("DELETE FROM verdicts WHERE created_at < ?", (self.clock() - max_age,))
+            if keep_versions is not None:
+                conn.execute(
+                    "DELETE FROM verdicts WHERE lexicon_version NOT IN ("
+                    "SELECT lexicon_version FROM verdicts GROUP BY lexicon_version "
+                    "ORDER BY MAX(created_at) DESC LIMIT ?)",
+                    (keep_versions,),
+                )
+            max_rows = self.max_rows if max_rows is None else max_rows
+            if max_rows:
+                self._trim(max_rows)
+            after = conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return before - after
+
+    def audit(self, since=None, version=None, limit=None):
+        """Stored rows, oldest first, as dicts (hash in hex)."""
+        self.flush()
+        query, params = "SELECT * FROM verdicts WHERE created_at >= ?", [since or 0]
+        if version is not None:
+            query += " AND lexicon_version = ?"
+            params.append(version)
+        query += " ORDER BY created_at LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [
+            {"content_hash": h.hex(), "lexicon_version": v, "spam_state": s,
+             "content_state": c, "created_at": t}
+            for h, v, s, c, t in rows
+        ]
+
+    def __len__(self):
+        with self._lock:
+            stored = self.conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+            return stored + len(self.pending)
+
+    def stats(self):
+        with self._lock:
+            versions = dict(self.conn.execute(
+                "SELECT lexicon_version, COUNT(*) FROM verdicts GROUP BY lexicon_version"
+            ).fetchall())
+            pending = len(self.pending)
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "rows": sum(versions.values()),
+            "pending": pending,
+            "versions": versions,
+            "bytes": sum(
+                os.path.getsize(self.path + suffix)
+                for suffix in ("", "-wal") if os.path.exists(self.path + suffix)
+            ),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats").add_argument("path")
+    compact = commands.add_parser("compact")
+    compact.add_argument("path")
+    compact.add_argument("--max-rows", type=int)
+    compact.add_argument("--max-age-days", type=float)
+    compact.add_argument("--keep-versions", type=int)
+    args = parser.parse_args(argv)
+
+    store = VerdictStore(args.path)
+    if args.command == "compact":
+        max_age = None if args.max_age_days is None else args.max_age_days * 86_400
+        deleted = store.compact(args.max_rows, max_age, args.keep_versions)
+        print(f"deleted {deleted} rows")
+    print(json.dumps(store.stats(), indent=2))
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
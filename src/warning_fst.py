@@ -3,6 +3,8 @@ class WarningFST:
         # Diccionario de estados finales a advertencias
         self.transitions = {
             "qSpam": "this post may contain spam",
+            "qCampaign": "this post may be part of a spam campaign",
+            "qFlood": "this author is posting too fast",
             "qF_Offensive": "this post may contain offensive language",
             "qF_Hate": "this post may contain hate speech",
             "qF_Sex": "this post may contain sexual content",
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+
+class WordCache:
+    """
+    Bounded LRU memo of word -> token kind for RegexTokenizer.
+
+    Word frequencies follow Zipf's law, so a few thousand entries answer
+    most lookups without running the category checks again. Entries belong
+    to one lexicon version: bind() with a new version swaps in an empty
+    table, and get/put from a tokenizer of any other version are ignored,
+    so a reload never serves a stale kind, not even to a request that was
+    already running.
+
+    The (version, table) pair is replaced in one assignment and get/put use
+    single OrderedDict operations, so no lock is needed; under heavy
+    concurrency the hit/miss counters are approximate.
+    """
+
+    def __init__(self, capacity=10_000, version=None):
+        self.capacity = capacity
+        self._slot = (version, OrderedDict())
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self):
+        return self._slot[0]
+
+    def bind(self, version):
+        """Ties the cache to a lexicon version; a different version empties it."""
+        if version != self._slot[0]:
+            self._slot = (version, OrderedDict())
+
+    def get(self, key, version):
+        bound, entries = self._slot
+        kind = entries.get(key) if bound == version else None
+        if kind is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            entries.move_to_end(key)
+        except KeyError:  # evicted by another thread in between
+            pass
+        return kind
+
+    def put(self, key, kind, version):
+        bound, entries = self._slot
+        if bound != version or self.capacity <= 0:
+            return
+        entries[key] = kind
+        if len(entries) > self.capacity:
+            try:
+                entries.popitem(last=False)
+            except KeyError:
+                pass
+
+    def clear(self):
+        self._slot = (self._slot[0], OrderedDict())
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._slot[1])
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "size": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+        }
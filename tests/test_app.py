@@ -0,0 +1,149 @@
+import pytest
+from app import app
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    return app.test_client()
+
+def test_index_form(client):
+    response = client.post("/", data={"user_text": "You are a stupid person"})
+    assert response.status_code == 200
+    assert b"this post may contain hate speech" in response.data
+
+def test_api_moderate(client):
+    response = client.post("/api/moderate", json={"text": "You are a stupid person"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["content_state"] == "qF_Hate"
+    assert body["spam_state"] == "qSafe"
+    assert "this post may contain hate speech" in body["warnings"]
+    assert "stupid" not in body["text"]
+
+def test_api_moderate_deadline(client):
+    body = client.post("/api/moderate", json={"text": "You are a stupid person", "deadline_ms": 60_000}).get_json()
+    assert body["degraded"] is False
+    body = client.post("/api/moderate", json={"text": "You are a stupid person", "deadline_ms": 0}).get_json()
+    assert body["degraded"] is True
+    response = client.post("/api/moderate", json={"text": "hi", "deadline_ms": "soon"})
+    assert response.status_code == 400
+
+def test_api_moderate_requires_text(client):
+    response = client.post("/api/moderate", json={"message": "hi"})
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+def test_admin_reload_lexicon(client):
+    response = client.post("/admin/lexicon/reload")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["reloaded"] is False
+    assert body["version"] == client.post("/api/moderate", json={"text": "hi"}).get_json()["lexicon_version"]
+
+def test_admin_reload_lexicon_local_only(client):
+    response = client.post("/admin/lexicon/reload", environ_base={"REMOTE_ADDR": "10.0.0.5"})
+    assert response.status_code == 403
+
+def test_api_classify(client):
+    response = client.post("/api/classify", json={"text": "You are a stupid person"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["content_state"] == "qF_Hate"
+    assert body["dfa_warnings"] == ["qF_Hate"]
+    assert "text" not in body
+
+def test_api_classify_batch(client):
+    response = client.post("/api/classify", json={"texts": ["hello", "free money now"]})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [r["spam_state"] for r in results] == ["qSafe", "qSpam"]
+
+def test_api_classify_requires_text(client):
+    response = client.post("/api/classify", json={"texts": "hello"})
+    assert response.status_code == 400
+
+def test_admin_shadow_report():
+    from app import create_app
+    from src.pipeline import TextPipeline
+    from src.shadow import ShadowRunner, legacy_tokenizer_engine
+    assert app.test_client().get("/admin/shadow").status_code == 404   # off by default
+
+    shadow = ShadowRunner(legacy_tokenizer_engine, sample_rate=1.0)
+    client = create_app(TextPipeline(shadow=shadow)).test_client()
+    client.post("/api/moderate", json={"text": "You are a stupid person"})
+    shadow.drain()
+    body = client.get("/admin/shadow").get_json()
+    assert body["compared"] == 1 and body["mismatched"] == 0
+    assert client.get("/admin/shadow", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 403
+
+def test_api_moderate_trace(client):
+    body = client.post("/api/moderate", json={"text": "You are a stupid person", "trace": True}).get_json()
+    assert body["trace"]["events"][-1]["to"] == "qF"
+    assert "trace" not in client.post("/api/moderate", json={"text": "hi"}).get_json()
+    assert client.post("/api/moderate", json={"text": "hi", "trace": "yes"}).status_code == 400
+
+def test_details_render_trace(client):
+    client.post("/", data={"user_text": "You are a stupid person", "trace": "1"})
+    page = client.get("/details").data
+    assert b"Transition trace" in page and b"qF_Hate" in page
+    client.post("/", data={"user_text": "You are a stupid person"})
+    assert b"Transition trace" not in client.get("/details").data
+
+def test_admin_traces():
+    from app import create_app
+    from src.pipeline import TextPipeline
+    from src.tracing import Tracer
+    assert app.test_client().get("/admin/traces").status_code == 404   # off by default
+
+    client = create_app(TextPipeline(tracer=Tracer(sample_rate=1.0))).test_client()
+    client.post("/api/moderate", json={"text": "You are a stupid person"})
+    body = client.get("/admin/traces").get_json()
+    assert body["traces"][0]["text"] == "You are a stupid person"
+    assert client.get("/admin/traces", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 403
+
+def test_admin_keywords():
+    from app import create_app
+    from src.keyword_stats import KeywordStats
+    from src.pipeline import TextPipeline
+    assert app.test_client().get("/admin/keywords").status_code == 404   # off by default
+
+    pipeline = TextPipeline(keyword_stats=KeywordStats())
+    client = create_app(pipeline).test_client()
+    client.post("/api/moderate", json={"text": "You are a stupid person"})
+    body = client.get("/admin/keywords?top=5").get_json()[pipeline.lexicon_version]
+    assert {"category": "badwords", "term": "stupid", "hits": 1, "inside": 0} in body["top"]
+    assert body["dead"]
+    assert client.get("/admin/keywords", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 403
+
+def test_api_author_flood():
+    from app import create_app
+    from src.flood import FloodDetector
+    from src.pipeline import TextPipeline
+    client = create_app(TextPipeline(flood_detector=FloodDetector(max_posts=1, seed=1))).test_client()
+    assert client.post("/api/moderate", json={"text": "hi", "author": "u1"}).get_json()["warnings"] == []
+    body = client.post("/api/moderate", json={"text": "hi", "author": "u1"}).get_json()
+    assert body["warnings"] == ["this author is posting too fast"]
+    assert client.post("/api/classify", json={"text": "hi", "author": "u1"}).get_json()["dfa_warnings"] == ["qFlood"]
+    results = client.post("/api/classify", json={"texts": ["hi", "hi"], "authors": ["u2", "u1"]}).get_json()["results"]
+    assert [r["dfa_warnings"] for r in results] == [[], ["qFlood"]]
+    assert client.post("/api/moderate", json={"text": "hi", "author": 7}).status_code == 400
+    assert client.post("/api/classify", json={"texts": ["hi"], "authors": ["u1", "u2"]}).status_code == 400
+
+def test_admin_remoderate(tmp_path):
+    from app import create_app
+    from src.lexicon import Lexicon
+    from src.pipeline import TextPipeline
+    from src.post_index import PostIndex
+    assert app.test_client().post("/admin/remoderate").status_code == 404   # off by default
+
+    pipeline = TextPipeline(post_index=PostIndex(tmp_path / "posts.db"))
+    client = create_app(pipeline).test_client()
+    client.post("/api/moderate", json={"text": "you are a zorblax", "id": "p1"})
+    client.post("/api/classify", json={"texts": ["hi", "zorblax!"], "ids": ["p2", "p3"]})
+    assert client.post("/api/classify", json={"text": "hi", "id": 3}).status_code == 400
+    data = dict(pipeline.stages.lexicon.data, badwords=pipeline.stages.lexicon.data["badwords"] + ["zorblax"])
+    pipeline.reload_lexicon(Lexicon(data))
+    body = client.post("/admin/remoderate").get_json()
+    assert body["affected"] == 2
+    assert sorted(change["post_id"] for change in body["changes"]) == ["p1", "p3"]
+    assert client.post("/admin/remoderate", environ_base={"REMOTE_ADDR": "10.0.0.5"}).status_code == 403
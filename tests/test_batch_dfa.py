@@ -0,0 +1,77 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.corpus import CorpusGenerator
+from src.batch_dfa import PAD, TOKEN_IDS, TOKEN_KINDS, BatchDFA, transition_table
+from src.directionality_dfa import DirectionalityDFA
+from src.pipeline import TextPipeline
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return TextPipeline()
+
+@pytest.fixture(scope="module")
+def batch_dfa(pipeline):
+    return pipeline.stages.batch_dfa()
+
+# -------------------------
+# Tables
+# -------------------------
+def test_tables_follow_scalar_transitions(pipeline, batch_dfa):
+    spam_dfa = pipeline.stages.spam_dfa.fork()
+    for i, state in enumerate(batch_dfa.spam_states):
+        for tok in TOKEN_KINDS:
+            spam_dfa.state = state
+            spam_dfa.transition(tok)
+            assert batch_dfa.spam_states[batch_dfa.spam_table[i, TOKEN_IDS[tok]]] == spam_dfa.state
+        assert batch_dfa.spam_table[i, PAD] == i
+
+def test_directionality_table():
+    states, table = transition_table(DirectionalityDFA())
+    assert states[0] == "q0"
+    assert states[table[0, TOKEN_IDS["WORD"]]] == "q3"
+    assert states[table[0, TOKEN_IDS["PRONOUN_SELF"]]] == "q1"
+    q2 = states.index("q2")
+    assert table[q2, TOKEN_IDS["WORD"]] == q2
+
+def test_encode_pads_rows():
+    matrix, lengths = BatchDFA.encode([["URL", "WORD"], [], ["BADWORD"]])
+    assert lengths.tolist() == [2, 0, 1]
+    assert matrix.tolist() == [
+        [TOKEN_IDS["URL"], TOKEN_IDS["WORD"]],
+        [PAD, PAD],
+        [TOKEN_IDS["BADWORD"], PAD],
+    ]
+
+def test_unknown_token(batch_dfa):
+    with pytest.raises(KeyError):
+        batch_dfa.run([["NOT_A_TOKEN"]])
+
+# -------------------------
+# Equivalence with the scalar path
+# -------------------------
+def test_matches_scalar_on_corpus(pipeline):
+    texts = [text for _, _, text in CorpusGenerator(seed=11).corpus(400)]
+    texts += ["", "you", "idiot", "I hate myself", "free money now"]
+    assert pipeline.classify_batch(texts, vectorized=True) == pipeline.classify_batch(texts)
+
+def test_matches_scalar_on_random_tokens(pipeline, batch_dfa):
+    rng = np.random.default_rng(0)
+    batch = [
+        [TOKEN_KINDS[i] for i in rng.integers(0, len(TOKEN_KINDS), size=rng.integers(0, 30))]
+        for _ in range(2000)
+    ]
+    spam, content = batch_dfa.run(batch)
+    stages = pipeline.stages
+    for tokens, s, c in zip(batch, spam.tolist(), content.tolist()):
+        assert s == stages.spam_dfa.process_tokens(tokens)
+        assert c == stages.content_dfa.process_tokens(tokens)
+
+def test_empty_batch(batch_dfa):
+    spam, content = batch_dfa.run([])
+    assert len(spam) == len(content) == 0
+    assert batch_dfa.classify([]) == []
+
+def test_cached_per_stages(pipeline, batch_dfa):
+    assert pipeline.stages.batch_dfa() is batch_dfa
@@ -0,0 +1,198 @@
+import os
+import threading
+import pytest
+from benchmarks.corpus import KINDS, CorpusGenerator
+from benchmarks.loadtest import build_request, load_texts, run_load
+from benchmarks.pipeline_bench import compare, percentile, summarize
+from src.pipeline import TextPipeline
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return TextPipeline()
+
+# -------------------------
+# Corpus generator
+# -------------------------
+def test_corpus_is_deterministic():
+    a = CorpusGenerator(seed=7).corpus(60)
+    b = CorpusGenerator(seed=7).corpus(60)
+    assert a == b
+
+def test_corpus_cycles_kinds_and_lengths():
+    corpus = CorpusGenerator(seed=1).corpus(len(KINDS) * 3)
+    assert {kind for kind, _, _ in corpus} == set(KINDS)
+    assert {length for _, length, _ in corpus} == {"short", "medium", "long"}
+
+def test_long_posts_are_longer():
+    gen = CorpusGenerator(seed=2)
+    short = [len(gen.post("clean", "short").split()) for _ in range(20)]
+    long = [len(gen.post("clean", "long").split()) for _ in range(20)]
+    assert max(short) < min(long)
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        CorpusGenerator().post("unknown")
+
+def test_clean_posts_are_safe(pipeline):
+    gen = CorpusGenerator(seed=3)
+    for _ in range(20):
+        detailed = pipeline.run(gen.post("clean"))["detailed"]
+        assert detailed["dfa_warnings"] == []
+
+def test_spam_posts_are_spam(pipeline):
+    gen = CorpusGenerator(seed=4)
+    for _ in range(20):
+        assert pipeline.run(gen.post("spam"))["detailed"]["spam_state"] == "qSpam"
+
+# -------------------------
+# Statistics and comparison
+# -------------------------
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 50) == 0.0
+
+def test_summarize():
+    s = summarize([0.001] * 10)
+    assert s["posts"] == 10
+    assert s["throughput"] == pytest.approx(1000)
+    assert s["p95_ms"] == pytest.approx(1.0)
+
+def test_compare_flags_regressions():
+    base = {"stages": {"tokenize": {"throughput": 1000, "p50_ms": 1.0, "p95_ms": 2.0}}}
+    cur = {"stages": {"tokenize": {"throughput": 800, "p50_ms": 1.05, "p95_ms": 3.0}}}
+    flagged = {(r["stage"], r["metric"]) for r in compare(base, cur, threshold=0.10)}
+    assert flagged == {("tokenize", "throughput"), ("tokenize", "p95_ms")}
+
+def test_compare_no_regressions():
+    base = {"stages": {"tokenize": {"throughput": 1000, "p50_ms": 1.0, "p95_ms": 2.0}}}
+    assert compare(base, base) == []
+
+# -------------------------
+# Load test harness
+# -------------------------
+def test_load_texts_from_jsonl(tmp_path):
+    path = tmp_path / "posts.jsonl"
+    path.write_text('{"text": "hello world"}\n"plain string"\n\n', encoding="utf-8")
+    assert load_texts(str(path)) == ["hello world", "plain string"]
+
+def test_load_texts_synthetic():
+    assert len(load_texts(size=30)) == 30
+
+def test_build_request_routes():
+    assert build_request("http://x", "form", "hi").full_url == "http://x/"
+    assert build_request("http://x", "api", "hi").full_url == "http://x/api/moderate"
+    with pytest.raises(ValueError):
+        build_request("http://x", "other", "hi")
+
+def test_run_load_against_local_server():
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        report = run_load(base_url, ["hello world", "you are stupid"], ("form", "api"),
+                          concurrency=2, duration=30, total=8)
+    finally:
+        server.shutdown()
+    assert report["requests"] == 8
+    assert report["error_rate"] == 0.0
+    assert report["routes"]["api"]["count"] == 4
+
+# -------------------------
+# Batch DFA benchmark
+# -------------------------
+def test_batch_benchmark_small():
+    pytest.importorskip("numpy")
+    from benchmarks import batch_bench
+    report = batch_bench.run_benchmark(sizes=(1, 50), pool_size=30, repeat=1)
+    assert [r["batch"] for r in report["sizes"]] == [1, 50]
+    assert all(r["speedup"] > 0 for r in report["sizes"])
+    assert "speedup" in batch_bench.format_report(report)
+
+# -------------------------
+# Word cache benchmark
+# -------------------------
+def test_zipf_texts_are_skewed():
+    from collections import Counter
+    from benchmarks.cache_bench import zipf_texts
+    words = Counter(w.lower() for t in zipf_texts(200, words_per_post=20, vocab_size=2000) for w in t.split())
+    top = sum(n for _, n in words.most_common(20))
+    assert top > 0.3 * sum(words.values())
+
+def test_cache_benchmark_small():
+    from benchmarks import cache_bench
+    report = cache_bench.run_benchmark(capacities=(0, 100), posts=50, words_per_post=10, vocab_size=500)
+    none, small = report["capacities"]
+    assert none["hit_rate"] == 0.0 and small["hit_rate"] > 0
+    assert small["size"] <= 100
+    assert "hit rate" in cache_bench.format_report(report)
+
+def test_worst_case_inputs_are_linear():
+    from benchmarks import worst_case_bench
+    cases = ["letter_run", "two_letter_runs", "unterminated_markers", "dollar_runs", "mentions_hashtags"]
+    # A quadratic stage would grow ~8x between these sizes
+    report = worst_case_bench.run_benchmark(sizes=(1000, 8000), tolerance=3.0, repeat=3, cases=cases)
+    assert len(report["results"]) == len(cases) * 3
+    assert report["linear"], worst_case_bench.format_report(report)
+
+def test_worst_case_generators_hit_the_size():
+    from benchmarks import worst_case_bench
+    from src.lexicon import Lexicon
+    for name, make in worst_case_bench.worst_cases(Lexicon.from_file()).items():
+        assert 0.5 * 2000 <= len(make(2000)) <= 2000, name
+
+@pytest.mark.skipif(not (hasattr(os, "fork") and os.path.exists("/proc/self/smaps_rollup")),
+                    reason="needs os.fork and /proc smaps_rollup")
+def test_prefork_benchmark_small():
+    from benchmarks import prefork_bench
+    report = prefork_bench.run_benchmark(workers=(3,), requests=20)
+    modes = {r["mode"]: r for r in report["results"]}
+    assert set(modes) == set(prefork_bench.MODES)
+    assert modes["per_worker"]["saving"] == 0
+    assert modes["frozen"]["worker_uss_kb"] < modes["per_worker"]["worker_uss_kb"]
+    assert "total PSS MB" in prefork_bench.format_report(report)
+
+def test_language_benchmark_small():
+    from benchmarks import language_bench
+    report = language_bench.run_benchmark(languages=(1, 3), count=30, repeat=1)
+    one, three = report["results"]
+    assert three["terms"] > one["terms"]
+    assert three["routed_ok"] >= 0.9
+    assert "speedup" in language_bench.format_report(report)
+
+def test_prefilter_benchmark_small():
+    from benchmarks import prefilter_bench
+    report = prefilter_bench.run_benchmark(clean_shares=(0.2, 0.9), count=30, repeat=1)
+    low, high = report["results"]
+    assert high["cleared"] > low["cleared"]
+    assert "speedup" in prefilter_bench.format_report(report)
+
+@pytest.mark.skipif(not (hasattr(os, "fork") and os.path.exists("/proc/self/smaps_rollup")),
+                    reason="needs os.fork and /proc smaps_rollup")
+def test_term_index_benchmark_small():
+    from benchmarks import term_index_bench
+    report = term_index_bench.run_benchmark(sizes=(2000,), workers=1, words=200)
+    sets, mmap = report["results"]
+    assert (sets["mode"], mmap["mode"]) == ("sets", "mmap")
+    assert mmap["load_ms"] < sets["load_ms"]
+    assert "lookup µs" in term_index_bench.format_report(report)
+
+def test_remoderation_benchmark_small():
+    from benchmarks import remoderation_bench
+    report = remoderation_bench.run_benchmark(sizes=(150,), marked=5)
+    row = report["results"][0]
+    assert 5 <= row["affected"] < 150 and 0 < row["changed"] <= 5
+    assert "targeted s" in remoderation_bench.format_report(report)
+
+@pytest.mark.skipif(not (hasattr(os, "fork") and os.path.isdir("/dev/shm")), reason="needs os.fork and /dev/shm")
+def test_shared_batch_benchmark_small():
+    from benchmarks import shared_batch_bench
+    report = shared_batch_bench.run_benchmark(post_kb=(4,), batch_mb=0.05, workers=2, repeat=1)
+    row = report["results"][0]
+    assert row["posts"] == 12 and min(row["pickle_ipc_ms"], row["shared_ipc_ms"]) > 0
+    assert "shared ipc ms" in shared_batch_bench.format_report(report)
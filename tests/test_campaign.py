@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from src.campaign import CampaignDetector
+from src.pipeline import TextPipeline
+
+BASE = "Earn 500 dollars a day working from home, click the link in my bio and join the team today"
+
+
+def variant(i):
+    # Same campaign with a changed tail, as spammers rotate links and names
+    return f"{BASE} {['friends', 'guys', 'everyone', 'people', 'folks'][i % 5]} code{i}"
+
+
+def random_post(rng):
+    words = ["cat", "math", "proof", "lemma", "river", "green", "music", "walk", "paper", "light",
+             "window", "garden", "coffee", "train", "number", "matrix", "story", "cloud", "stone", "bird"]
+    return " ".join(rng.choice(words) for _ in range(20))
+
+
+@pytest.fixture
+def detector():
+    return CampaignDetector(window=1000, min_duplicates=3)
+
+
+def test_signature_is_deterministic():
+    a, b = CampaignDetector(seed=7), CampaignDetector(seed=7)
+    assert a.signature(BASE) == b.signature(BASE)
+    assert len(a.signature(BASE)) == a.num_perm
+    assert a.signature("  ...  ") is None
+
+
+def test_estimate_tracks_similarity(detector):
+    sig = detector.signature(BASE)
+    assert detector.estimate(sig, detector.signature(variant(1))) > 0.6
+    assert detector.estimate(sig, detector.signature("A proof of the lemma about matrices")) < 0.2
+
+
+def test_near_duplicates_flag_a_campaign(detector):
+    states = [detector.check(variant(i)) for i in range(5)]
+    assert states[:3] == ["qSafe"] * 3
+    assert states[3:] == ["qCampaign", "qCampaign"]
+    assert detector.stats()["flagged"] == 2
+
+
+def test_distinct_posts_are_not_flagged(detector):
+    rng = random.Random(0)
+    assert all(detector.check(random_post(rng)) == "qSafe" for _ in range(200))
+
+
+def test_short_posts_are_ignored(detector):
+    for text in ["thanks", "lol", "Happy birthday!", "see you soon"]:
+        assert [detector.check(text) for _ in range(4)] == ["qSafe"] * 4
+        assert detector.signature(text) is None
+    assert len(detector) == 0 and detector.stats()["flagged"] == 0
+    short = CampaignDetector(min_duplicates=1, min_words=1)
+    assert [short.check("thanks") for _ in range(2)] == ["qSafe", "qCampaign"]
+
+
+def test_query_does_not_record(detector):
+    detector.observe(BASE)
+    assert detector.query(variant(1)) == 1
+    assert detector.query(variant(1)) == 1
+    assert len(detector) == 1
+
+
+def test_window_caps_memory():
+    detector = CampaignDetector(window=50, max_bucket=8)
+    rng = random.Random(1)
+    for i in range(500):
+        detector.observe(random_post(rng) if i % 2 else variant(i))
+        assert len(detector) <= 50
+    assert all(len(bucket) <= 8 for bucket in detector.buckets.values())
+    # Every bucket entry still points at a post in the window
+    assert all(i in detector.entries for bucket in detector.buckets.values() for i in bucket)
+    assert len(detector.buckets) <= 50 * detector.bands
+
+
+def test_old_posts_leave_the_window():
+    detector = CampaignDetector(window=3, min_duplicates=1)
+    detector.observe(BASE)
+    rng = random.Random(2)
+    for _ in range(3):
+        detector.observe(random_post(rng))
+    assert detector.check(variant(1)) == "qSafe"
+
+
+def test_max_age_expires_posts():
+    now = [0.0]
+    detector = CampaignDetector(max_age=60, min_duplicates=2, clock=lambda: now[0])
+    detector.observe(variant(0))
+    detector.observe(variant(1))
+    now[0] = 61
+    assert detector.check(variant(2)) == "qSafe"
+    assert len(detector) == 1
+
+
+def test_bands_must_divide_permutations():
+    with pytest.raises(ValueError):
+        CampaignDetector(num_perm=64, bands=10)
+
+
+def test_pipeline_emits_campaign_state():
+    pipeline = TextPipeline(campaign_detector=CampaignDetector(min_duplicates=2))
+    for i in range(2):
+        assert "qCampaign" not in pipeline.run(variant(i))["detailed"]["dfa_warnings"]
+    result = pipeline.run(variant(2))
+    assert result["detailed"]["campaign_state"] == "qCampaign"
+    assert "this post may be part of a spam campaign" in result["final"]["warnings"]
+    assert "qCampaign" in pipeline.classify(variant(3))["dfa_warnings"]
+    assert all("qCampaign" in v["dfa_warnings"] for v in pipeline.classify_batch([variant(4), variant(5)]))
+
+
+def test_pipeline_records_posts_eagerly():
+    detector = CampaignDetector()
+    pipeline = TextPipeline(campaign_detector=detector)
+    pipeline.run(BASE)
+    assert len(detector) == 1
+
+
+def test_pipeline_without_detector():
+    pipeline = TextPipeline()
+    result = pipeline.run(BASE)["detailed"]
+    assert result["campaign_state"] is None
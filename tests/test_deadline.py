@@ -0,0 +1,109 @@
+import pytest
+
+from src.deadline import DEADLINE_STRIDE, Deadline, DeadlineExceeded
+from src.pipeline import TextPipeline
+from src.post_processor import transform_post
+
+
+class FakeClock:
+    """Clock that jumps past every deadline after `ticks` readings."""
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+
+    def __call__(self):
+        self.ticks -= 1
+        return 0.0 if self.ticks >= 0 else 1e9
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return TextPipeline()
+
+
+def test_deadline_budget():
+    deadline = Deadline(10)
+    assert not deadline.expired()
+    assert 0 < deadline.remaining() <= 10
+    deadline.check()
+
+    expired = Deadline(0)
+    assert expired.expired()
+    assert expired.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        expired.check()
+
+
+def test_degrade_notifies_once():
+    calls = []
+    deadline = Deadline(0, on_degrade=lambda: calls.append(1))
+    deadline.degrade("tokenize")
+    deadline.degrade("render")
+    assert deadline.degraded == ["tokenize", "render"]
+    assert calls == [1]
+
+
+def test_coerce():
+    assert Deadline.coerce(None) is None
+    assert isinstance(Deadline.coerce(0.5), Deadline)
+    own = Deadline(1)
+    assert Deadline.coerce(own, on_degrade=print) is own
+    assert own.on_degrade is print
+
+
+def test_tokenize_stops_at_deadline(pipeline):
+    text = " ".join(["hello"] * (3 * DEADLINE_STRIDE))
+    # Constructor reading + two checks in time, the third one expires
+    deadline = Deadline(1, clock=FakeClock(3))
+    tokens = pipeline.tokenizer.tokenize(text, deadline)
+    assert tokens == ["WORD"] * (2 * DEADLINE_STRIDE)
+    assert deadline.degraded == ["tokenize"]
+
+
+def test_tokenize_within_deadline_is_complete(pipeline):
+    text = "Hi @anna, you idiot #tag"
+    deadline = Deadline(60)
+    assert pipeline.tokenizer.tokenize(text, deadline) == pipeline.tokenizer.tokenize(text)
+    assert deadline.degraded == []
+
+
+def test_transform_post_raises_when_expired():
+    with pytest.raises(DeadlineExceeded):
+        transform_post("**bold** and $x^2$", Deadline(0))
+
+
+def test_run_within_deadline_is_not_degraded(pipeline):
+    text = "You are a stupid person $x^2$"
+    result = pipeline.run(text, deadline=60)
+    assert result["final"]["degraded"] is False
+    assert result["detailed"]["degraded"] == []
+    assert result["final"]["text"] == pipeline.run(text)["final"]["text"]
+
+
+def test_run_degrades_rendering(pipeline):
+    before = pipeline.degraded_count
+    # Enough time to tokenize and classify, none left to render
+    deadline = Deadline(1, clock=FakeClock(2))
+    result = pipeline.run("You are a stupid <b>person</b>", deadline=deadline)
+    assert result["final"]["warnings"] == ["this post may contain hate speech"]
+    assert result["final"]["degraded"] is True
+    assert result["detailed"]["degraded"] == ["render"]
+    assert result["final"]["text"] == "You are a ****** &lt;b&gt;person&lt;/b&gt;"
+    assert pipeline.degraded_count == before + 1
+
+
+def test_run_with_spent_budget(pipeline):
+    before = pipeline.degraded_count
+    result = pipeline.run("You are a stupid person", deadline=0)
+    assert result["detailed"]["tokens"] == []
+    assert result["detailed"]["degraded"] == ["tokenize", "render"]
+    assert pipeline.degraded_count == before + 1
+
+
+def test_spent_budget_still_censors(pipeline):
+    # No tokens, so no warnings: the censorship pass must not be skipped
+    result = pipeline.run("You are a stupid person, you asshole", deadline=0)
+    assert result["detailed"]["dfa_warnings"] == []
+    assert result["detailed"]["censored_text"] == "You are a ****** person, you *******"
+    assert result["final"]["text"] == "You are a ****** person, you *******"
+    assert result["final"]["degraded"] is True
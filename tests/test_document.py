@@ -0,0 +1,116 @@
+import io
+import tracemalloc
+import pytest
+from benchmarks.corpus import CorpusGenerator
+from src.document import iter_segments
+from src.pipeline import TextPipeline
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return TextPipeline()
+
+class OneWayStream(io.StringIO):
+    def seekable(self):
+        return False
+
+class NullWriter:
+    def write(self, text):
+        return len(text)
+
+def document(size, seed=0):
+    return "\n".join(text for _, _, text in CorpusGenerator(seed=seed).corpus(size))
+
+# -------------------------
+# Segments
+# -------------------------
+def test_segments_end_at_line_breaks():
+    text = "alpha beta\ngamma delta\n" * 50
+    segments = list(iter_segments(io.StringIO(text), chunk_size=7))
+    assert "".join(segments) == text
+    assert all(segment.endswith("\n") for segment in segments)
+
+def test_long_lines_cut_at_whitespace():
+    text = "alpha beta gamma delta epsilon " * 50
+    segments = list(iter_segments(io.StringIO(text), chunk_size=7))
+    assert "".join(segments) == text
+    assert all(segment[-1].isspace() for segment in segments)
+    assert max(len(segment) for segment in segments) <= 5 * 7
+
+def test_run_without_whitespace_is_cut():
+    text = "x" * 100 + " end"
+    segments = list(iter_segments(io.StringIO(text), chunk_size=8, overlap=3))
+    assert "".join(segments) == text
+    assert segments[0] == "x" * 29                  # 4 chunks, less the overlap
+    assert max(len(segment) for segment in segments) <= 5 * 8
+
+def test_segments_bounded_without_whitespace():
+    text = "x" * (2 * 1024 * 1024) + "\nend"
+    segments = list(iter_segments(io.StringIO(text), chunk_size=4096, overlap=27))
+    assert "".join(segments) == text
+    assert max(len(segment) for segment in segments) <= 5 * 4096
+    assert len(segments) > 100
+
+# -------------------------
+# Equivalence with run()
+# -------------------------
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_run(pipeline, seed):
+    text = document(40, seed)
+    out = io.StringIO()
+    result = pipeline.run_document(io.StringIO(text), out, chunk_size=37, render=False)
+
+    detailed = pipeline.run(text)["detailed"]
+    assert result["spam_state"] == detailed["spam_state"]
+    assert result["content_state"] == detailed["content_state"]
+    assert result["warnings"] == detailed["readable_warnings"]
+    assert out.getvalue().strip() == detailed["censored_text"].strip()
+
+def test_phrase_across_chunks(pipeline):
+    text = "hello there, claim your free money now"
+    out = io.StringIO()
+    result = pipeline.run_document(io.StringIO(text), out, chunk_size=5, render=False)
+    assert result["dfa_warnings"] == ["qSpam"]
+
+def test_censors_every_segment(pipeline):
+    text = "you idiot\n" + "nice day\n" * 100 + "so stupid"
+    out = io.StringIO()
+    pipeline.run_document(io.StringIO(text), out, chunk_size=16, render=False)
+    assert out.getvalue() == "you *****\n" + "nice day\n" * 100 + "so ******"
+
+# -------------------------
+# Sources and output
+# -------------------------
+def test_one_way_stream(pipeline):
+    text = document(20)
+    out = io.StringIO()
+    result = pipeline.run_document(OneWayStream(text), out, chunk_size=64, render=False)
+    assert result["chars"] == len(text)
+    assert out.getvalue().strip() == pipeline.run(text)["detailed"]["censored_text"].strip()
+
+def test_path_and_rendering(pipeline, tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("Hi @anna :)\nread https://example.com\nthe formula $x + 1$", encoding="utf-8")
+    out = io.StringIO()
+    result = pipeline.run_document(path, out, chunk_size=8)
+    lines = out.getvalue().split("\n")
+    assert "<span class='mention'>@anna</span>" in lines[0]
+    assert "<a href='https://example.com'" in lines[1]
+    assert "$x + 1$" in lines[2]
+    assert "Link detected" in result["enhancements"]
+    assert result["warnings"] == []
+
+def peak_memory(pipeline, path):
+    tracemalloc.start()
+    pipeline.run_document(path, NullWriter(), chunk_size=1024)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def test_memory_bounded_by_chunk(pipeline, tmp_path):
+    text = document(15) + "\n"
+    small, large = tmp_path / "small.txt", tmp_path / "large.txt"
+    small.write_text(text, encoding="utf-8")
+    large.write_text(text * 4, encoding="utf-8")
+
+    peak_memory(pipeline, small)  # warm up the grammar and regex caches
+    assert peak_memory(pipeline, large) < 1.5 * peak_memory(pipeline, small)
@@ -0,0 +1,131 @@
+import math
+
+import pytest
+
+from src.flood import FloodDetector, SlidingCountMin
+from src.pipeline import TextPipeline
+
+SPAM = "visit http://a.example http://b.example http://c.example http://d.example now"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def detector(clock):
+    return FloodDetector(max_posts=5, max_spam=2, window=60, slots=6, seed=1, clock=clock)
+
+
+# -------------------------
+# Sketch
+# -------------------------
+def test_sliding_count_min_expires_whole_slots():
+    sketch = SlidingCountMin(width=8, depth=2, slots=3)
+    sketch.add([1, 9])
+    sketch.expire(1)
+    sketch.add([1, 9])
+    assert sketch.estimate([1, 9]) == 2 and sketch.total == 2
+    sketch.expire(2)                      # the first slot falls out
+    assert sketch.estimate([1, 9]) == 1 and sketch.total == 1
+    sketch.expire(10)
+    assert sketch.estimate([1, 9]) == 0 and sketch.total == 0
+    assert sketch.nbytes == 4 * 16 * 4
+
+
+def test_cells_are_one_per_row(detector):
+    cells = detector.cells("alice")
+    assert len(cells) == detector.depth
+    assert [c // detector.width for c in cells] == list(range(detector.depth))
+    assert cells == detector.cells("alice")
+    assert FloodDetector(seed=1).cells("alice") == FloodDetector(seed=1).cells("alice")
+
+
+# -------------------------
+# Authors
+# -------------------------
+def test_posting_rate_flags_a_flood(detector):
+    states = [detector.check("alice") for _ in range(7)]
+    assert states == ["qSafe"] * 5 + ["qFlood"] * 2
+    assert detector.check("bob") == "qSafe"
+    assert detector.stats()["flagged"] == 2
+
+
+def test_spam_signals_flag_sooner(detector):
+    assert [detector.check("mallory", spam=True) for _ in range(3)] == ["qSafe", "qSafe", "qFlood"]
+    assert detector.query("mallory") == (3, 3)
+
+
+def test_window_slides(detector, clock):
+    for _ in range(5):
+        detector.check("alice")
+    clock.now = 30
+    assert detector.check("alice") == "qFlood"
+    clock.now = 65                          # the slot of the first five posts is gone
+    assert detector.query("alice") == (1, 0)
+    assert detector.check("alice") == "qSafe"
+
+
+def test_memory_is_fixed_and_estimates_are_bounded(clock):
+    detector = FloodDetector(max_posts=30, window=60, width=1024, depth=4, seed=3, clock=clock)
+    size = detector.nbytes
+    for i in range(20_000):
+        detector.observe(f"user{i}")
+    for _ in range(40):
+        detector.observe("heavy")
+    assert detector.nbytes == size
+    # Never below the true count, and within e / width * N in all but about exp(-depth) of authors
+    assert detector.query("heavy")[0] >= 40
+    bound = math.e / detector.width * detector.stats()["posts"]
+    over = [detector.query(f"user{i}")[0] - 1 for i in range(2000)]
+    assert min(over) >= 0
+    assert sum(o > bound for o in over) / len(over) < 2 * math.exp(-detector.depth)
+    stats = detector.stats()
+    assert stats["posts"] == 20_040 and stats["error_bound"] == pytest.approx(bound)
+
+
+# -------------------------
+# Pipeline
+# -------------------------
+def test_pipeline_emits_flood_state(clock):
+    pipeline = TextPipeline(flood_detector=FloodDetector(max_posts=2, seed=1, clock=clock))
+    for _ in range(2):
+        assert pipeline.run("hello there", author="alice")["detailed"]["flood_state"] == "qSafe"
+    result = pipeline.run("hello there", author="alice")
+    assert result["detailed"]["dfa_warnings"] == ["qFlood"]
+    assert "this author is posting too fast" in result["final"]["warnings"]
+    assert pipeline.run("hello there")["detailed"]["flood_state"] is None        # no author
+    assert "qFlood" in pipeline.classify("hello there", author="alice")["dfa_warnings"]
+    verdicts = pipeline.classify_batch(["hello there", "hello there"], authors=["alice", None])
+    assert [v["dfa_warnings"] for v in verdicts] == [["qFlood"], []]
+
+
+def test_run_records_authors_whatever_is_read(clock):
+    pipeline = TextPipeline(flood_detector=FloodDetector(seed=1, clock=clock))
+    assert pipeline.stages.prefilter.clear("hello there friend")
+    for _ in range(20):
+        pipeline.run("hello there friend", author="a")["final"]["text"]
+    pipeline.run(SPAM, author="a")                                   # nothing read at all
+    assert pipeline.flood_detector.stats()["posts"] == 21
+    assert pipeline.flood_detector.query("a") == (21, 1)
+
+
+def test_pipeline_counts_spam_signals(clock):
+    pipeline = TextPipeline(flood_detector=FloodDetector(max_spam=1, seed=1, clock=clock))
+    assert pipeline.classify(SPAM, author="mallory")["dfa_warnings"] == ["qSpam"]
+    assert pipeline.classify(SPAM, author="mallory")["dfa_warnings"] == ["qSpam", "qFlood"]
+    assert pipeline.flood_detector.query("mallory") == (2, 2)
+
+
+def test_classify_batch_checks_authors():
+    with pytest.raises(ValueError):
+        TextPipeline().classify_batch(["a", "b"], authors=["alice"])
@@ -0,0 +1,189 @@
+import copy
+import json
+import os
+
+import pytest
+
+from src import keyword_stats
+from src.deadline import Deadline
+from src.keyword_stats import KeywordStats, merge
+from src.lexicon import Lexicon
+from src.pipeline import TextPipeline
+from src.prefork import warm_up
+from src.verdict_store import VerdictStore, content_hash
+
+POSTS = [
+    "You are a stupid person",
+    "free money now, click here",
+    "you stuuupid idi0t",
+    "I will kill you",
+    "skill and killer",
+    "Hello world",
+]
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stats():
+    return KeywordStats()
+
+
+@pytest.fixture
+def pipeline(stats):
+    return TextPipeline(keyword_stats=stats)
+
+
+def counts(stats, category):
+    (version,) = stats.snapshot()
+    return stats.snapshot()[version]["keywords"].get(category, {})
+
+# -------------------------
+# Counting
+# -------------------------
+def test_tokens_are_unchanged(pipeline):
+    plain = TextPipeline().tokenizer
+    for text in POSTS:
+        assert pipeline.tokenizer.tokenize(text) == plain.tokenize(text)
+
+def test_word_hits(pipeline, stats):
+    for text in POSTS:
+        pipeline.tokenizer.tokenize(text)
+    assert counts(stats, "badwords") == {"stupid": [2, 0], "idiot": [1, 0]}   # stuuupid, idi0t too
+    assert counts(stats, "pronouns_other")["you"] == [3, 0]
+    (snapshot,) = stats.snapshot().values()
+    assert snapshot["categories"]["badwords"] == 3
+
+def test_substring_hits_inside_words(pipeline, stats):
+    pipeline.tokenizer.tokenize("I will kill you")
+    pipeline.tokenizer.tokenize("skill and killer")
+    assert counts(stats, "violence")["kill"] == [3, 2]
+
+def test_phrase_hits(pipeline, stats):
+    pipeline.tokenizer.tokenize("free money now, FREE MONEY! click here")
+    pipeline.tokenizer.tokenize("fr33 m0ney")                              # obfuscated phrase
+    spam = counts(stats, "spamwords")
+    assert spam["free money"] == [3, 0] and spam["click here"] == [1, 0]
+
+def test_cleared_posts_are_counted(pipeline, stats):
+    # The prefilter would clear these posts without tokenizing them
+    assert TextPipeline().stages.prefilter.clear("Hello, how are you")
+    assert pipeline.stages.prefilter is None
+    pipeline.run("Hello, how are you")["detailed"]["dfa_warnings"]
+    pipeline.classify_batch(["are you there", "you are nice"])
+    assert counts(stats, "pronouns_other")["you"] == [3, 0]
+    assert counts(stats, "aux_verbs")["are"] == [3, 0]
+
+def test_stored_verdicts_are_counted(tmp_path):
+    stats = KeywordStats()
+    store = VerdictStore(tmp_path / "verdicts.db")
+    pipeline = TextPipeline(keyword_stats=stats, verdict_store=store)
+    for _ in range(3):
+        pipeline.classify("you are stupid")
+    pipeline.classify_batch(["you are stupid", "you are stupid"])
+    pipeline.run("you are stupid")["detailed"]["dfa_warnings"]
+    assert counts(stats, "badwords") == {"stupid": [6, 0]}
+    assert store.get(content_hash("you are stupid"), pipeline.store_version()) is not None
+
+def test_counting_with_deadline(pipeline, stats):
+    deadline = Deadline(60)
+    pipeline.tokenizer.tokenize("You are a stupid person", deadline)
+    assert counts(stats, "badwords") == {"stupid": [1, 0]}
+    assert pipeline.tokenizer.tokenize("You are a stupid person", Deadline(0)) == []
+
+def test_off_by_default():
+    pipeline = TextPipeline()
+    assert pipeline.tokenizer.keyword_hits is None
+
+def test_match_memo_is_bounded(pipeline, stats, monkeypatch):
+    monkeypatch.setattr(keyword_stats, "MATCH_MEMO_SIZE", 2)
+    for word in ("stupid", "stupidity", "stupider", "stupidest"):
+        pipeline.tokenizer.tokenize(word)
+    assert len(pipeline.tokenizer.keyword_hits._matches) <= 2
+    assert counts(stats, "badwords")["stupid"] == [4, 3]
+
+def test_routed_partitions_are_counted():
+    data = copy.deepcopy(Lexicon.from_file().data)
+    data["languages"] = {"es": {"badwords": ["estupido"], "pronouns_other": ["tu"],
+                                "stopwords": ["el", "la", "de", "que", "y"]}}
+    stats = KeywordStats()
+    pipeline = TextPipeline(lexicon=Lexicon(data), route_languages=True, keyword_stats=stats)
+    pipeline.classify("tu eres estupido y el de la que")
+    (snapshot,) = stats.snapshot().values()
+    assert snapshot["keywords"]["badwords"]["estupido"] == [1, 0]
+
+def test_reload_counts_per_version(pipeline, stats):
+    pipeline.run("You are a stupid person")["final"]["warnings"]
+    data = dict(pipeline.stages.lexicon.data, badwords=["stupid", "dumb"])
+    pipeline.reload_lexicon(Lexicon(data))
+    pipeline.run("so dumb")["final"]["warnings"]
+    snapshot = stats.snapshot()
+    assert len(snapshot) == 2
+    assert snapshot[pipeline.lexicon_version]["keywords"]["badwords"] == {"dumb": [1, 0]}
+
+def test_warm_up_is_not_counted(pipeline, stats):
+    warm_up(pipeline)
+    (snapshot,) = stats.snapshot().values()
+    assert not snapshot["keywords"] and not any(snapshot["categories"].values())
+
+# -------------------------
+# Merging and reports
+# -------------------------
+def test_flush_every_interval(tmp_path):
+    clock = FakeClock()
+    stats = KeywordStats(tmp_path, flush_interval=30, clock=clock)
+    pipeline = TextPipeline(keyword_stats=stats)
+    pipeline.run("You are a stupid person")["final"]["warnings"]
+    assert not list(tmp_path.iterdir())
+    clock.now += 31
+    pipeline.run("Hello")
+    (path,) = tmp_path.iterdir()
+    assert path.name == f"keyword-hits-{os.getpid()}.json"
+
+def test_merge_workers(tmp_path):
+    snapshot = {"v1": {"categories": {"badwords": 2}, "keywords": {"badwords": {"stupid": [2, 1]}}}}
+    for pid in (101, 102):
+        (tmp_path / f"keyword-hits-{pid}.json").write_text(json.dumps(snapshot))
+    (tmp_path / "keyword-hits-103.json").write_text("{")                # half written
+    merged = merge(tmp_path)
+    assert merged["v1"]["keywords"]["badwords"]["stupid"] == [4, 2]
+    assert merged["v1"]["categories"]["badwords"] == 4
+
+def test_report(pipeline, stats):
+    for text in POSTS:
+        pipeline.run(text)["final"]["warnings"]
+    body = stats.report(pipeline.stages.lexicon, top=3)[pipeline.lexicon_version]
+    assert [e["term"] for e in body["top"]] == ["you", "kill", "stupid"]
+    assert [e["term"] for e in body["broad"]] == ["kill"]
+    dead = {(e["category"], e["term"]) for e in body["dead"]}
+    assert ("badwords", "stupid") not in dead and ("badwords", "moron") in dead
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_worker_starts_from_zero(tmp_path):
+    stats = KeywordStats(tmp_path)
+    pipeline = TextPipeline(keyword_stats=stats)
+    pipeline.run("You are a stupid person")["final"]["warnings"]
+    pid = os.fork()
+    if pid == 0:
+        pipeline.run("so stupid")["final"]["warnings"]
+        stats.flush()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    stats.flush()
+    merged = merge(tmp_path)[pipeline.lexicon_version]
+    assert merged["keywords"]["badwords"]["stupid"] == [2, 0]
+
+def test_cli(tmp_path, capsys):
+    stats = KeywordStats(tmp_path)
+    TextPipeline(keyword_stats=stats).tokenizer.tokenize("You are a stupid person")
+    stats.flush()
+    assert keyword_stats.main(["report", str(tmp_path), "--top", "1"]) == 0
+    body = json.loads(capsys.readouterr().out)
+    (version,) = body
+    assert body[version]["top"][0]["hits"] == 1 and "dead" not in body[version]
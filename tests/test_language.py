@@ -0,0 +1,120 @@
+import pytest
+from src.language import PROFILES, LanguageGuesser
+from src.lexicon import Lexicon
+from src.pipeline import TextPipeline
+
+
+@pytest.fixture
+def guesser():
+    return LanguageGuesser()
+
+def multilingual():
+    data = dict(Lexicon.from_file().data)
+    data["languages"] = {
+        "es": {"badwords": ["idiota", "estúpido"], "spamwords": ["dinero gratis"]},
+        "xx": {"badwords": ["grumpus"], "stopwords": ["zo", "ka", "mi"]},
+    }
+    return Lexicon(data)
+
+# -------------------------
+# LanguageGuesser
+# -------------------------
+@pytest.mark.parametrize("text, language", [
+    ("You are the best friend and this is so nice", "en"),
+    ("Eres el mejor amigo que he tenido en la vida", "es"),
+    ("Je pense que c'est une très bonne idée pour nous", "fr"),
+    ("Ich glaube, das ist eine gute Idee für uns", "de"),
+    ("Questo è un giorno molto bello per me e per te", "it"),
+    ("Você é o melhor amigo que eu já tive, isso é muito bom", "pt"),
+])
+def test_guess_language(guesser, text, language):
+    assert guesser.guess(text)[0] == language
+
+def test_guess_without_evidence_is_default(guesser):
+    assert guesser.guess("zzz 123 😀") == ("en",)
+    assert guesser.guess("") == ("en",)
+
+def test_guess_mixed_post_two_languages(guesser):
+    languages = guesser.guess("the best and the worst, el mejor y el peor de la vida")
+    assert set(languages) == {"en", "es"}
+
+def test_guess_at_most_max_languages():
+    guesser = LanguageGuesser(max_languages=1)
+    assert len(guesser.guess("the best and the worst, el mejor y el peor de la vida")) == 1
+
+def test_distinctive_chars(guesser):
+    assert guesser.scores("¿niño?") == {"es": 2 * guesser.char_weight}
+
+def test_only_first_words_are_sampled():
+    guesser = LanguageGuesser(sample_words=4)
+    assert guesser.guess("zz zz zz zz el la de que") == ("en",)
+
+def test_from_lexicon_uses_partition_profiles():
+    guesser = LanguageGuesser.from_lexicon(multilingual())
+    assert guesser.languages == ("en", "es", "xx")
+    assert guesser.guess("zo ka mi grumpus") == ("xx",)
+    assert guesser.guess("el amigo de la casa") == ("es",)
+    assert "fr" not in guesser.languages and set(PROFILES) > {"en", "es"}
+
+# -------------------------
+# Lexicon partitions
+# -------------------------
+def test_flat_lexicon_is_one_language():
+    lexicon = Lexicon.from_file()
+    assert lexicon.languages == ("en",)
+    assert lexicon.partition(("en", "es")) is lexicon
+
+def test_partitions_merge_and_split():
+    lexicon = multilingual()
+    assert lexicon.languages == ("en", "es", "xx")
+    assert {"stupid", "idiota", "grumpus"} <= lexicon.badwords
+
+    es = lexicon.partition(("es",))
+    assert es.languages == ("es",) and es.version == lexicon.version
+    assert es.badwords == {"idiota", "estúpido"}
+    assert es.spamwords == ("dinero gratis",)
+    assert es.bad_emojis == lexicon.bad_emojis        # shared by every partition
+    assert lexicon.partition(["es"]) is es             # built once
+
+    both = lexicon.partition(("xx", "en"))
+    assert both.languages == ("en", "xx")
+    assert "stupid" in both.badwords and "grumpus" in both.badwords and "idiota" not in both.badwords
+    assert lexicon.partition(("en", "es", "xx")) is lexicon
+    assert lexicon.partition(("fr",)) is lexicon
+
+# -------------------------
+# Routing in the pipeline
+# -------------------------
+def test_routing_scans_only_the_guessed_partition():
+    lexicon = multilingual()
+    routed = TextPipeline(lexicon=lexicon, route_languages=True)
+    merged = TextPipeline(lexicon=lexicon)
+
+    text = "zo ka mi grumpus, dinero gratis"
+    assert routed.classify(text)["content_state"] == "qF_Hate"
+    detailed = routed.run(text)["detailed"]
+    assert detailed["languages"] == ["en", "xx"]       # the default partition always goes along
+    assert detailed["spam_state"] == "qSafe"            # "dinero gratis" is not scanned
+    assert merged.run(text)["detailed"]["spam_state"] == "qSpam"
+    assert merged.run(text)["detailed"]["languages"] == ["en", "es", "xx"]
+
+    assert routed.run("dinero gratis para la familia")["detailed"]["spam_state"] == "qSpam"
+    assert routed.stages.route("the best friend") is routed.stages.route("you are the one")
+
+def test_stopword_padding_does_not_bypass_default_terms():
+    routed = TextPipeline(lexicon=multilingual(), route_languages=True)
+    text = "el la de que y en los las: you are an asshole"
+    assert routed.stages.language_guesser.guess(text) == ("es",)
+    assert routed.run(text)["detailed"]["languages"] == ["en", "es"]
+    assert routed.classify(text)["content_state"] != "qF_Safe"
+
+def test_routing_off_for_one_language():
+    pipeline = TextPipeline(route_languages=True)
+    assert pipeline.stages.language_guesser is None
+    assert pipeline.stages.route("el amigo") is pipeline.stages
+
+def test_routing_survives_reload():
+    pipeline = TextPipeline(lexicon=Lexicon.from_file(), route_languages=True)
+    pipeline.reload_lexicon(multilingual())
+    assert pipeline.stages.language_guesser is not None
+    assert pipeline.run("el idiota de la casa")["detailed"]["languages"] == ["en", "es"]
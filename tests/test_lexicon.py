@@ -0,0 +1,110 @@
+import json
+import pytest
+from src.lexicon import KEYWORDS_FILE, Lexicon, LexiconWatcher
+from src.pipeline import TextPipeline
+
+@pytest.fixture
+def keywords_copy(tmp_path):
+    path = tmp_path / "keywords.json"
+    path.write_text(KEYWORDS_FILE.read_text(encoding="utf-8"), encoding="utf-8")
+    return path
+
+def add_badword(path, word):
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["badwords"].append(word)
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+# -------------------------
+# Lexicon
+# -------------------------
+def test_version_is_content_hash(keywords_copy):
+    assert Lexicon.from_file(keywords_copy).version == Lexicon.from_file(KEYWORDS_FILE).version
+    add_badword(keywords_copy, "grumpus")
+    assert Lexicon.from_file(keywords_copy).version != Lexicon.from_file(KEYWORDS_FILE).version
+
+def test_version_from_data():
+    data = json.loads(KEYWORDS_FILE.read_text(encoding="utf-8"))
+    assert Lexicon(data).version == Lexicon(dict(data)).version
+    assert Lexicon(data).version == Lexicon.from_file(KEYWORDS_FILE).version
+
+def test_version_ignores_formatting(keywords_copy):
+    data = json.loads(keywords_copy.read_text(encoding="utf-8"))
+    keywords_copy.write_text(json.dumps(dict(reversed(list(data.items()))), indent=4), encoding="utf-8")
+    assert Lexicon.from_file(keywords_copy).version == Lexicon.from_file(KEYWORDS_FILE).version
+
+def test_version_ignores_term_order():
+    data = json.loads(KEYWORDS_FILE.read_text(encoding="utf-8"))
+    shuffled = {key: value[::-1] if isinstance(value, list) else value for key, value in data.items()}
+    lexicon, reordered = Lexicon(data), Lexicon(shuffled)
+    assert reordered.version == lexicon.version
+    assert reordered.spamwords == lexicon.spamwords and reordered.word_index == lexicon.word_index
+
+def test_data_is_copied():
+    data = json.loads(KEYWORDS_FILE.read_text(encoding="utf-8"))
+    lexicon = Lexicon(data)
+    data["badwords"].append("grumpus")
+    assert "grumpus" not in lexicon.data["badwords"]
+    assert lexicon.version == Lexicon.from_file(KEYWORDS_FILE).version
+
+def test_phrases_longest_first():
+    lexicon = Lexicon.from_file()
+    lengths = [len(p) for p in lexicon.spamwords]
+    assert lengths == sorted(lengths, reverse=True)
+    assert len(lexicon.phrase_patterns["SPAMWORD"]) == len(lexicon.spamwords)
+
+def test_missing_category(tmp_path):
+    path = tmp_path / "keywords.json"
+    path.write_text('{"badwords": []}', encoding="utf-8")
+    with pytest.raises(KeyError):
+        Lexicon.from_file(path)
+
+# -------------------------
+# Reload
+# -------------------------
+def test_reload_swaps_stages(keywords_copy):
+    pipeline = TextPipeline(keywords_file=keywords_copy)
+    old_stages = pipeline.stages
+    old_version = pipeline.lexicon_version
+    assert pipeline.run("You are a grumpus")["detailed"]["content_state"] == "qF_Safe"
+
+    add_badword(keywords_copy, "grumpus")
+    new_version = pipeline.reload_lexicon()
+
+    assert new_version != old_version
+    result = pipeline.run("You are a grumpus")
+    assert result["detailed"]["content_state"] == "qF_Hate"
+    assert result["detailed"]["lexicon_version"] == new_version
+    assert result["final"]["lexicon_version"] == new_version
+    # Stages captured before the swap still answer with the old lexicon
+    assert old_stages.version == old_version
+    assert old_stages.content_dfa.process_text("You are a grumpus") == "qF_Safe"
+
+def test_reload_same_content_keeps_stages(keywords_copy):
+    pipeline = TextPipeline(keywords_file=keywords_copy)
+    stages = pipeline.stages
+    pipeline.reload_lexicon()
+    assert pipeline.stages is stages
+
+def test_reload_async(keywords_copy):
+    pipeline = TextPipeline(keywords_file=keywords_copy)
+    add_badword(keywords_copy, "grumpus")
+    pipeline.reload_lexicon_async().join()
+    assert pipeline.lexicon_version == Lexicon.from_file(keywords_copy).version
+
+def test_watcher_check(keywords_copy):
+    calls = []
+    watcher = LexiconWatcher(keywords_copy, lambda: calls.append(1))
+    assert watcher.check() is False
+    add_badword(keywords_copy, "grumpus")
+    assert watcher.check() is True
+    assert watcher.check() is False
+    assert calls == [1]
+
+def test_watcher_keeps_old_version_on_bad_file(keywords_copy):
+    pipeline = TextPipeline(keywords_file=keywords_copy)
+    version = pipeline.lexicon_version
+    watcher = LexiconWatcher(keywords_copy, pipeline.reload_lexicon)
+    keywords_copy.write_text("{ not json", encoding="utf-8")
+    assert watcher.check() is False
+    assert watcher.last_error is not None
+    assert pipeline.lexicon_version == version
@@ -0,0 +1,121 @@
+import re
+
+import pytest
+from benchmarks.corpus import CorpusGenerator
+from src.censorship_fst import CensorshipFST
+from src.lexicon import Lexicon
+from src.normalization import Normalizer, elongated_pattern, runs
+from src.preprocessing import RegexTokenizer
+
+@pytest.fixture(scope="module")
+def normalizer():
+    return Normalizer()
+
+@pytest.fixture(scope="module")
+def lexicon():
+    return Lexicon.from_file()
+
+@pytest.fixture(scope="module")
+def tokenizer(lexicon, normalizer):
+    return RegexTokenizer(lexicon=lexicon, normalizer=normalizer)
+
+@pytest.fixture(scope="module")
+def fst(lexicon, normalizer):
+    return CensorshipFST(lexicon=lexicon, normalizer=normalizer)
+
+# -------------------------
+# 1. Folding
+# -------------------------
+@pytest.mark.parametrize("text,expected", [
+    ("b4dw0rd", "badword"),
+    ("stúpido", "stupido"),
+    ("ÑANDÚ", "NANDU"),
+    ("sh!t", "shit"),
+    ("$h!t", "shit"),
+    ("stupid!!", "stupid!!"),   # closing punctuation is kept
+    ("1234 !@#$", "1234 !@#$"), # no letters, no leetspeak
+    ("@user #vote2025", "auser #vote2o2s"),
+])
+def test_fold(normalizer, text, expected):
+    assert normalizer.fold(text) == expected
+
+def test_fold_preserves_length(normalizer):
+    gen = CorpusGenerator(seed=5)
+    for kind in ("markup", "formula", "spam"):
+        text = gen.post(kind) + " ¿Qué tál? 4x4 çà"
+        assert len(normalizer.fold(text)) == len(text)
+
+def test_runs():
+    assert runs("kiiill") == ("kil", [1, 3, 2])
+    assert runs("") == ("", [])
+
+def test_elongated_pattern():
+    assert elongated_pattern("kill") == "(?<!k)k+i+l{2,}"
+
+def test_elongated_pattern_starts_at_runs():
+    pattern = re.compile(elongated_pattern("ass"))
+    # Same matches as without the lookbehind, found from the start of the run
+    assert pattern.search("baaasss").span() == (1, 7)
+    assert pattern.fullmatch("aass")
+    assert not pattern.search("a" * 5000)
+
+def test_has_elongation(normalizer):
+    assert normalizer.has_elongation("stuuupid")
+    assert not normalizer.has_elongation("hello")
+    assert not normalizer.has_elongation("1000")
+
+def test_normalize_offsets(normalizer):
+    text = "so baaaadd, kiiiill!"
+    normalized, offsets = normalizer.normalize(text)
+    assert normalized == "so badd, kill!"
+    assert len(offsets) == len(normalized) + 1
+    start = normalized.index("kill")
+    assert text[offsets[start]:offsets[start + 4]] == "kiiiill"
+
+# -------------------------
+# 2. Tokenizer
+# -------------------------
+@pytest.mark.parametrize("text,expected", [
+    ("stup1d", ["BADWORD"]),
+    ("stuuuupid!!", ["BADWORD"]),
+    ("1d10t", ["BADWORD"]),
+    ("k!ll", ["VIOLENCE"]),
+    ("p0rn", ["SEXWORD"]),
+    ("youuuu h1m", ["PRONOUN_OTHER", "PRONOUN_OTHER"]),
+    ("fr33 m0ney", ["SPAMWORD"]),
+    ("cliiiick heeere", ["SPAMWORD"]),
+    ("m1racle cure", ["FAKECLAIM"]),
+])
+def test_obfuscated_tokens(tokenizer, text, expected):
+    assert tokenizer.tokenize(text) == expected
+
+def test_structure_uses_original_word(tokenizer):
+    assert tokenizer.tokenize("@us3r #h4sh http://s1te.com") == ["MENTION", "HASHTAG", "URL"]
+
+def test_no_change_on_plain_corpus(lexicon, tokenizer):
+    plain = RegexTokenizer(lexicon=lexicon)
+    for _, _, text in CorpusGenerator(seed=6).corpus(120):
+        assert tokenizer.tokenize(text) == plain.tokenize(text)
+
+def test_doubled_letters_are_not_elongation(tokenizer):
+    # "follow" must not be read as an elongated "fool"
+    assert tokenizer.tokenize("follow") == ["WORD"]
+
+# -------------------------
+# 3. Censorship keeps offsets
+# -------------------------
+@pytest.mark.parametrize("text,expected", [
+    ("You are a stup1d person", "You are a ****** person"),
+    ("so stuuuupid!!", "so *********!!"),
+    ("Sh!t happens, $h!t", "**** happens, ****"),
+    ("you 1d10t!", "you *****!"),
+    ("You are a stupid person", "You are a ****** person"),
+])
+def test_censorship_masks_original_characters(fst, text, expected):
+    assert fst.process_text(text) == expected
+
+def test_pipeline_without_normalization():
+    from src.pipeline import TextPipeline
+    pipeline = TextPipeline(normalize=False)
+    assert pipeline.run("you are stup1d")["detailed"]["content_state"] == "qF_Safe"
+    assert TextPipeline().run("you are stup1d")["detailed"]["content_state"] == "qF_Hate"
@@ -66,3 +66,35 @@ def test_mixed_elements_text(pipeline):
     assert "#fun" in result["text"]  # hashtag visible
     assert "@alice" in result["text"]  # mention visible
     assert "😊" in result["text"]  # emoji replaced
+
+# -------------------------
+# Verdict only / lazy result
+# -------------------------
+def test_classify_matches_run(pipeline):
+    from benchmarks.corpus import CorpusGenerator
+    texts = [text for _, _, text in CorpusGenerator(seed=5).corpus(100)]
+    for text, verdict in zip(texts, pipeline.classify_batch(texts)):
+        detailed = pipeline.run(text)["detailed"]
+        assert verdict == pipeline.classify(text)
+        assert verdict["spam_state"] == detailed["spam_state"]
+        assert verdict["content_state"] == detailed["content_state"]
+        assert verdict["dfa_warnings"] == detailed["dfa_warnings"]
+
+def test_run_is_lazy(pipeline):
+    result = pipeline.run("You are a stupid person")
+    assert result["final"]["warnings"] == ["this post may contain hate speech"]
+    assert "censored_text" not in result["detailed"].computed
+    assert "final_post" not in result["detailed"].computed
+
+    assert "stupid" not in result["final"]["text"]
+    assert "final_post" in result["detailed"].computed
+
+def test_run_result_to_dict(pipeline):
+    import json
+    detailed = pipeline.run("Hi @anna, you idiot")["detailed"].to_dict()
+    assert list(detailed) == [
+        "lexicon_version", "languages", "tokens", "spam_state", "content_state", "campaign_state",
+        "flood_state", "dfa_warnings", "censored_text", "readable_warnings", "final_post", "degraded",
+        "trace",
+    ]
+    assert json.loads(json.dumps(detailed)) == detailed
@@ -0,0 +1,187 @@
+import json
+import random
+
+import pytest
+
+from src import post_index
+from src.lexicon import CATEGORIES, Lexicon
+from src.pipeline import TextPipeline
+from src.post_index import PostIndex, changed_terms, post_keys, routing_changed, term_keys
+from src.term_index import TermIndex, build
+from tests.test_prefilter import mutations
+
+
+@pytest.fixture(scope="module")
+def data():
+    return TextPipeline().stages.lexicon.data
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = PostIndex(tmp_path / "posts.db")
+    yield index
+    index.close()
+
+
+def without(data, removed):
+    """Copy of keywords.json data without the (category, term) pairs in removed."""
+    data = json.loads(json.dumps(data))
+    for category, term in removed:
+        data[category].remove(term)
+    return data
+
+
+# -------------------------
+# Keys
+# -------------------------
+def test_post_keys_normalize_words():
+    keys = post_keys("You are STUUUPID, a d0rk! 💀💀")
+    assert {"you", "are", "stupid", "a", "dork", "d0rk", "💀"} <= keys
+    assert "!" not in keys and "," not in keys
+
+
+def test_term_keys():
+    assert term_keys("free money") == {frozenset({"fre", "money"})}
+    assert term_keys("$tupid") == {frozenset({"tupid"}), frozenset({"stupid"})}
+    assert term_keys("☠️") == {frozenset({"☠", "️"})}
+    assert term_keys("$$$") == {frozenset()}                    # cannot be looked up
+
+
+def test_changed_terms(data):
+    old = Lexicon(without(data, [("badwords", "stupid"), ("spamwords", "free money")]))
+    new = Lexicon(data)
+    assert changed_terms(old, new) == {"stupid", "free money"}
+    assert changed_terms(new, old) == {"stupid", "free money"}
+    assert changed_terms(new, new) == set()
+    assert not routing_changed(old, new)
+    assert routing_changed(new, Lexicon({**data, "languages": {"es": {"badwords": ["idiota"]}}}))
+
+
+# -------------------------
+# Index
+# -------------------------
+def test_put_and_lookup(index):
+    index.put("p1", "you are a zorblax", "qSafe", "qF_Safe", "v1")
+    index.put("p2", "zorblaaaxes everywhere", "qSafe", "qF_Safe", "v1")
+    index.put("p3", "hello world", "qSafe", "qF_Safe", "v1")
+    assert len(index) == 3
+    assert index.get_many(["p1", "nope"]) == {"p1": ("you are a zorblax", "qSafe", "qF_Safe")}
+    assert index.affected(["zorblax"]) == {"p1", "p2"}
+    assert index.affected(["Z0RBLAX", "hello"]) == {"p1", "p2", "p3"}
+    assert index.affected(["hello there"]) == set()               # every word of a phrase is needed
+    assert index.affected(["$$$"]) is None
+    # A post stored again with another text loses its old words
+    index.put("p1", "hello again", "qSafe", "qF_Safe", "v1")
+    assert index.affected(["zorblax"]) == {"p2"}
+    stats = index.stats()
+    assert stats["posts"] == 3 and stats["postings"] >= 6 and stats["baseline"] is None
+
+
+def test_update_verdicts_keeps_words(index):
+    index.put("p1", "you are a zorblax", "qSafe", "qF_Safe", "v1")
+    index.update_verdicts([("p1", "qSafe", "qF_Offensive")], "v2")
+    assert index.get_many(["p1"])["p1"] == ("you are a zorblax", "qSafe", "qF_Offensive")
+    assert index.affected(["zorblax"]) == {"p1"}
+
+
+# -------------------------
+# Re-moderation
+# -------------------------
+@pytest.mark.parametrize("direction", ["added", "removed"])
+def test_remoderate_matches_a_full_rerun(tmp_path, data, direction):
+    rng = random.Random(3)
+    pairs = [(c, t) for c in CATEGORIES for t in data[c]]
+    changed = rng.sample(pairs, 25) + [("badwords", "stupid"), ("spamwords", "free money"), ("bademojis", "☠️")]
+    smaller, full = Lexicon(without(data, set(changed))), Lexicon(data)
+    old, new = (smaller, full) if direction == "added" else (full, smaller)
+
+    index = PostIndex(tmp_path / "posts.db")
+    posts = mutations(seed=9, size=300) + ["you are so stupid", "FREE   MONEY!!", "bye ☠️"]
+    ids = [f"post{i}" for i in range(len(posts))]
+    pipeline = TextPipeline(lexicon=old, post_index=index)
+    pipeline.classify_batch(posts, post_ids=ids)
+    pipeline.reload_lexicon(new)
+    report = pipeline.remoderate()
+
+    reference = TextPipeline(lexicon=new, prefilter=False).classify_batch(posts)
+    stored = index.get_many(ids)
+    assert [stored[i][1:] for i in ids] == [(v["spam_state"], v["content_state"]) for v in reference]
+    assert report["changed"] >= 3 and not report["full_scan"]
+    assert report["affected"] < len(posts)
+    assert index.baseline().version == new.version
+    assert pipeline.remoderate()["affected"] == 0
+    index.close()
+
+
+def test_pipeline_indexes_posts(index):
+    pipeline = TextPipeline(post_index=index)
+    assert index.baseline().version == pipeline.lexicon_version
+    pipeline.run("hello there", post_id="a")["final"]["warnings"]
+    pipeline.run("you are stupid")["detailed"]["dfa_warnings"]
+    pipeline.classify("free money now", post_id=7)
+    stored = index.get_many(["a", "7", pipeline.post_key(None, "you are stupid")])
+    assert stored["a"] == ("hello there", "qSafe", "qF_Safe")
+    assert stored["7"][1] == "qSpam"
+    assert len(stored) == 3
+    with pytest.raises(ValueError):
+        pipeline.classify_batch(["a", "b"], post_ids=["x"])
+    with pytest.raises(RuntimeError):
+        TextPipeline().remoderate()
+
+
+def test_run_indexes_whatever_is_read(index):
+    pipeline = TextPipeline(post_index=index)
+    assert pipeline.stages.prefilter.clear("hello there friend")
+    pipeline.run("hello there friend", post_id="clean")["final"]["text"]
+    pipeline.run("you are stupid", post_id="unread")
+    stored = index.get_many(["clean", "unread"])
+    assert stored["clean"] == ("hello there friend", "qSafe", "qF_Safe")
+    assert stored["unread"][2] != "qF_Safe"
+
+
+def test_cli(tmp_path, capsys, data):
+    path = str(tmp_path / "posts.db")
+    old = Lexicon(without(data, [("badwords", "stupid")]))
+    index = PostIndex(path)
+    TextPipeline(lexicon=old, post_index=index).classify_batch(["you are stupid", "hi"], post_ids=["1", "2"])
+    index.close()
+    assert post_index.main(["remoderate", path]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["affected"] == 1 and report["changes"][0]["post_id"] == "1"
+    assert post_index.main(["stats", path]) == 0
+    assert json.loads(capsys.readouterr().out)["posts"] == 2
+
+
+def test_cli_uses_the_app_configuration(tmp_path, capsys, data):
+    build([("badwords", "zorblax")], tmp_path / "terms.trie")
+    terms = TermIndex(tmp_path / "terms.trie")
+    path = str(tmp_path / "posts.db")
+    index = PostIndex(path)
+    TextPipeline(term_index=terms, post_index=index).classify_batch(["you stupid zorblax"], post_ids=["1"])
+    index.close()
+    terms.close()
+    keywords = tmp_path / "keywords.json"
+    keywords.write_text(json.dumps(without(data, [("badwords", "stupid")])), encoding="utf-8")
+    # "stupid" is gone, but the bulk term still makes the post offensive
+    args = ["remoderate", path, "--keywords-file", str(keywords), "--term-index", str(tmp_path / "terms.trie")]
+    assert post_index.main(args + ["--route-languages"]) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report["affected"] == 1 and report["changed"] == 0
+
+
+def test_rebuilt_term_index_rechecks_every_post(tmp_path):
+    build([("badwords", "zorblax")], tmp_path / "old.trie")
+    build([("badwords", "flimflam")], tmp_path / "new.trie")
+    old, new = TermIndex(tmp_path / "old.trie"), TermIndex(tmp_path / "new.trie")
+    index = PostIndex(tmp_path / "posts.db")
+    TextPipeline(term_index=old, post_index=index).classify_batch(["such a flimflam", "hi"], post_ids=["1", "2"])
+    assert index.baseline_terms() == old.version
+    pipeline = TextPipeline(term_index=new, post_index=index)
+    report = pipeline.remoderate()
+    assert report["terms"] == 0 and report["full_scan"] and report["affected"] == 2
+    assert [change["post_id"] for change in report["changes"]] == ["1"]
+    assert index.baseline_terms() == new.version
+    assert not pipeline.remoderate()["full_scan"]
+    index.close()
+    old.close()
+    new.close()
@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from benchmarks.corpus import CorpusGenerator
+from src.lexicon import CATEGORIES
+from src.normalization import LEET
+from src.pipeline import TextPipeline
+from src.prefilter import CleanPrefilter, caseless, skeleton
+
+# Look-alike and case tricks the pipeline may read as a lexicon term
+UNLEET = {}
+for char, letter in LEET.items():
+    UNLEET.setdefault(letter, []).append(char)
+CASE_TRICKS = {"s": ["ſ", "S"], "i": ["İ", "ı", "I"], "k": ["K", "K"], "e": ["é", "È"], "a": ["á", "Ä"]}
+SPECIALS = ["@", "#", "*", "-", "_", "/", "$", ":", ";", "XD", ":)", "😀", "\u00a0", "\u2028", "http://x.io"]
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return TextPipeline()
+
+
+@pytest.fixture(scope="module")
+def full():
+    return TextPipeline(prefilter=False)
+
+
+def disguise(rng, term):
+    """term with some letters leeted, accented, re-cased or repeated."""
+    chars = []
+    for c in term:
+        roll = rng.random()
+        if roll < 0.2 and c.lower() in UNLEET:
+            c = rng.choice(UNLEET[c.lower()])
+        elif roll < 0.35 and c.lower() in CASE_TRICKS:
+            c = rng.choice(CASE_TRICKS[c.lower()])
+        elif roll < 0.5:
+            c = c.upper()
+        chars.append(c * (rng.randint(2, 4) if rng.random() < 0.15 else 1))
+    return "".join(chars)
+
+
+def mutations(seed, size):
+    """Corpus posts (every kind) plus clean posts with lexicon terms and special characters slipped in."""
+    rng = random.Random(seed)
+    gen = CorpusGenerator(seed=seed)
+    lexicon = TextPipeline().stages.lexicon
+    terms = [t for c in CATEGORIES for t in lexicon.categories[c]]
+    posts = [text for _, _, text in gen.corpus(size, lengths=("short", "medium"))]
+    for _ in range(size):
+        words = gen.post("clean", "short").split()
+        for _ in range(rng.randint(1, 3)):
+            roll, i = rng.random(), rng.randrange(len(words) + 1)
+            if roll < 0.6:
+                words.insert(i, disguise(rng, rng.choice(terms)))
+            elif roll < 0.8:
+                words.insert(i, rng.choice(SPECIALS))
+            elif words:
+                # Glued to a neighbour: substring categories still match inside words
+                words[i - 1] += disguise(rng, rng.choice(terms))
+        posts.append(" ".join(words))
+    return posts
+
+# -------------------------
+# No false negatives
+# -------------------------
+def test_cleared_posts_are_safe_and_untouched(pipeline, full):
+    prefilter = pipeline.stages.prefilter
+    cleared = rejected_flagged = 0
+    for text in mutations(seed=5, size=600):
+        detailed = full.run(text)["detailed"]
+        untouched = (
+            detailed["spam_state"] == "qSafe" and detailed["content_state"] == "qF_Safe"
+            and detailed["censored_text"] == text and detailed["final_post"] == CleanPrefilter.render(text)
+        )
+        if prefilter.clear(text):
+            cleared += 1
+            assert untouched, text
+        elif not untouched:
+            rejected_flagged += 1
+    # The corpus exercises both sides
+    assert cleared > 50 and rejected_flagged > 600
+
+def test_most_clean_posts_are_cleared(pipeline):
+    posts = [text for _, _, text in CorpusGenerator(seed=2).corpus(200, kinds=("clean",))]
+    assert sum(map(pipeline.stages.prefilter.clear, posts)) > len(posts) // 2
+
+@pytest.mark.parametrize("text", [
+    "skill", "STUPID", "stuuupid", "stup1d", "ſtupid", "FREE MONEY", "fr33 m0ney",
+    "@bob", "#tag", "nice :)", "XD", "🙂", "a\u00a0b", "you idiot",
+])
+def test_rejects(pipeline, text):
+    assert not pipeline.stages.prefilter.clear(text)
+
+@pytest.mark.parametrize("text", ["Hello world", "  see you\ttomorrow\n", "I am here", ""])
+def test_clears(pipeline, text):
+    assert pipeline.stages.prefilter.clear(text)
+
+def test_caseless_and_skeleton():
+    assert caseless("ſtİck") == "stick"
+    assert caseless("KILL") == "kill"
+    assert skeleton("kiiill  mee") == "kil me"
+
+# -------------------------
+# Shortcut
+# -------------------------
+def test_run_skips_the_stages(pipeline, full):
+    text = "  Hello   there world "
+    result = pipeline.run(text)
+    assert result["final"].to_dict() == full.run(text)["final"].to_dict()
+    assert "tokens" not in result["detailed"].computed
+    assert result["detailed"]["tokens"] == full.run(text)["detailed"]["tokens"]
+
+def test_classify_batch_skips_cleared(pipeline, monkeypatch):
+    classified = []
+    original = TextPipeline._classify.__func__
+    monkeypatch.setattr(TextPipeline, "_classify", classmethod(
+        lambda cls, stages, text, campaign_state=None:
+            classified.append(text) or original(cls, stages, text, campaign_state)
+    ))
+    verdicts = pipeline.classify_batch(["Hello world", "You are an idiot"])
+    assert classified == ["You are an idiot"]
+    assert [v["content_state"] for v in verdicts] == ["qF_Safe", "qF_Hate"]
+    assert verdicts[0]["dfa_warnings"] == pipeline._verdict(pipeline.stages, "qSafe", "qF_Safe")["dfa_warnings"]
+
+def test_traced_run_walks_the_automata(pipeline):
+    trace = pipeline.run("Hello world", trace=True)["detailed"]["trace"]
+    assert trace["recorded"] > 0
+
+def test_off():
+    pipeline = TextPipeline(prefilter=False)
+    assert pipeline.stages.prefilter is None
+    assert pipeline.run("Hello world")["final"]["text"] == "Hello world"
@@ -0,0 +1,65 @@
+import gc
+
+import pytest
+
+from app import create_app
+from src.campaign import CampaignDetector
+from src.pipeline import TextPipeline
+from src.post_index import PostIndex
+from src.prefork import WARM_UP_TEXTS, freeze, prepare_for_fork, warm_up
+
+
+@pytest.fixture
+def unfreeze():
+    yield
+    gc.unfreeze()
+
+
+def test_warm_up_fills_the_word_cache():
+    pipeline = TextPipeline()
+    warm_up(pipeline)
+    assert len(pipeline.word_cache) > 0
+
+
+def test_warm_up_does_not_count_campaign_posts():
+    detector = CampaignDetector(min_duplicates=1)
+    pipeline = TextPipeline(campaign_detector=detector)
+    warm_up(pipeline)
+    assert len(detector) == 0
+    assert pipeline.campaign_detector is detector
+
+
+def test_warm_up_does_not_archive_posts(tmp_path):
+    index = PostIndex(tmp_path / "posts.db")
+    pipeline = TextPipeline(post_index=index)
+    warm_up(pipeline)
+    index.flush()
+    assert len(index) == 0
+    assert pipeline.post_index is index
+    index.close()
+
+
+def test_freeze_moves_objects_to_the_permanent_generation(unfreeze):
+    assert freeze() > 0
+    assert gc.get_freeze_count() > 0
+
+
+def test_prepare_for_fork(unfreeze):
+    assert prepare_for_fork(TextPipeline()) > 0
+
+
+def test_create_app_prefork(unfreeze):
+    pipeline = TextPipeline()
+    app = create_app(pipeline, prefork=True)
+    assert app.extensions["pipeline"] is pipeline
+    assert gc.get_freeze_count() > 0
+    response = app.test_client().post("/api/moderate", json={"text": WARM_UP_TEXTS[1]})
+    assert response.status_code == 200
+    assert "this post may contain hate speech" in response.get_json()["warnings"]
+
+
+def test_apps_do_not_share_state():
+    first, second = create_app(TextPipeline()), create_app(TextPipeline())
+    first.test_client().post("/", data={"user_text": "hello"})
+    assert first.test_client().get("/details").status_code == 200
+    assert second.test_client().get("/details").status_code == 302
@@ -1,5 +1,6 @@
 import pytest
 from src.preprocessing import RegexTokenizer
+from src.shadow import legacy_classify, legacy_tokenize
 from pathlib import Path
 
 @pytest.fixture
@@ -126,3 +127,126 @@ def test_unknown_symbols(tokenizer):
 def test_combined_emojis_and_words(tokenizer):
     tokens = tokenizer.tokenize("hello😀stupid💀")
     assert tokens == ["WORD", "EMOJI", "BADWORD", "NEG_EMOJI"]
+
+# -------------------------
+# 6. Word index
+# -------------------------
+def classify_cascade(tokenizer, word, folded=None):
+    """Every check in sequence, as tokenize did before the lexicon built a word index."""
+    word_lower = word.lower()
+    patterns = tokenizer.patterns
+
+    # URLs, hashtags, mentions
+    if patterns["URL"].fullmatch(word):
+        return "URL"
+    if patterns["HASHTAG"].match(word):
+        return "HASHTAG"
+    if patterns["MENTION"].match(word):
+        return "MENTION"
+
+    # Simple word categories (one word)
+    if any(bw in word_lower for bw in tokenizer.badwords):
+        return "BADWORD"
+    if any(sw in word_lower for sw in tokenizer.sexwords):
+        return "SEXWORD"
+    if any(vw in word_lower for vw in tokenizer.violence):
+        return "VIOLENCE"
+    if any(p in word_lower for p in tokenizer.politics):
+        return "POLITIC"
+    for kind, words in (("PRONOUN_SELF", tokenizer.pronouns_self), ("PRONOUN_OTHER", tokenizer.pronouns_other),
+                        ("PRONOUN_GROUP", tokenizer.pronouns_group), ("PRONOUN", tokenizer.pronouns),
+                        ("AUX_VERB", tokenizer.aux_verbs)):
+        if word_lower in words:
+            return kind
+
+    # Obfuscated spellings of the categories above
+    if folded is not None:
+        kind = tokenizer.classify_obfuscated(word_lower, folded)
+        if kind:
+            return kind
+
+    # Multi-word phrases already replaced
+    if word in ["SPAMWORD", "FAKECLAIM"]:
+        return word
+
+    # Emojis
+    if patterns["EMOJI"].match(word):
+        return "NEG_EMOJI" if word in tokenizer.bad_emojis else "EMOJI"
+    return "WORD"
+
+def equivalence_words(lexicon):
+    from benchmarks.corpus import CorpusGenerator
+    words = set()
+    for _, _, text in CorpusGenerator(seed=9).corpus(300):
+        words.update(text.split())
+    for attr in ("badwords", "sexwords", "violence", "politics", "pronouns", "pronouns_self",
+                 "pronouns_other", "pronouns_group", "aux_verbs", "bad_emojis"):
+        for word in getattr(lexicon, attr):
+            words.update([word, word.upper(), word.capitalize(), word + "s", "#" + word, word + "!"])
+    words.update(["SPAMWORD", "FAKECLAIM", "spamword", "😀", "☠️", "💀", "", "http://x.com", "@me"])
+    return sorted(words)
+
+def test_word_index_matches_cascade(tokenizer):
+    for word in equivalence_words(tokenizer.lexicon):
+        assert legacy_classify(tokenizer, word) == classify_cascade(tokenizer, word), word
+
+def test_word_index_matches_cascade_with_normalizer():
+    from src.normalization import Normalizer
+    normalizer = Normalizer()
+    tokenizer = RegexTokenizer(normalizer=normalizer, keywords_file="data/keywords.json")
+    for word in equivalence_words(tokenizer.lexicon) + ["y0u", "m3", "stuuupid", "h1m", "1", "sh3"]:
+        folded = normalizer.fold(word).lower()
+        assert legacy_classify(tokenizer, word, folded) == classify_cascade(tokenizer, word, folded), word
+
+def test_word_index_precedence():
+    from src.lexicon import KEYWORDS_FILE, Lexicon
+    import json
+    data = json.loads(KEYWORDS_FILE.read_text(encoding="utf-8"))
+    data["pronouns_self"].append("idiotme")   # contains a badword
+    data["aux_verbs"].append("Might")         # capitals never match
+    lexicon = Lexicon(data)
+    assert lexicon.word_index["them"] == "PRONOUN_OTHER"   # before pronouns_group
+    assert lexicon.word_index["my"] == "PRONOUN_SELF"      # before pronouns
+    assert lexicon.word_index["idiotme"] == "BADWORD"
+    assert "Might" not in lexicon.word_index
+    assert lexicon.word_index["💀"] == "NEG_EMOJI"
+    assert "☠️" not in lexicon.word_index                   # outside the emoji range: a WORD
+
+    tokenizer = RegexTokenizer(lexicon=lexicon)
+    for word in ["idiotme", "IdiotMe", "Might", "them", "☠️"]:
+        assert legacy_classify(tokenizer, word) == classify_cascade(tokenizer, word)
+
+# -------------------------
+#  Single-pass lexer
+# -------------------------
+LEXER_EDGE_CASES = [
+    "stupid!!😀", "fr33😀money", "#😀", "#a😀b", "@😀", "@anna😀", "https://", "http://a😀b",
+    "HTTP://x.com", "😀😃💀", "free😀money now", "bu¥ n0w", "stüpid", "tab\tnew\nline\x1cend",
+    "kiiiill😀", "$h!t😀", "", "   ", "a😀", "😀b!",
+]
+
+def lexer_texts():
+    import random
+    from benchmarks.corpus import CorpusGenerator
+    texts = LEXER_EDGE_CASES + [text for _, _, text in CorpusGenerator(seed=4).corpus(300)]
+    pieces = list("ab$1!3@#:/._-*é\t\n ") + ["😀", "stupid", "http://", "free", "money", "fr33", "k1ll"]
+    rnd = random.Random(7)
+    texts += ["".join(rnd.choice(pieces) for _ in range(rnd.randint(1, 16))) for _ in range(2000)]
+    return texts
+
+@pytest.mark.parametrize("options", [
+    {"normalize": False, "word_cache_size": 0},
+    {"normalize": True, "word_cache_size": 0},
+    {"normalize": True, "word_cache_size": 50},
+])
+def test_lexer_matches_reference(options):
+    from src.pipeline import TextPipeline
+    tokenizer = TextPipeline(**options).tokenizer
+    for text in lexer_texts():
+        assert tokenizer.tokenize(text) == legacy_tokenize(tokenizer, text), text
+
+def test_lexer_group_kinds():
+    from src.preprocessing import LEXER
+    kinds = [(m.lastgroup, m.group()) for m in LEXER.finditer("hi😀 #tag @me http://x.y w0rd!")]
+    assert kinds == [("WORD", "hi"), ("EMOJI", "😀"), ("HASHTAG", "#tag"), ("MENTION", "@me"),
+                     ("URL", "http://x.y"), ("OTHER", "w0rd!")]
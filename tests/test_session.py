@@ -0,0 +1,130 @@
+import copy
+import json
+import random
+import pytest
+from benchmarks.corpus import CorpusGenerator
+from src.pipeline import TextPipeline
+from src.session import ModerationSession
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return TextPipeline()
+
+def expected(pipeline, text):
+    detailed = pipeline.run(text)["detailed"]
+    return detailed["spam_state"], detailed["content_state"], detailed["dfa_warnings"]
+
+def observed(verdict):
+    return verdict["spam_state"], verdict["content_state"], verdict["dfa_warnings"]
+
+def feed_in_pieces(session, text, rng, max_size=12):
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, max_size)
+        session.feed(text[i:i + size])
+        i += size
+    return session
+
+# -------------------------
+# Equivalence with run()
+# -------------------------
+def test_matches_run_on_random_chunks(pipeline):
+    rng = random.Random(7)
+    for _, _, text in CorpusGenerator(seed=3).corpus(150):
+        session = feed_in_pieces(pipeline.open(), text, rng)
+        assert observed(session.verdict()) == expected(pipeline, text), text
+
+@pytest.mark.parametrize("text", [
+    "Get free money now, you idiot",
+    "This is a miracle cure for everything",
+    "hello http://a.com http://b.com http://c.com http://d.com",
+    "I will kill him #a #b #c #d",
+    "so stuuuupid!! and fr33 m0ney",
+    "wow💰free money",
+])
+def test_matches_run_one_char_at_a_time(pipeline, text):
+    session = pipeline.open()
+    for char in text:
+        session.feed(char)
+    assert observed(session.verdict()) == expected(pipeline, text)
+
+def test_phrase_split_across_chunks(pipeline):
+    session = pipeline.open()
+    session.feed("Get fr").feed("ee mon").feed("ey ")
+    assert session.verdict()["spam_state"] == "qSpam"
+
+def test_verdict_does_not_consume_input(pipeline):
+    session = pipeline.open()
+    session.feed("you are so stu")
+    assert session.verdict()["content_state"] == "qF_Safe"
+    session.feed("pid")
+    assert session.verdict()["content_state"] == "qF_Hate"
+    assert session.verdict()["content_state"] == "qF_Hate"
+
+def test_tail_stays_bounded(pipeline):
+    session = pipeline.open()
+    for _ in range(500):
+        session.feed("hello there friend ")
+    keep = pipeline.stages.lexicon.max_phrase_words
+    assert len(session.buffer.split()) <= keep
+    assert session.chars == 500 * len("hello there friend ")
+
+def test_word_starts_found_incrementally(pipeline):
+    session = pipeline.open()
+    rng = random.Random(3)
+    for _ in range(200):
+        session.feed(rng.choice(["ab", " ", "c d", "  e", "\n", "fgh "]))
+        assert session.word_starts() == [i for i, c in enumerate(session.buffer)
+                                         if not c.isspace() and (i == 0 or session.buffer[i - 1].isspace())]
+
+def test_buffer_without_words_is_capped(pipeline):
+    session = ModerationSession(pipeline.stages, max_buffer=1000)
+    for _ in range(2000):
+        session.feed("x" * 100)
+    assert len(session.buffer) <= 1000 + 100
+    session.feed(" you are stupid")
+    assert session.verdict()["content_state"] != "qF_Safe"
+    assert session.chars == 2000 * 100 + len(" you are stupid")
+
+def test_empty_session(pipeline):
+    verdict = pipeline.open().verdict()
+    assert verdict["dfa_warnings"] == []
+    assert verdict["lexicon_version"] == pipeline.lexicon_version
+
+# -------------------------
+# Snapshots
+# -------------------------
+def test_snapshot_moves_between_pipelines(pipeline):
+    text = "You are such an idiot, claim your free money now"
+    session = pipeline.open()
+    session.feed(text[:23])
+    state = json.loads(json.dumps(session.snapshot()))
+
+    other = TextPipeline().open(state)
+    other.feed(text[23:])
+    assert observed(other.verdict()) == expected(pipeline, text)
+
+def test_snapshot_requires_same_lexicon(pipeline, tmp_path):
+    path = tmp_path / "keywords.json"
+    data = copy.deepcopy(pipeline.stages.lexicon.data)
+    data["badwords"].append("grumpus")
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+    state = pipeline.open().feed("hello").snapshot()
+    with pytest.raises(ValueError):
+        TextPipeline(keywords_file=path).open(state)
+
+def test_session_keeps_its_lexicon(pipeline, tmp_path):
+    path = tmp_path / "keywords.json"
+    data = copy.deepcopy(pipeline.stages.lexicon.data)
+    path.write_text(json.dumps(data), encoding="utf-8")
+    reloading = TextPipeline(keywords_file=path)
+    session = reloading.open()
+
+    data["badwords"].append("grumpus")
+    path.write_text(json.dumps(data), encoding="utf-8")
+    reloading.reload_lexicon()
+
+    session.feed("you grumpus")
+    assert session.verdict()["content_state"] == "qF_Safe"
+    assert reloading.open().feed("you grumpus").verdict()["content_state"] == "qF_Hate"
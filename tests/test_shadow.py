@@ -0,0 +1,169 @@
+import sys
+import threading
+
+import pytest
+
+from src.keyword_stats import KeywordStats
+from src.pipeline import TextPipeline
+from src.prefork import warm_up
+from src.shadow import (
+    LatencyHistogram, ShadowRunner, legacy_tokenizer_engine, load_candidate, private_stages,
+    reference_engine,
+)
+
+POSTS = [
+    "You are a stupid person",
+    "free money now, click here http://x.com",
+    "Hello @anna, check #news 😀",
+    "stuuupid fr33 m0ney😀",
+]
+
+
+def leaky_engine(stages):
+    """A candidate that forgets the censorship step."""
+    reference = reference_engine(stages)
+
+    def moderate(text):
+        output = reference(text)
+        output["censored_text"] = text
+        return output
+    return moderate
+
+
+def broken_engine(stages):
+    def moderate(text):
+        raise RuntimeError("not implemented")
+    return moderate
+
+
+@pytest.fixture
+def pipeline():
+    return TextPipeline()
+
+# -------------------------
+# Histogram
+# -------------------------
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for us in range(1, 1001):
+        histogram.record(us / 1e6)
+    assert histogram.count == 1000
+    assert 500e-6 <= histogram.percentile(50) <= 500e-6 * 1.1
+    assert 990e-6 <= histogram.percentile(99) <= 990e-6 * 1.1
+    assert histogram.to_dict()["mean_us"] == pytest.approx(500.5)
+    assert LatencyHistogram().percentile(50) is None
+
+# -------------------------
+# Runner
+# -------------------------
+def test_identical_engines_match(pipeline):
+    shadow = ShadowRunner(legacy_tokenizer_engine, sample_rate=1.0)
+    for text in POSTS:
+        assert shadow.compare(pipeline.stages, text) == []
+    report = shadow.report()
+    assert report["compared"] == 4 and report["mismatched"] == 0
+    assert report["latency"]["reference"]["count"] == report["latency"]["candidate"]["count"] == 4
+    assert report["speedup_p50"] > 0
+
+def test_mismatches_are_recorded_with_input(pipeline):
+    shadow = ShadowRunner(leaky_engine, sample_rate=1.0, max_mismatches=1)
+    for text in POSTS:
+        shadow.compare(pipeline.stages, text)
+    report = shadow.report()
+    assert report["mismatched"] == 2                            # the two posts with censored words
+    assert report["field_mismatches"]["censored_text"] == 2
+    assert report["field_mismatches"]["tokens"] == 0
+    assert len(report["mismatches"]) == 1                       # only the last max_mismatches
+    last = report["mismatches"][-1]
+    assert last["text"] == POSTS[3] and last["fields"] == ["censored_text"]
+    assert last["candidate"]["censored_text"] == POSTS[3]
+    assert last["lexicon_version"] == pipeline.lexicon_version
+
+def test_broken_candidate_is_a_mismatch(pipeline):
+    shadow = ShadowRunner(broken_engine, sample_rate=1.0)
+    assert shadow.compare(pipeline.stages, "hello") == ["tokens", "spam_state", "content_state", "censored_text"]
+    assert shadow.report()["errors"] == 1
+    assert "not implemented" in shadow.report()["mismatches"][0]["error"]
+
+def test_sampling(pipeline):
+    shadow = ShadowRunner(legacy_tokenizer_engine, sample_rate=0.25, seed=3)
+    sampled = sum(shadow.submit(pipeline.stages, "hello") for _ in range(2000))
+    shadow.drain()
+    assert 400 < sampled < 600
+    assert shadow.report()["compared"] == sampled
+    assert not ShadowRunner(legacy_tokenizer_engine, sample_rate=0).submit(pipeline.stages, "hello")
+
+def test_full_queue_drops(pipeline):
+    shadow = ShadowRunner(legacy_tokenizer_engine, sample_rate=1.0, max_queue=1)
+    shadow._ensure_thread = lambda: None          # no consumer: the queue stays full
+    assert shadow.submit(pipeline.stages, "a")
+    assert not shadow.submit(pipeline.stages, "b")
+    assert shadow.counts["dropped"] == 1
+
+def test_engines_follow_reloads(pipeline):
+    built = []
+    shadow = ShadowRunner(lambda stages: built.append(stages.version) or reference_engine(stages))
+    first = shadow.engines(pipeline.stages)
+    assert shadow.engines(pipeline.stages) is first
+    from src.lexicon import Lexicon
+    data = dict(Lexicon.from_file().data, badwords=Lexicon.from_file().data["badwords"] + ["grumpus"])
+    pipeline.reload_lexicon(Lexicon(data))
+    shadow.engines(pipeline.stages)
+    assert len(built) == 2 and list(shadow._engines) == [pipeline.stages]
+
+def test_comparisons_never_step_the_live_automata(pipeline):
+    shadow = ShadowRunner(legacy_tokenizer_engine, sample_rate=1.0)
+    stages = pipeline.stages
+    private = private_stages(stages)
+    assert private.spam_dfa is not stages.spam_dfa and private.content_dfa is not stages.content_dfa
+    assert private.censorship_fst is not stages.censorship_fst and private.tokenizer is stages.tokenizer
+    stop = threading.Event()
+
+    def compare():
+        while not stop.is_set():
+            shadow.compare(stages, "free money now!!! You are a stupid person http://x.com")
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=compare)
+    thread.start()
+    try:
+        verdicts = [pipeline._classify(stages, "hello there my friend") for _ in range(3000)]
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(interval)
+    assert all(v["spam_state"] == "qSafe" and v["content_state"] == "qF_Safe" for v in verdicts)
+
+
+def test_load_candidate():
+    assert load_candidate("src.shadow:legacy_tokenizer_engine") is legacy_tokenizer_engine
+
+# -------------------------
+# Pipeline
+# -------------------------
+def test_pipeline_submits_run_and_classify():
+    shadow = ShadowRunner(leaky_engine, sample_rate=1.0)
+    pipeline = TextPipeline(shadow=shadow)
+    result = pipeline.run(POSTS[0])
+    pipeline.classify_batch(POSTS[1:3])
+    shadow.drain()
+    assert shadow.report()["compared"] == 3
+    assert "tokens" not in result["detailed"].computed     # the request computed nothing extra
+
+def test_warm_up_does_not_feed_the_shadow():
+    shadow = ShadowRunner(legacy_tokenizer_engine, sample_rate=1.0)
+    pipeline = TextPipeline(shadow=shadow)
+    warm_up(pipeline)
+    assert shadow.counts["sampled"] == 0 and pipeline.shadow is shadow
+
+def test_comparisons_are_not_counted():
+    stats = KeywordStats()
+    shadow = ShadowRunner(reference_engine, sample_rate=1.0)
+    pipeline = TextPipeline(shadow=shadow, keyword_stats=stats)
+    pipeline.run("you are stupid")["final"]["text"]
+    shadow.drain()
+    assert shadow.report()["compared"] == 1
+    (snapshot,) = stats.snapshot().values()
+    assert snapshot["keywords"]["badwords"] == {"stupid": [1, 0]}
+    assert pipeline.tokenizer.keyword_hits is not None
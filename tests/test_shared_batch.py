@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+from benchmarks.corpus import CorpusGenerator
+from src import shared_batch
+from src.pipeline import TextPipeline
+from src.shared_batch import BatchPool, SharedBatch, apply_spans, censored_spans
+from tests.test_prefilter import mutations
+
+
+@pytest.fixture(scope="module")
+def texts():
+    corpus = [text for _, _, text in CorpusGenerator(seed=5).corpus(120)]
+    return corpus + mutations(seed=6, size=80) + ["", "ñandú 💀 stupid", "you are stupid *** idiot  "]
+
+
+@pytest.fixture(scope="module")
+def reference(texts):
+    pipeline = TextPipeline()
+    return [
+        {key: detailed[key] for key in ("spam_state", "content_state", "dfa_warnings", "censored_text")}
+        for detailed in (pipeline.run(text)["detailed"] for text in texts)
+    ]
+
+
+def segments():
+    return set(os.listdir("/dev/shm")) if os.path.isdir("/dev/shm") else set()
+
+
+# -------------------------
+# Spans
+# -------------------------
+def test_spans_round_trip():
+    fst = TextPipeline().censorship_fst
+    for text in ["you are stupid", "**stupid** idiot!", "a*b stupid", "nothing here"]:
+        censored = fst.censor(text)
+        spans = censored_spans(text, censored)
+        assert apply_spans(text, spans) == censored
+        assert all(text[a:b] != "*" * (b - a) for a, b in spans)
+    assert apply_spans("abc", []) == "abc"
+
+
+# -------------------------
+# Shared segment
+# -------------------------
+@pytest.mark.parametrize("run", [1 << 18, 3])
+def test_pack_and_results(monkeypatch, run):
+    # Runs shorter than a text: every text packed on its own, empty ones included
+    monkeypatch.setattr(shared_batch, "_PACK_RUN", run)
+    texts = ["héllo 💀", "", "x" * 9, "a b c d e"]
+    batch = SharedBatch.pack(texts)
+    try:
+        reader = SharedBatch.attach(batch.name)
+        assert reader.texts(0, len(texts)) == texts
+        assert reader.texts(1, 3) == texts[1:3]
+        # Worst case for the span rows: every other character masked, next to other texts
+        reader.write(2, [
+            ("qSafe", "qF_Offensive", [(0, 9)]),
+            ("qSpam", "qF_Hate", [(0, 1), (2, 3), (4, 5), (6, 7), (8, 9)]),
+        ])
+        reader.write(0, [("qSafe", "qF_Safe", [])])
+        reader.close()
+        assert batch.results() == [
+            ("qSafe", "qF_Safe", []),
+            ("qSafe", "qF_Safe", []),
+            ("qSafe", "qF_Offensive", [[0, 9]]),
+            ("qSpam", "qF_Hate", [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]),
+        ]
+    finally:
+        batch.close()
+        batch.unlink()
+
+
+# -------------------------
+# Pool
+# -------------------------
+@pytest.mark.parametrize("transport", ["shared", "pickle"])
+def test_pool_matches_run(texts, reference, transport):
+    before = segments()
+    with BatchPool(workers=2, transport=transport) as pool:
+        # Small batch, then a bigger one (new segment), then one that fits (segment reused)
+        assert pool.classify_batch(texts[:5]) == reference[:5]
+        assert pool.classify_batch(texts) == reference
+        assert pool.classify_batch(texts[::-1]) == reference[::-1]
+        assert pool.classify_batch([]) == []
+    assert segments() == before                     # every segment unlinked
+
+
+def test_pool_options_and_errors():
+    with pytest.raises(ValueError):
+        BatchPool(workers=1, transport="json")
+    with BatchPool(workers=1, prefilter=False, chunks_per_worker=1) as pool:
+        assert pool.ranges(5) == [(0, 5)]
+        verdicts = pool.classify_batch(["you are stupid"])
+    assert verdicts[0]["content_state"] != "qF_Safe"
+    assert "*" in verdicts[0]["censored_text"]
@@ -0,0 +1,131 @@
+import json
+import os
+import random
+
+import pytest
+
+from src import term_index
+from src.pipeline import TextPipeline
+from src.term_index import INDEX_CATEGORIES, TermIndex, build, read_terms
+
+ENTRIES = [
+    ("badwords", "zorblax"),
+    ("sexwords", "quimbly"),
+    ("violence", "skrunk"),
+    ("politics", "blorvian"),
+    ("pronouns_other", "thou"),
+    ("aux_verbs", "shalt"),
+    ("badwords", "Estúpido"),
+    ("pronouns", "zorblax"),          # also a badword: the badword wins
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    build(ENTRIES, tmp_path / "terms.trie")
+    index = TermIndex(tmp_path / "terms.trie")
+    yield index
+    index.close()
+
+
+def category_sets(entries):
+    return {c: {t.lower() for cat, t in entries if cat == c} for c in INDEX_CATEGORIES}
+
+
+def reference(sets, word):
+    """Tokenizer precedence over plain Python sets."""
+    for category in INDEX_CATEGORIES[:term_index.SUBSTRING_COUNT]:
+        if any(t in word for t in sets[category]):
+            return term_index.CATEGORY_KINDS[category]
+    for category in INDEX_CATEGORIES[term_index.SUBSTRING_COUNT:]:
+        if word in sets[category]:
+            return term_index.CATEGORY_KINDS[category]
+    return None
+
+# -------------------------
+# Trie
+# -------------------------
+def test_lookups(index):
+    assert index.get("zorblax") == "BADWORD"
+    assert index.get("zorbla") is None and index.get("zorblaxx") is None
+    assert index.classify("megazorblaxes") == "BADWORD"            # substring category: anywhere
+    assert index.classify("thou") == "PRONOUN_OTHER"
+    assert index.classify("thoughts") is None                      # exact category: whole word only
+    assert index.classify("estúpido") == "BADWORD"                 # lowercased at build, UTF-8 bytes
+    assert index.search("hello skrunk world") and not index.search("thou shalt")
+    assert len(index) == 7
+
+def test_matches_sets_on_random_terms(tmp_path):
+    rng = random.Random(0)
+    entries = [
+        (rng.choice(INDEX_CATEGORIES), "".join(rng.choices("abcdeé", k=rng.randint(1, 6))))
+        for _ in range(3000)
+    ]
+    build(entries, tmp_path / "random.trie")
+    index = TermIndex(tmp_path / "random.trie")
+    sets = category_sets(entries)
+    for _ in range(2000):
+        word = "".join(rng.choices("abcdeéx", k=rng.randint(1, 9)))
+        assert index.classify(word) == reference(sets, word), word
+    index.close()
+
+def test_first_keeps_tokenizer_precedence(index):
+    assert index.first(None, "a skrunk") == "VIOLENCE"
+    assert index.first("BADWORD", "skrunk") == "BADWORD"
+    assert index.first("PRONOUN", "skrunk") == "VIOLENCE"
+    assert index.first("NEG_EMOJI", "thou") == "PRONOUN_OTHER"
+
+def test_header_and_errors(tmp_path, index):
+    assert index.header["terms"] == 7 and index.header["byteorder"]
+    assert index.version == build(ENTRIES, tmp_path / "again.trie")["version"]
+    with pytest.raises(ValueError):
+        build([("spamwords", "free money")], tmp_path / "x.trie")
+    (tmp_path / "bad.trie").write_bytes(b"not a trie at all")
+    with pytest.raises(ValueError):
+        TermIndex(tmp_path / "bad.trie")
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_worker_reads_the_same_mapping(index):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_fd, (index.classify("zorblax") or "").encode())
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 16) == b"BADWORD"
+
+def test_cli(tmp_path, capsys):
+    terms = tmp_path / "terms.tsv"
+    terms.write_text("# bulk terms\nbadwords\tzorblax\n\nviolence\tskrunk\n", encoding="utf-8")
+    assert list(read_terms(terms)) == [("badwords", "zorblax"), ("violence", "skrunk")]
+    assert term_index.main(["build", str(terms), str(tmp_path / "t.trie")]) == 0
+    assert "2 terms" in capsys.readouterr().out
+    assert term_index.main(["stats", str(tmp_path / "t.trie")]) == 0
+    assert json.loads(capsys.readouterr().out)["terms"] == 2
+    terms.write_text("badwords zorblax\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(read_terms(terms))
+
+# -------------------------
+# Pipeline
+# -------------------------
+def test_pipeline_uses_bulk_terms(index):
+    pipeline = TextPipeline(term_index=index)
+    plain = TextPipeline()
+    detailed = pipeline.run("You are a zorblax")["detailed"]
+    assert detailed["content_state"] == plain.run("You are a stupid")["detailed"]["content_state"]
+    assert detailed["censored_text"] == "You are a *******"
+    assert pipeline.run("you z0rblax")["detailed"]["censored_text"] == "you *******"
+    assert pipeline.classify("skrunk them all")["content_state"] != "qF_Safe"
+    assert plain.classify("skrunk them all")["content_state"] == "qF_Safe"
+
+def test_prefilter_sees_bulk_terms(index):
+    prefilter = TextPipeline(term_index=index).stages.prefilter
+    assert not prefilter.clear("hello megazorblax")
+    assert not prefilter.clear("hello z0rblax")
+    assert not prefilter.clear("ΑΣ hello")
+    assert prefilter.clear("hello world")
+
+def test_store_version_names_the_index(index):
+    pipeline = TextPipeline(term_index=index)
+    assert pipeline.store_version().endswith(f"+terms-{index.version}")
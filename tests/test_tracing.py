@@ -0,0 +1,137 @@
+import pytest
+
+from src.pipeline import TextPipeline
+from src.prefork import warm_up
+from src.spam_dfa import SpamDFA
+from src.content_dfa import ContentDFA
+from src.censorship_fst import CensorshipFST
+from src.tracing import Tracer, TransitionTrace
+
+POSTS = [
+    "You are a stupid person",
+    "free money now, click here http://x.com #a #b #c #d",
+    "I want to kill myself",
+    "stuuupid fr33 m0ney",
+    "",
+]
+
+
+@pytest.fixture
+def pipeline():
+    return TextPipeline()
+
+# -------------------------
+# Ring buffer
+# -------------------------
+def test_trace_keeps_order():
+    trace = TransitionTrace(capacity=4)
+    for i in range(3):
+        trace.record("spam", f"t{i}", "q0", "q0")
+    assert [e[1] for e in trace.events()] == ["t0", "t1", "t2"]
+    assert len(trace) == 3 and trace.dropped == 0
+
+def test_trace_wraps_around():
+    trace = TransitionTrace(capacity=4)
+    for i in range(10):
+        trace.record("spam" if i % 2 else "content", f"t{i}", "q0", "q0")
+    assert [e[1] for e in trace.events()] == ["t6", "t7", "t8", "t9"]
+    assert [e[1] for e in trace.events("spam")] == ["t7", "t9"]
+    assert trace.dropped == 6 and len(trace.entries) == 4
+    body = trace.to_dict()
+    assert body["recorded"] == 10 and body["events"][0] == {
+        "machine": "content", "token": "t6", "from": "q0", "to": "q0",
+    }
+
+def test_tracer_sampling():
+    tracer = Tracer(sample_rate=0.25, keep=1000, seed=1)
+    started = sum(tracer.start("post", "v1") is not None for _ in range(2000))
+    assert 400 < started < 600
+    assert len(tracer.recent) == started
+    assert Tracer().start("post", "v1") is None                 # sampling off
+    assert Tracer().start("post", "v1", force=True) is not None
+
+# -------------------------
+# Automata
+# -------------------------
+@pytest.mark.parametrize("text", POSTS)
+def test_traced_automata_reach_the_same_states(pipeline, text):
+    stages = pipeline.stages
+    tokens = stages.tokenizer.tokenize(text)
+    trace = TransitionTrace()
+    assert stages.spam_dfa.process_tokens_traced(tokens, trace) == stages.spam_dfa.process_tokens(tokens)
+    assert stages.content_dfa.process_tokens_traced(tokens, trace) == stages.content_dfa.process_tokens(tokens)
+    assert stages.censorship_fst.process_text_traced(text, trace) == stages.censorship_fst.process_text(text)
+    # One step per token (plus $) for each DFA
+    for machine in ("spam", "content", "direction"):
+        assert len(trace.events(machine)) == len(tokens) + 1
+
+def test_steps_chain_states(pipeline):
+    trace = pipeline.run("free money now, click here http://x.com", trace=True)["detailed"]["trace"]
+    for machine in ("spam", "content", "direction"):
+        events = [e for e in trace["events"] if e["machine"] == machine]
+        assert all(a["to"] == b["from"] for a, b in zip(events, events[1:]))
+    spam = [e for e in trace["events"] if e["machine"] == "spam"]
+    assert spam[-1] == {"machine": "spam", "token": "$", "from": "qSpam", "to": "qSpam"}
+
+def test_censorship_steps(pipeline):
+    trace = TransitionTrace()
+    pipeline.censorship_fst.process_text_traced("you stuuupid idiot", trace)
+    assert [(e[1], e[3]) for e in trace.events()] == [
+        ("you", "q0"), ("stuuupid", "qC"), ("idiot", "qC"), ("$", "qF"),
+    ]
+
+def test_standalone_automata_trace():
+    trace = TransitionTrace()
+    assert SpamDFA().process_tokens_traced(["URL", "SPAMWORD"], trace) == "qSpam"
+    assert ContentDFA().process_tokens_traced(["PRONOUN_OTHER", "BADWORD"], trace) == "qF_Hate"
+    CensorshipFST().process_text_traced("", trace)
+    assert trace.events()[-1] == ("censorship", "$", "q0", "qF")
+
+# -------------------------
+# Pipeline
+# -------------------------
+def test_untraced_run_never_takes_the_traced_path(pipeline, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("traced path taken")
+    for cls, name in ((SpamDFA, "process_tokens_traced"), (ContentDFA, "process_tokens_traced"),
+                      (CensorshipFST, "process_text_traced")):
+        monkeypatch.setattr(cls, name, fail)
+    result = pipeline.run("You are a stupid person")
+    assert result["final"]["warnings"]
+    assert result["detailed"]["trace"] is None
+
+def test_traced_run_has_the_same_result(pipeline):
+    for text in POSTS:
+        plain = pipeline.run(text)["detailed"].to_dict()
+        traced = pipeline.run(text, trace=True)["detailed"].to_dict()
+        assert traced.pop("trace")["recorded"] > 0
+        plain.pop("trace")
+        assert traced == plain
+
+def test_trace_completes_pending_steps(pipeline):
+    result = pipeline.run("You are a stupid person", trace=True)
+    machines = {e["machine"] for e in result["detailed"]["trace"]["events"]}
+    assert machines == {"spam", "content", "direction", "censorship"}
+
+def test_sampled_runs_are_kept(pipeline):
+    pipeline.tracer = Tracer(sample_rate=1.0, capacity=8)
+    pipeline.run("You are a stupid person")["final"]["text"]
+    report = pipeline.tracer.report()
+    assert report["traces"][0]["text"] == "You are a stupid person"
+    assert report["traces"][0]["lexicon_version"] == pipeline.lexicon_version
+    assert len(report["traces"][0]["events"]) == 8 and report["traces"][0]["dropped"] > 0
+
+def test_trace_ignores_stored_verdicts(tmp_path):
+    from src.verdict_store import VerdictStore
+    store = VerdictStore(tmp_path / "v.db")
+    pipeline = TextPipeline(verdict_store=store)
+    pipeline.classify("You are a stupid person")
+    detailed = pipeline.run("You are a stupid person", trace=True)["detailed"]
+    assert detailed["content_state"] == "qF_Hate"
+    assert detailed["trace"]["events"]
+    store.close()
+
+def test_warm_up_is_not_traced(pipeline):
+    pipeline.tracer = Tracer(sample_rate=1.0)
+    warm_up(pipeline)
+    assert not pipeline.tracer.recent
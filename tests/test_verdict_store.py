@@ -0,0 +1,213 @@
+import os
+
+import pytest
+
+from src import verdict_store
+from src.deadline import Deadline
+from src.pipeline import TextPipeline
+from src.verdict_store import VerdictStore, content_hash
+from tests.test_language import multilingual
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    store = VerdictStore(tmp_path / "verdicts.db", batch_size=4, flush_interval=60, clock=clock)
+    yield store
+    store.close()
+
+
+def rows(store):
+    return store.conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+# -------------------------
+# Store
+# -------------------------
+def test_content_hash():
+    assert content_hash("hello") == content_hash("hello")
+    assert content_hash("hello") != content_hash("hello ")
+    assert len(content_hash("x" * 10_000)) == 16
+    assert content_hash("\ud800")  # lone surrogates from JSON payloads
+
+def test_wal_mode(store):
+    assert store.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_writes_are_batched(store):
+    for i in range(3):
+        store.put(content_hash(str(i)), "v1", "qSafe", "qF_Safe")
+    assert rows(store) == 0 and len(store.pending) == 3
+    assert store.get(content_hash("1"), "v1") == ("qSafe", "qF_Safe")   # answered from memory
+    store.put(content_hash("3"), "v1", "qSpam", "qF_Safe")
+    assert rows(store) == 4 and not store.pending
+
+def test_flush_interval(store, clock):
+    store.put(content_hash("a"), "v1", "qSafe", "qF_Safe")
+    assert rows(store) == 0
+    clock.now += 61
+    store.put(content_hash("b"), "v1", "qSafe", "qF_Safe")
+    assert rows(store) == 2
+
+def test_versions_are_separate(store):
+    store.put(content_hash("a"), "v1", "qSpam", "qF_Safe")
+    store.flush()
+    assert store.get(content_hash("a"), "v1") == ("qSpam", "qF_Safe")
+    assert store.get(content_hash("a"), "v2") is None
+
+def test_get_many_in_chunks(store, monkeypatch):
+    monkeypatch.setattr(verdict_store, "IN_CHUNK", 3)
+    hashes = [content_hash(str(i)) for i in range(10)]
+    store.put_many([(h, "qSafe", "qF_Safe") for h in hashes[:7]], "v1")
+    store.flush()
+    found = store.get_many(hashes + hashes[:2], "v1")
+    assert set(found) == set(hashes[:7])
+    assert store.misses == 3
+
+def test_survives_reopen(tmp_path):
+    path = tmp_path / "verdicts.db"
+    first = VerdictStore(path)
+    first.put(content_hash("post"), "v1", "qSpam", "qF_Hate")
+    first.close()                                   # close() commits what is pending
+    second = VerdictStore(path)
+    assert second.get(content_hash("post"), "v1") == ("qSpam", "qF_Hate")
+    second.close()
+
+def test_max_rows_trims_oldest(tmp_path, clock):
+    store = VerdictStore(tmp_path / "v.db", batch_size=1, max_rows=10, clock=clock)
+    for i in range(25):
+        clock.now += 1
+        store.put(content_hash(str(i)), "v1", "qSafe", "qF_Safe")
+    assert rows(store) <= 11
+    assert store.get(content_hash("24"), "v1") is not None
+    assert store.get(content_hash("0"), "v1") is None
+    store.close()
+
+def test_compact(store, clock):
+    for version, age in (("v1", 100), ("v2", 50), ("v3", 0)):
+        clock.now = 1000 - age
+        store.put_many([(content_hash(f"{version}{i}"), "qSafe", "qF_Safe") for i in range(5)], version)
+    clock.now = 1000
+    assert store.compact(max_age=75) == 5                 # v1 is too old
+    assert store.compact(keep_versions=1) == 5            # only v3 is recent enough
+    assert store.compact(max_rows=2) == 3
+    assert store.stats()["versions"] == {"v3": 2}
+    assert not os.path.getsize(store.path + "-wal")       # checkpointed
+
+def test_audit_and_stats(store, clock):
+    store.put(content_hash("a"), "v1", "qSpam", "qF_Safe")
+    clock.now += 5
+    store.put(content_hash("b"), "v2", "qSafe", "qF_Hate")
+    log = store.audit()
+    assert [r["lexicon_version"] for r in log] == ["v1", "v2"]
+    assert log[0]["content_hash"] == content_hash("a").hex()
+    assert [r["content_state"] for r in store.audit(since=1003)] == ["qF_Hate"]
+    assert store.audit(version="v1", limit=1)[0]["spam_state"] == "qSpam"
+    stats = store.stats()
+    assert stats["rows"] == 2 and stats["pending"] == 0 and stats["bytes"] > 0
+    assert len(store) == 2
+
+def test_cli(tmp_path, capsys):
+    path = tmp_path / "v.db"
+    store = VerdictStore(path)
+    store.put_many([(content_hash(str(i)), "qSafe", "qF_Safe") for i in range(5)], "v1")
+    store.close()
+    assert verdict_store.main(["compact", str(path), "--max-rows", "2"]) == 0
+    assert "deleted 3 rows" in capsys.readouterr().out
+    assert verdict_store.main(["stats", str(path)]) == 0
+    assert '"rows": 2' in capsys.readouterr().out
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_reconnects(store):
+    store.put(content_hash("parent"), "v1", "qSafe", "qF_Safe")
+    store.flush()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        ok = store.get(content_hash("parent"), "v1") is not None and store._pid == os.getpid()
+        os.write(write_fd, b"1" if ok else b"0")
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b"1"
+
+# -------------------------
+# Pipeline
+# -------------------------
+@pytest.fixture
+def stored_pipeline(tmp_path):
+    store = VerdictStore(tmp_path / "verdicts.db", batch_size=1000)
+    pipeline = TextPipeline(verdict_store=store)
+    yield pipeline
+    store.close()
+
+def test_classify_batch_reuses_stored_verdicts(stored_pipeline, monkeypatch):
+    texts = ["free money now click here", "You are an idiot", "Hello world"]
+    first = stored_pipeline.classify_batch(texts)
+    assert len(stored_pipeline.verdict_store.pending) == 2     # "Hello world" is cleared, not stored
+    stored_pipeline.verdict_store.flush()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("classified again")
+    monkeypatch.setattr(TextPipeline, "_classify", fail)
+    assert stored_pipeline.classify_batch(texts) == first
+    assert stored_pipeline.classify(texts[1]) == first[1]
+
+def test_classify_batch_vectorized_only_misses(stored_pipeline):
+    pytest.importorskip("numpy")
+    stored_pipeline.classify("You are an idiot")
+    verdicts = stored_pipeline.classify_batch(["You are an idiot", "free money now"], vectorized=True)
+    assert [v["content_state"] for v in verdicts] == ["qF_Hate", "qF_Safe"]
+    assert verdicts[1]["spam_state"] == "qSpam"
+    assert len(stored_pipeline.verdict_store) == 2
+
+def test_vectorized_verdicts_are_not_stored_as_routed(store):
+    pytest.importorskip("numpy")
+    pipeline = TextPipeline(lexicon=multilingual(), route_languages=True, verdict_store=store)
+    text = "zo ka mi grumpus, dinero gratis"     # Spanish spam, routed away from Spanish
+    assert pipeline.classify_batch([text], vectorized=True)[0]["spam_state"] == "qSpam"
+    assert pipeline.classify_batch([text])[0]["spam_state"] == "qSafe"
+    assert pipeline.run(text)["detailed"]["spam_state"] == "qSafe"
+    assert store.get(content_hash(text), pipeline.store_version(routed=False))[0] == "qSpam"
+    assert store.get(content_hash(text), pipeline.store_version())[0] == "qSafe"
+    assert pipeline.store_version(routed=False) == pipeline.lexicon_version
+
+def test_run_with_stored_verdict_skips_tokenizing(stored_pipeline):
+    text = "You are an idiot"
+    expected = stored_pipeline.run(text)["final"].to_dict()
+    result = stored_pipeline.run(text)
+    assert result["final"].to_dict() == expected
+    assert "tokens" not in result["detailed"].computed
+
+def test_run_stores_whatever_is_read(stored_pipeline):
+    stored_pipeline.run("You are an idiot")
+    stored_pipeline.run("free money now")["final"]["text"]
+    store = stored_pipeline.verdict_store
+    assert store.get(content_hash("You are an idiot"), stored_pipeline.store_version())[1] == "qF_Hate"
+    assert store.get(content_hash("free money now"), stored_pipeline.store_version())[0] == "qSpam"
+
+def test_degraded_run_is_not_stored(stored_pipeline):
+    text = "You are an idiot " * 10
+    deadline = Deadline(0)
+    stored_pipeline.run(text, deadline=deadline)["final"].to_dict()
+    assert deadline.degraded and len(stored_pipeline.verdict_store) == 0
+
+def test_store_version_includes_options(tmp_path):
+    store = VerdictStore(tmp_path / "v.db")
+    default = TextPipeline(verdict_store=store)
+    raw = TextPipeline(verdict_store=store, normalize=False)
+    assert default.store_version() == default.lexicon_version
+    assert raw.store_version() == raw.lexicon_version + "+raw"
+    default.classify("stuuupid idiot")
+    assert raw.classify("stuuupid idiot")["content_state"] == raw.classify("stuuupid idiot")["content_state"]
+    assert len(store) == 2
+    store.close()
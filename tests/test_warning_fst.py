@@ -11,6 +11,12 @@ def fst():
 def test_warning_spam(fst):
     assert fst.generate_warning("qSpam") == "this post may contain spam"
 
+def test_warning_campaign(fst):
+    assert fst.generate_warning("qCampaign") == "this post may be part of a spam campaign"
+
+def test_warning_flood(fst):
+    assert fst.generate_warning("qFlood") == "this author is posting too fast"
+
 def test_warning_offensive(fst):
     assert fst.generate_warning("qF_Offensive") == "this post may contain offensive language"
 
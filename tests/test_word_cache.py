@@ -0,0 +1,71 @@
+import json
+import pytest
+from benchmarks.corpus import CorpusGenerator
+from src.lexicon import KEYWORDS_FILE
+from src.pipeline import TextPipeline
+from src.word_cache import WordCache
+
+# -------------------------
+# WordCache
+# -------------------------
+def test_lru_eviction():
+    cache = WordCache(capacity=2, version="v1")
+    cache.put("a", "WORD", "v1")
+    cache.put("b", "WORD", "v1")
+    assert cache.get("a", "v1") == "WORD"      # "b" is now the oldest
+    cache.put("c", "WORD", "v1")
+    assert cache.get("b", "v1") is None
+    assert cache.get("a", "v1") == "WORD"
+    assert len(cache) == 2
+
+def test_stats():
+    cache = WordCache(capacity=10, version="v1")
+    cache.put("you", "PRONOUN_OTHER", "v1")
+    cache.get("you", "v1")
+    cache.get("you", "v1")
+    cache.get("me", "v1")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+def test_version_binding():
+    cache = WordCache(capacity=10, version="v1")
+    cache.put("grumpus", "WORD", "v1")
+    assert cache.get("grumpus", "v2") is None   # other version never sees it
+    cache.put("other", "WORD", "v2")            # nor writes into it
+    assert len(cache) == 1
+
+    cache.bind("v2")
+    assert len(cache) == 0
+    assert cache.get("grumpus", "v1") is None
+
+# -------------------------
+# Tokenizer integration
+# -------------------------
+def test_cached_tokens_match():
+    cached = TextPipeline()
+    uncached = TextPipeline(word_cache_size=0)
+    assert uncached.word_cache is None
+    texts = [text for _, _, text in CorpusGenerator(seed=4).corpus(200)]
+    texts += ["HTTP://x.com http://x.com", "SPAMWORD spamword", "y0u stuuupid h1m", "You you YOU"]
+    for _ in range(2):
+        for text in texts:
+            assert cached.tokenizer.tokenize(text) == uncached.tokenizer.tokenize(text)
+    assert cached.word_cache.hit_rate > 0.5
+
+def test_reload_invalidates(tmp_path):
+    path = tmp_path / "keywords.json"
+    data = json.loads(KEYWORDS_FILE.read_text(encoding="utf-8"))
+    path.write_text(json.dumps(data), encoding="utf-8")
+    pipeline = TextPipeline(keywords_file=path)
+    old_stages = pipeline.stages
+    assert pipeline.tokenizer.tokenize("grumpus") == ["WORD"]
+
+    data["badwords"].append("grumpus")
+    path.write_text(json.dumps(data), encoding="utf-8")
+    pipeline.reload_lexicon()
+
+    assert pipeline.word_cache.version == pipeline.lexicon_version
+    assert pipeline.tokenizer.tokenize("grumpus") == ["BADWORD"]
+    assert old_stages.tokenizer.tokenize("grumpus") == ["WORD"]
+    assert pipeline.tokenizer.tokenize("grumpus") == ["BADWORD"]